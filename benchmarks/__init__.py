@@ -0,0 +1,45 @@
+"""Micro-benchmarks of the custom nodes and estimators of the demos
+
+Each case drives a single node or estimator with synthetic data, over a grid of channel
+counts, sampling rates and chunk sizes, and reports the latency of each update, the
+throughput and the peak of memory allocated during an update.
+
+Example:
+    $ python -m benchmarks run -o baseline.json
+    $ python -m benchmarks run -o current.json --baseline baseline.json
+    $ python -m benchmarks compare baseline.json current.json --threshold .2
+"""
+
+import os
+import sys
+import importlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages that each application provides under the same name
+_PACKAGES = ("nodes", "estimators")
+
+
+def load(app, module):
+    """Import a module of an application
+
+    The applications are self-contained, and their modules are imported relatively to their
+    own directory (eg. ``nodes.emg``). As several applications provide a ``nodes`` package,
+    the previously imported ones are discarded first.
+
+    Args:
+        app (str): The directory of the application, relative to the repository root.
+        module (str): The name of the module, eg. ``nodes.emg``.
+
+    Returns:
+        module: The imported module.
+    """
+    for name in list(sys.modules):
+        if name.split(".")[0] in _PACKAGES:
+            del sys.modules[name]
+    path = os.path.join(ROOT, app)
+    sys.path.insert(0, path)
+    try:
+        return importlib.import_module(module)
+    finally:
+        sys.path.remove(path)
@@ -0,0 +1,61 @@
+import re
+import sys
+import logging
+import numpy as np
+from argparse import ArgumentParser
+from .cases import CASES
+from .runner import METRICS, run, compare, report, save, open_results
+
+
+def main():
+    parser = ArgumentParser(prog="python -m benchmarks", description="Micro-benchmarks of the demo nodes and estimators")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("list", help="list the cases")
+
+    parser_run = commands.add_parser("run", help="run the benchmarks")
+    parser_run.add_argument("-k", "--cases", default=None, help="regular expression selecting the cases")
+    parser_run.add_argument("-c", "--channels", type=int, nargs="+", default=[1, 8, 64], help="numbers of channels")
+    parser_run.add_argument("-r", "--rates", type=int, nargs="+", default=[250, 1000, 2000], help="sampling rates")
+    parser_run.add_argument("-s", "--chunks", type=int, nargs="+", default=[16, 128], help="chunk sizes, in samples or events")
+    parser_run.add_argument("-n", "--updates", type=int, default=200, help="number of measured updates")
+    parser_run.add_argument("-w", "--warmup", type=int, default=10, help="number of updates before the measure")
+    parser_run.add_argument("-m", "--memory", type=int, default=10, help="number of updates traced for allocations")
+    parser_run.add_argument("-o", "--output", default=None, help="JSON file where the results are saved")
+    parser_run.add_argument("-b", "--baseline", default=None, help="JSON file of a previous run to compare with")
+    parser_run.add_argument("-t", "--threshold", type=float, default=.2, help="relative increase flagged as a regression")
+
+    parser_compare = commands.add_parser("compare", help="compare two runs")
+    parser_compare.add_argument("baseline", help="JSON file of the reference run")
+    parser_compare.add_argument("current", help="JSON file of the new run")
+    parser_compare.add_argument("-t", "--threshold", type=float, default=.2, help="relative increase flagged as a regression")
+    parser_compare.add_argument("--metrics", nargs="+", choices=METRICS, default=["p50", "peak"], help="compared metrics")
+
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for case in CASES.values():
+            print(f"{case.name:<24}{case.app:<24}{', '.join(case.dims)}")
+        return 0
+
+    if args.command == "run":
+        cases = [case for name, case in CASES.items() if not args.cases or re.search(args.cases, name)]
+        if not cases:
+            exit("No matching case.")
+        logging.basicConfig(level=logging.ERROR)
+        np.seterr(all="ignore")
+        results = run(cases, args.channels, args.rates, args.chunks, args.updates, args.warmup, args.memory)
+        if args.output:
+            save(results, args.output)
+        if args.baseline:
+            changes = compare(open_results(args.baseline), results, args.threshold)
+            return 1 if report(changes, args.threshold) else 0
+        return 0
+
+    if args.command == "compare":
+        changes = compare(open_results(args.baseline), open_results(args.current), args.threshold, args.metrics)
+        return 1 if report(changes, args.threshold) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,436 @@
+"""Benchmark cases
+
+A case drives one node or estimator with synthetic data. It is a generator function that
+receives the number of inputs to prepare, a random generator and the parameters of the grid
+it depends on (``channels``, ``rate`` and ``chunk``, in samples). It prepares the node and
+yields a tuple made of:
+
+- the update function, which is the only measured part,
+- an iterable of inputs, passed one at a time to the update function,
+- the number of items (samples, events, epochs) in each input, for the throughput.
+
+Once the benchmark is done, the case resumes and cleans up, if needed.
+"""
+
+import os
+import json
+import time
+import socket
+import tempfile
+import numpy as np
+import pandas as pd
+from collections import namedtuple
+from itertools import cycle, islice
+from . import load
+
+Case = namedtuple("Case", ["name", "app", "dims", "unit", "factory"])
+
+CASES = {}
+
+SIGNAL = ("channels", "rate", "chunk")  # continuous streams, processed chunk by chunk
+EPOCHS = ("channels", "rate")  # epochs of fixed duration, processed one at a time
+EVENTS = ("chunk",)  # events, processed by batches
+
+ORIGIN = pd.Timestamp("2023-01-01")
+
+
+def case(name, app, dims=SIGNAL, unit="samples"):
+    """Register a case
+
+    Args:
+        name (str): The name of the case, usually the name of the class.
+        app (str): The directory of the application.
+        dims (tuple): The parameters of the grid the case depends on.
+        unit (str): What the throughput is counted in.
+    """
+
+    def register(factory):
+        CASES[name] = Case(name, app, dims, unit, factory)
+        return factory
+
+    return register
+
+
+def _signal(channels, rate, chunk, count, rng, scale=1.):
+    """Chunks of white noise, generated on demand"""
+    columns = [f"ch{channel}" for channel in range(channels)]
+    for start in range(0, chunk * count, chunk):
+        index = ORIGIN + pd.to_timedelta(np.arange(start, start + chunk) / rate, unit="s")
+        yield pd.DataFrame(rng.normal(scale=scale, size=(chunk, channels)), index=index, columns=columns)
+
+
+def _events(chunk, count, label, period=.25):
+    """Batches of events, without data"""
+    for start in range(0, chunk * count, chunk):
+        index = ORIGIN + pd.to_timedelta(np.arange(start, start + chunk) * period, unit="s")
+        yield pd.DataFrame({"label": label, "data": None}, index=index)
+
+
+def _pool(epochs, count):
+    """Cycle through a few epochs, for stateless estimators"""
+    return islice(cycle(epochs), count)
+
+
+def _update(node, **ports):
+    """Run one cycle of a node, as the worker does"""
+    node.clear()
+    for name, data in ports.items():
+        getattr(node, name).data = data
+    node.update()
+
+
+def _default(node):
+    def update(data):
+        _update(node, i=data)
+    return update
+
+
+def _model(node):
+    def update(inputs):
+        node.clear()
+        node.i_model.data, node.i_model.meta = inputs
+        node.update()
+    return update
+
+
+# ---------------------------------------------------------------------------------------------
+# Roshambo
+
+@case("TKEO", "roshambo")
+def tkeo(count, rng, channels, rate, chunk):
+    emg = load("roshambo", "nodes.emg")
+    yield _default(emg.TKEO()), _signal(channels, rate, chunk, count, rng), chunk
+
+
+@case("DetectBurst", "roshambo")
+def detect_burst(count, rng, channels, rate, chunk):
+    emg = load("roshambo", "nodes.emg")
+    node = emg.DetectBurst(intensity=50, window=rate * 10)
+
+    def update(inputs):
+        _update(node, i_signal=inputs[0], i_energy=inputs[1])
+
+    signals = _signal(channels, rate, chunk, count, rng)
+    energies = (signal.abs() for signal in _signal(channels, rate, chunk, count, rng))
+    yield update, zip(signals, energies), chunk
+
+
+@case("EMGPreprocessing", "roshambo")
+def emg_preprocessing(count, rng, channels, rate, chunk):
+    emg = load("roshambo", "nodes.emg")
+    # The bandpass filter is bounded by the Nyquist frequency
+    node = emg.EMGPreprocessing(rate=rate, bandpass=[10, min(200, rate / 2 - 25)])
+    yield _default(node), _signal(channels, rate, chunk, count, rng, scale=.3), chunk
+
+
+@case("SlidingFeatures", "roshambo")
+def sliding_features(count, rng, channels, rate, chunk):
+    emg = load("roshambo", "nodes.emg")
+    node = emg.SlidingFeatures(length=.5, step=.1, rate=rate)
+    yield _default(node), _signal(channels, rate, chunk, count, rng), chunk
+
+
+@case("EpochFeatures", "roshambo", EPOCHS, "epochs")
+def epoch_features(count, rng, channels, rate):
+    emg = load("roshambo", "nodes.emg")
+    node = emg.EpochFeatures()
+
+    def update(epoch):
+        _update(node, i_0=epoch)
+
+    yield update, _signal(channels, rate, rate // 2, count, rng), 1
+
+
+@case("MovingAverage", "roshambo")
+def moving_average(count, rng, channels, rate, chunk):
+    filters = load("roshambo", "nodes.filters")
+    node = filters.MovingAverage(length=.5, rate=rate)
+    yield _default(node), _signal(channels, rate, chunk, count, rng), chunk
+
+
+@case("RecursiveScaler", "roshambo")
+def recursive_scaler(count, rng, channels, rate, chunk):
+    filters = load("roshambo", "nodes.filters")
+    node = filters.RecursiveScaler(method="minmax", limits=[.1, 2])
+    yield _default(node), _signal(channels, rate, chunk, count, rng), chunk
+
+
+@case("DropOutsider", "roshambo")
+def drop_outsider(count, rng, channels, rate, chunk):
+    filters = load("roshambo", "nodes.filters")
+    node = filters.DropOutsider(left=-1.5, right=1.5)
+    yield _default(node), _signal(channels, rate, chunk, count, rng, scale=.5), chunk
+
+
+@case("EMGFeatures", "roshambo", EPOCHS, "epochs")
+def emg_features(count, rng, channels, rate):
+    estimators = load("roshambo", "estimators.emg")
+    estimator = estimators.EMGFeatures().fit(None)
+    epochs = rng.normal(size=(8, 1, rate // 2, channels))
+    yield estimator.transform, _pool(epochs, count), 1
+
+
+# ---------------------------------------------------------------------------------------------
+# Neurofeedback
+
+@case("Power", "neurofeedback/bands")
+def power(count, rng, channels, rate, chunk):
+    module = load("neurofeedback/bands", "nodes.power")
+    node = module.Power(length=1, step=.1, average="median", rate=rate)
+    yield _default(node), _signal(channels, rate, chunk, count, rng), chunk
+
+
+@case("Power[mean]", "neurofeedback/bands")
+def power_mean(count, rng, channels, rate, chunk):
+    module = load("neurofeedback/bands", "nodes.power")
+    node = module.Power(length=1, step=.1, average="mean", rate=rate)
+    yield _default(node), _signal(channels, rate, chunk, count, rng), chunk
+
+
+@case("FilterBankPower", "neurofeedback/bands")
+def filter_bank_power(count, rng, channels, rate, chunk):
+    module = load("neurofeedback/bands", "nodes.power")
+    bands = {"theta": [4, 8], "alpha": [8, 12], "beta": [12, 30]}
+    node = module.FilterBankPower(bands=bands, length=1, step=.1, average="median", rate=rate)
+    yield _default(node), _signal(channels, rate, chunk, count, rng), chunk
+
+
+# ---------------------------------------------------------------------------------------------
+# Transport, from a publisher to a subscriber
+
+def _port():
+    """A free TCP port on the loopback interface"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@case("ZMQ", "neurofeedback/bands")
+def zmq_transport(count, rng, channels, rate, chunk, timeout=5):
+    import zmq
+    from zmq.devices import ThreadProxy
+    from timeflux.nodes.zmq import Pub, Sub
+    # The same path as in the demos, through a broker
+    address_in, address_out = f"tcp://127.0.0.1:{_port()}", f"tcp://127.0.0.1:{_port()}"
+    proxy = ThreadProxy(zmq.XSUB, zmq.XPUB)
+    proxy.bind_in(address_in)
+    proxy.bind_out(address_out)
+    proxy.start()
+    pub, sub = Pub("signal", address_in), Sub(["signal"], address_out)
+
+    def update(data):
+        _update(pub, i=data)
+        # Wait for the chunk to go through the broker
+        deadline = time.perf_counter() + timeout
+        while True:
+            _update(sub)
+            if sub.o_signal.data is not None:
+                return
+            if time.perf_counter() > deadline:
+                raise RuntimeError("The chunk did not go through the broker")
+
+    # Wait for the subscription to reach the publisher
+    chunks = _signal(channels, rate, chunk, count + 1, rng)
+    first = next(chunks)
+    deadline = time.perf_counter() + timeout
+    while sub.o_signal.data is None and time.perf_counter() < deadline:
+        _update(pub, i=first)
+        time.sleep(.01)
+        _update(sub)
+    yield update, chunks, chunk
+    pub._socket.close()
+    sub._socket.close()
+
+
+@case("SharedMemory", "common")
+def shared_memory_transport(count, rng, channels, rate, chunk):
+    shm = load(".", "common.shm")
+    namespace = f"benchmark{os.getpid()}"
+    pub, sub = shm.Pub("signal", namespace=namespace), shm.Sub(["signal"], namespace=namespace)
+    chunks = _signal(channels, rate, chunk, count + 1, rng)
+    # The ring buffer is created with the first chunk
+    _update(pub, i=next(chunks))
+    _update(sub)
+
+    def update(data):
+        _update(pub, i=data)
+        _update(sub)
+
+    yield update, chunks, chunk
+    sub.terminate()
+    pub.terminate()
+
+
+# ---------------------------------------------------------------------------------------------
+# Coherence
+
+@case("EventToSignal", "coherence", EVENTS, "events")
+def event_to_signal(count, rng, chunk):
+    module = load("coherence", "nodes.events")
+    node = module.EventToSignal(labels="peak", meta_keys=["interval", "value"])
+    events = (
+        data.assign(data=[json.dumps({"interval": interval, "value": 1.}) for interval in rng.uniform(.6, 1.2, chunk)])
+        for data in _events(chunk, count, "peak")
+    )
+    yield _default(node), events, chunk
+
+
+@case("HRVSpectrum", "coherence", EVENTS, "beats")
+def hrv_spectrum(count, rng, chunk):
+    cardiac = load("coherence", "nodes.cardiac")
+    node = cardiac.HRVSpectrum(rate=4, length=64, interpolation="cubic")
+    intervals = rng.uniform(.6, 1.2, chunk * count)
+    index = ORIGIN + pd.to_timedelta(np.cumsum(intervals), unit="s")
+    beats = pd.DataFrame({"interval": intervals}, index=index)
+    yield _default(node), (beats.iloc[start:start + chunk] for start in range(0, len(beats), chunk)), chunk
+
+
+# ---------------------------------------------------------------------------------------------
+# Hyperscanning
+
+def _devices(count, rng, channels, rate, chunk, devices=2, threshold=562500):
+    """Chunks of several devices, starting with a sync onset"""
+    streams = [_signal(channels, rate, chunk, count, rng) for _ in range(devices)]
+    for position, chunks in enumerate(zip(*streams)):
+        for data in chunks:
+            data["sync"] = 0.
+            if position == 0:
+                data.iloc[0, -1] = threshold
+        yield chunks
+
+
+@case("Synchronize", "hyperscanning")
+def synchronize(count, rng, channels, rate, chunk):
+    sync = load("hyperscanning", "nodes.sync")
+    node = sync.Synchronize(rate=rate, devices=2)
+
+    def update(inputs):
+        _update(node, i_raw_1=inputs[0], i_raw_2=inputs[1])
+
+    yield update, _devices(count, rng, channels, rate, chunk), chunk
+
+
+@case("Record", "hyperscanning")
+def record(count, rng, channels, rate, chunk):
+    module = load("hyperscanning", "nodes.record")
+    with tempfile.TemporaryDirectory() as path:
+        node = module.Record(path, session="benchmark")
+        yield _default(node), _signal(channels, rate, chunk, count, rng), chunk
+        node.terminate()
+
+
+# ---------------------------------------------------------------------------------------------
+# CVEP speller
+
+@case("Mean", "speller/CVEP/speller")
+def mean(count, rng, channels, rate, chunk):
+    rereference = load("speller/CVEP/speller", "nodes.rereference")
+    yield _default(rereference.Mean()), _signal(channels, rate, chunk, count, rng), chunk
+
+
+def _predictions(count, rng, chunk, n_classes=16):
+    """Batches of single-trial predictions, with typed probabilities and epochs in meta"""
+    for data in _events(chunk, count, "predict_proba"):
+        proba = rng.dirichlet(np.ones(n_classes), chunk)
+        data["data"] = [json.dumps({"result": list(row)}) for row in proba]
+        targets = rng.integers(n_classes, size=chunk).tolist()
+        epochs = [{"epoch": {"onset": onset, "context": {"target": target}}} for onset, target in zip(data.index, targets)]
+        yield data, {"epochs": epochs, "proba": proba}
+
+
+@case("Shift", "speller/CVEP/speller", EVENTS, "events")
+def shift(count, rng, chunk):
+    module = load("speller/CVEP/speller", "nodes.shift")
+    node = module.Shift()
+
+    def update(inputs):
+        node.clear()
+        node.i.data, node.i.meta = inputs
+        node.update()
+
+    yield update, _predictions(count, rng, chunk), chunk
+
+
+@case("Accumulate", "speller/CVEP/speller", EVENTS, "events")
+def accumulate(count, rng, chunk):
+    predict = load("speller/CVEP/speller", "nodes.predict")
+    yield _model(predict.Accumulate(recovery=0)), _predictions(count, rng, chunk), chunk
+
+
+def _cvep(rng, channels, rate, n_classes=16, step=8, bits=127, refresh=60, repetitions=2, epochs=8):
+    """Training and testing epochs, the code being shifted for each target
+
+    Returns:
+        tuple: The training epochs and targets, the testing epochs, and the shift between
+            two consecutive targets, in samples.
+    """
+    repeat = max(1, round(rate / refresh))
+    offset = step * repeat
+    code = np.repeat(rng.integers(0, 2, bits).astype(float), repeat)
+    mixing = rng.normal(size=(channels, 1))
+    targets = np.concatenate((np.repeat(np.arange(n_classes), repetitions), rng.integers(n_classes, size=epochs)))
+    X = np.array([mixing * np.roll(code, -target * offset) + rng.normal(size=(channels, len(code))) for target in targets])
+    X -= X.mean(axis=1, keepdims=True)
+    train = n_classes * repetitions
+    return X[:train], targets[:train], X[train:, np.newaxis], offset
+
+
+@case("CVEP_CCA", "speller/CVEP/speller", EPOCHS, "epochs")
+def cvep_cca(count, rng, channels, rate):
+    cvep = load("speller/CVEP/speller", "estimators.cvep")
+    X, y, epochs, offset = _cvep(rng, channels, rate)
+    estimator = cvep.CVEP_CCA(n_classes=16, offset=offset).fit(X, y)
+    yield estimator.predict_proba, _pool(epochs, count), 1
+
+
+@case("CVEP_FFT", "speller/CVEP/speller", EPOCHS, "epochs")
+def cvep_fft(count, rng, channels, rate):
+    cvep = load("speller/CVEP/speller", "estimators.cvep")
+    X, y, epochs, offset = _cvep(rng, channels, rate)
+    estimator = cvep.CVEP_FFT(n_classes=16, offset=offset).fit(X, y)
+    yield estimator.predict_proba, _pool(epochs, count), 1
+
+
+# ---------------------------------------------------------------------------------------------
+# P300 speller
+
+def _p300(node, count, rng, chunk, n_chars=36, size=6):
+    """Start a testing session, and prepare batches of single-trial predictions
+
+    Each prediction is matched with a flash of a random group of characters.
+    """
+    index = pd.date_range(ORIGIN, periods=4, freq="s")
+    setup = json.dumps({"symbols": [str(char) for char in range(n_chars)]})
+    node.clear()
+    node.i_ui.data = pd.DataFrame({
+        "label": ["session_begins", "testing_begins", "block_begins", "flash_begins"],
+        "data": [setup, None, None, None],
+    }, index=index)
+    node.i_model.data = pd.DataFrame({"label": ["ready"], "data": [None]}, index=index[-1:])
+    node.update()
+
+    def predictions():
+        for data in _events(chunk, count, "predict_proba"):
+            groups = [sorted(rng.choice(n_chars, size, replace=False).tolist()) for _ in range(chunk)]
+            epochs = [{"epoch": {"onset": onset, "context": {"group": group}}} for onset, group in zip(data.index, groups)]
+            yield data, {"epochs": epochs, "proba": rng.dirichlet(np.ones(2), chunk)}
+
+    return _model(node), predictions(), chunk
+
+
+@case("Direct", "speller/P300/speller", EVENTS, "events")
+def direct(count, rng, chunk):
+    predict = load("speller/P300/speller", "nodes.predict")
+    yield _p300(predict.Direct(), count, rng, chunk)
+
+
+@case("ASAP", "speller/P300/speller", EVENTS, "events")
+def asap(count, rng, chunk):
+    predict = load("speller/P300/speller", "nodes.predict")
+    yield _p300(predict.ASAP(), count, rng, chunk)
+
+
+@case("ASAP_DynamicStopping", "speller/P300/speller", EVENTS, "events")
+def asap_dynamic_stopping(count, rng, chunk):
+    predict = load("speller/P300/speller", "nodes.predict")
+    yield _p300(predict.ASAP_DynamicStopping(), count, rng, chunk)
@@ -0,0 +1,196 @@
+"""Run the benchmark cases, and compare the results of two runs"""
+
+import gc
+import sys
+import json
+import platform
+import tracemalloc
+import numpy as np
+from time import perf_counter_ns
+from datetime import datetime, timezone
+from itertools import product
+
+# Latency percentiles, in microseconds
+PERCENTILES = (50, 90, 99)
+
+# Metrics compared between two runs, for which lower is better
+METRICS = ("p50", "p90", "p99", "mean", "peak")
+
+
+def measure(case, params, updates=200, warmup=10, memory=10, seed=42):
+    """Benchmark a case for one point of the grid
+
+    The first updates are not measured, so that the initialization of the node and the
+    filling of its buffers do not skew the results. The latency is then measured with the
+    garbage collector disabled, as ``timeit`` does. Finally, the peak of memory allocated
+    during an update is measured on a few more updates, as tracing the allocations slows
+    down the execution.
+
+    Args:
+        case (Case): The case.
+        params (dict): The parameters of the grid the case depends on.
+        updates (int): The number of measured updates.
+        warmup (int): The number of updates before the measure.
+        memory (int): The number of updates traced for allocations.
+        seed (int): The seed of the random generator.
+
+    Returns:
+        dict: The latency percentiles, mean and maximum in microseconds, the throughput in
+            items per second, and the peak of allocated memory in bytes.
+    """
+    factory = case.factory(warmup + updates + memory, np.random.default_rng(seed), **params)
+    update, inputs, size = next(factory)
+    inputs = iter(inputs)
+    try:
+        for _ in range(warmup):
+            update(next(inputs))
+
+        latencies = np.empty(updates, dtype=np.int64)
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for index in range(updates):
+                data = next(inputs)
+                start = perf_counter_ns()
+                update(data)
+                latencies[index] = perf_counter_ns() - start
+        finally:
+            if enabled:
+                gc.enable()
+
+        peak = 0
+        tracemalloc.start()
+        try:
+            for _ in range(memory):
+                data = next(inputs)
+                tracemalloc.reset_peak()
+                current = tracemalloc.get_traced_memory()[0]
+                update(data)
+                peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+        finally:
+            tracemalloc.stop()
+    finally:
+        next(factory, None)
+
+    latencies = latencies / 1e3
+    result = {f"p{percentile}": float(np.percentile(latencies, percentile)) for percentile in PERCENTILES}
+    result["mean"] = float(latencies.mean())
+    result["max"] = float(latencies.max())
+    result["throughput"] = float(size * updates / latencies.sum() * 1e6)
+    result["peak"] = int(peak)
+    return result
+
+
+def grid(case, channels, rates, chunks):
+    """Points of the grid a case depends on"""
+    values = {"channels": channels, "rate": rates, "chunk": chunks}
+    for point in product(*(values[dim] for dim in case.dims)):
+        yield dict(zip(case.dims, point))
+
+
+def run(cases, channels, rates, chunks, updates=200, warmup=10, memory=10, seed=42, log=print):
+    """Benchmark several cases over the grid
+
+    Returns:
+        dict: The results, along with the settings and the environment of the run.
+    """
+    results = []
+    for case in cases:
+        for params in grid(case, channels, rates, chunks):
+            result = measure(case, params, updates, warmup, memory, seed)
+            results.append({"case": case.name, "app": case.app, "params": params, "unit": case.unit, **result})
+            if log:
+                log(_format(results[-1]))
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "settings": {"updates": updates, "warmup": warmup, "memory": memory, "seed": seed},
+        "environment": _environment(),
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=.2, metrics=("p50", "peak")):
+    """Compare two runs
+
+    Args:
+        baseline (dict): The results of the reference run.
+        current (dict): The results of the new run.
+        threshold (float): Relative increase above which a metric is considered as a
+            regression, eg. ``0.2`` for 20%.
+        metrics (tuple): The compared metrics.
+
+    Returns:
+        list: For each case and point of the grid found in both runs, the relative change of
+            each metric, and the regressed metrics, if any.
+    """
+    reference = {_key(result): result for result in baseline["results"]}
+    changes = []
+    for result in current["results"]:
+        previous = reference.get(_key(result))
+        if previous is None:
+            continue
+        change = {metric: _change(previous[metric], result[metric]) for metric in metrics}
+        changes.append({
+            "case": result["case"],
+            "params": result["params"],
+            "change": change,
+            "regressions": [metric for metric, value in change.items() if value > threshold],
+        })
+    return changes
+
+
+def report(changes, threshold):
+    """Print a comparison, and return the number of regressions"""
+    regressions = 0
+    for change in changes:
+        flag = "REGRESSION" if change["regressions"] else ""
+        values = "\t".join(f"{metric} {value:+.1%}" for metric, value in change["change"].items())
+        print(f"{change['case']:<24}{_params(change['params']):<36}{values}\t{flag}")
+        regressions += bool(change["regressions"])
+    print(f"{regressions} regression(s) above {threshold:.0%}, out of {len(changes)} compared")
+    return regressions
+
+
+def save(results, path):
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+def open_results(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def _change(previous, current):
+    if not previous:
+        return 0. if not current else float("inf")
+    return current / previous - 1
+
+
+def _key(result):
+    return result["case"], tuple(sorted(result["params"].items()))
+
+
+def _params(params):
+    return " ".join(f"{name}={value}" for name, value in params.items())
+
+
+def _format(result):
+    return (
+        f"{result['case']:<24}{_params(result['params']):<36}"
+        f"p50 {result['p50']:>10.1f} us\tp99 {result['p99']:>10.1f} us\t"
+        f"{result['throughput']:>12.0f} {result['unit']}/s\tpeak {result['peak'] / 1024:>9.1f} KiB"
+    )
+
+
+def _environment():
+    import pandas as pd
+    import scipy
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+    }
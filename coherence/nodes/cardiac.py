@@ -1,23 +1,115 @@
 from timeflux.core.node import Node
 import numpy as np
 import pandas as pd
+from scipy.interpolate import CubicSpline
 
 
-class CardiacFreqMarkers(Node):
-    """Cardiac marker based on frequency
+class HRVSpectrum(Node):
+    """Cardiac markers based on frequency, updated on each beat
+
+    The RR intervals are resampled on the fly to a uniform rate, using the last few beats only.
+    The spectrum of the resampled tachogram is then updated sample by sample with a sliding
+    DFT, and Hann-windowed in the frequency domain. The cost per beat is therefore constant.
 
     Attributes:
-        i_lf (Port): Low Frequency power, expects DataFrame.
-        i_hf (Port): High Frequency power, expects DataFrame.
+        i (Port): Default input, expects DataFrame with the RR intervals, in seconds, indexed by beat.
         o (Port): Default output, provides DataFrame with column 'lf', 'hf', and 'lf/hf' and meta.
+
+    Args:
+        rate (float): Rate of the resampled tachogram, in Hz (default: 4).
+        length (float): Length of the spectral window, in seconds (default: 64).
+        interpolation (linear|cubic): Interpolation method (default: 'linear').
+        lookback (int): Number of beats used for the cubic interpolation (default: 4).
+        lf (list): Low frequency band, in Hz (default: [0.04, 0.15]).
+        hf (list): High frequency band, in Hz (default: [0.15, 0.4]).
+        relative (bool): Whether the band powers are relative to the total power (default: True).
+        column (str|None): Column of the RR intervals. If None, the first column is used (default: None).
+
+    Note:
+        The 'lf/hf' ratio is divided by 6, for display.
     """
 
+    def __init__(self, rate=4, length=64, interpolation='linear', lookback=4, lf=[0.04, 0.15], hf=[0.15, 0.4], relative=True, column=None):
+        self._rate = rate
+        self._length = int(round(length * rate))
+        self._cubic = interpolation == 'cubic'
+        self._lookback = max(lookback, 4) if self._cubic else 2
+        self._relative = relative
+        self._column = column
+        frequencies = np.fft.rfftfreq(self._length, 1 / rate)
+        self._lf = (frequencies >= lf[0]) & (frequencies < lf[1])
+        self._hf = (frequencies >= hf[0]) & (frequencies < hf[1])
+        self._twiddle = np.exp(2j * np.pi * np.arange(len(frequencies)) / self._length)
+        self._ring = np.zeros(self._length)
+        self._spectrum = np.zeros(len(frequencies), dtype=complex)
+        self._count = 0
+        self._origin = None
+        self._times = []
+        self._values = []
+
     def update(self):
-        if not (self.i_lf.ready() & self.i_hf.ready()):
+        if not self.i.ready():
             return
 
-        self.o.meta = self.i_lf.meta
+        column = self._column or self.i.data.columns[0]
+        values = self.i.data[column].to_numpy(dtype=float)
+        index = self.i.data.index
+        if self._origin is None:
+            self._origin = index[0]
+            self._next = 0.
+        times = (index - self._origin) / pd.Timedelta(seconds=1)
+
+        rows = []
+        beats = []
+        for time, value, beat in zip(times, values, index):
+            if np.isnan(value):
+                continue
+            self._times = (self._times + [time])[-self._lookback:]
+            self._values = (self._values + [value])[-self._lookback:]
+            grid = self._next + np.arange(int(np.floor((time - self._next) * self._rate)) + 1) / self._rate
+            if not len(grid):
+                continue
+            self._next = grid[-1] + 1 / self._rate
+            self._slide(self._resample(grid))
+            if self._count >= self._length:
+                rows.append(self._markers())
+                beats.append(beat)
+
+        if not rows:
+            return
+        self.o.data = pd.DataFrame(rows, index=beats, columns=['lf', 'hf', 'lf/hf'])
+        self.o.meta = self.i.meta
+
+    def _resample(self, grid):
+        if len(self._times) == 1:
+            return np.full(len(grid), self._values[0])
+        if self._cubic and len(self._times) >= 4:
+            return CubicSpline(self._times, self._values)(grid)
+        return np.interp(grid, self._times[-2:], self._values[-2:])
+
+    def _slide(self, samples):
+        count = self._count
+        for sample in samples:
+            position = self._count % self._length
+            self._spectrum += sample - self._ring[position]
+            self._spectrum *= self._twiddle
+            self._ring[position] = sample
+            self._count += 1
+        if self._count // self._length > count // self._length:
+            # Recompute the spectrum once per cycle to avoid drifting
+            position = self._count % self._length
+            self._spectrum = np.fft.rfft(np.roll(self._ring, -position))
 
-        self.o.data = pd.concat([self.i_lf.data, self.i_hf.data], axis=1)
-        self.o.data.columns = ['lf', 'hf']
-        self.o.data.loc[:, 'lf/hf'] = (self.o.data['lf'] / self.o.data['hf']) / 6
+    def _markers(self):
+        # Remove the mean, and apply a Hann window by convolution in the frequency domain
+        spectrum = self._spectrum.copy()
+        spectrum[0] = 0
+        neighbors = np.concatenate(([np.conj(spectrum[1])], spectrum, [np.conj(spectrum[-2])]))
+        windowed = .5 * spectrum - .25 * (neighbors[:-2] + neighbors[2:])
+        power = np.abs(windowed) ** 2
+        lf = power[self._lf].sum()
+        hf = power[self._hf].sum()
+        if self._relative:
+            total = power[1:].sum()
+            lf, hf = lf / total, hf / total
+        return lf, hf, (lf / hf) / 6
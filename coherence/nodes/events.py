@@ -1,4 +1,7 @@
+import json
+import numpy as np
 import pandas as pd
+from operator import methodcaller
 
 from timeflux.core.node import Node
 
@@ -6,6 +9,11 @@ from timeflux.core.node import Node
 class EventToSignal(Node):
     """ Serialize one column
 
+    The values of the selected keys are extracted from the event data in one pass, and
+    provided as float64 columns. Keys that are missing or not numeric are filled with NaN,
+    as are events whose data is not a dict. The event data can either be a dict or a JSON
+    string.
+
     Attributes:
         i (Port): Default input, expects DataFrame.
         o (Port): Default output, provides DataFrame and meta.
@@ -18,23 +26,24 @@ class EventToSignal(Node):
     -------
     >>> events = tm.makeTimeDataFrame(5, freq='L').rename(columns={'A': 'label', 'B': 'data'})
     >>> labels = ['foo', 'bar', 'zaz', 'rer', 'foo']
-    >>> data = [{'a': 1, 'b': 10}, {'a': 2, 'b': 20}, {}, {}, {'a': 1, 'c': 2},]
+    >>> data = [{'a': 1, 'b': 10}, '{"a": 2, "b": 20}', {}, {}, {'a': 1, 'c': 2},]
     >>> events.label = labels
     >>> events.data = data
     >>> events
                                 label               data
         2000-01-01 00:00:00.000   foo  {'a': 1, 'b': 10}
-        2000-01-01 00:00:00.001   bar  {'a': 2, 'b': 20}
+        2000-01-01 00:00:00.001   bar  {"a": 2, "b": 20}
         2000-01-01 00:00:00.002   zaz                 {}
         2000-01-01 00:00:00.003   rer                 {}
         2000-01-01 00:00:00.004   foo   {'a': 1, 'c': 2}
-    >>> node = ToSignal(labels=['bar', 'foo'], meta_keys=['a', 'b'])
+    >>> node = EventToSignal(labels=['bar', 'foo'], meta_keys=['a', 'b'], drop_label=False)
+    >>> node.i.data = events
     >>> node.update()
     >>> node.o.data
-                                label  a     b
-        2000-01-01 00:00:00.001   bar  2  20.0
-        2000-01-01 00:00:00.000   foo  1  10.0
-        2000-01-01 00:00:00.004   foo  1   NaN
+                                label    a     b
+        2000-01-01 00:00:00.000   foo  1.0  10.0
+        2000-01-01 00:00:00.001   bar  2.0  20.0
+        2000-01-01 00:00:00.004   foo  1.0   NaN
     """
 
     def __init__(self, meta_keys, labels=None, drop_label=True):
@@ -50,18 +59,52 @@ class EventToSignal(Node):
         if not self.i.ready():
             return
 
-        # copy the data and the meta
-        self.o = self.i
+        events = self.i.data
         if self._labels is not None:
-            idx = self.i.data.label.isin(self._labels)
-            self.i.data = self.i.data.loc[idx]
+            events = events[events['label'].isin(self._labels)]
 
-        selected_meta = pd.DataFrame(index=self.i.data.index, columns=self._meta_keys)
+        data = pd.DataFrame(_parse(events['data'].to_numpy(dtype=object), self._meta_keys), index=events.index,
+                            columns=self._meta_keys, copy=False)
+        if not self._drop_label:
+            data.insert(0, 'label', events['label'])
 
-        for meta_key in self._meta_keys:
-            selected_meta[meta_key] = [a[meta_key] for a in self.i.data['data'].values]
+        self.o.data = data
+        self.o.meta = self.i.meta
 
-        self.o.data = selected_meta
 
-        if not self._drop_label:
-            self.o.data = pd.concat([self.i.data[['label']], self.o.data], axis=1)
+def _parse(values, keys):
+    """ Extract numeric values from the event data.
+
+    Each JSON string is decoded on its own. Values that are missing, not numeric, or that
+    belong to data that is not a dict (eg. ``null`` or invalid JSON) are filled with NaN.
+
+    Args:
+        values (ndarray): Event data as an object array, either dicts, JSON strings or nulls.
+        keys (list): Keys to extract.
+
+    Returns:
+        ndarray: Values, shape (n_events, n_keys).
+    """
+    strings = _types(values) == str
+    if strings.any():
+        values = values.copy()
+        values[strings] = np.fromiter(map(_decode, values[strings]), dtype=object, count=strings.sum())
+    dicts = _types(values) == dict
+    data = np.full((len(values), len(keys)), np.nan)
+    for column, key in enumerate(keys):
+        selected = np.fromiter(map(methodcaller('get', key), values[dicts]), dtype=object, count=dicts.sum())
+        data[dicts, column] = pd.to_numeric(selected, errors='coerce')
+    return data
+
+
+def _types(values):
+    """ Type of each value, as an object array."""
+    return np.fromiter(map(type, values), dtype=object, count=len(values))
+
+
+def _decode(value):
+    """ Decode a JSON string, or return None if it is invalid."""
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
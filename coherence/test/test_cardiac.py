@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.interpolate import CubicSpline
+from scipy.signal import get_window
+from nodes.cardiac import HRVSpectrum
+
+def _beats(count=300):
+    np.random.seed(42)
+    times = np.arange(count)
+    intervals = .9 + .1 * np.sin(2 * np.pi * .1 * times) + .05 * np.sin(2 * np.pi * .3 * times) + .02 * np.random.randn(count)
+    index = pd.Timestamp("2023-01-01") + pd.to_timedelta(np.cumsum(intervals), unit="s")
+    return pd.DataFrame({"interval": intervals}, index=index)
+
+def _cubic(times, values, grid, lookback):
+    # Each sample is interpolated with a spline on the beats up to the next one
+    tachogram = np.interp(grid, times, values)
+    beats = np.searchsorted(times, grid)
+    for beat in range(3, len(times)):
+        samples = beats == beat
+        start = max(0, beat + 1 - lookback)
+        tachogram[samples] = CubicSpline(times[start:beat + 1], values[start:beat + 1])(grid[samples])
+    return tachogram
+
+def _reference(beats, rate, length, lf, hf, lookback=None):
+    # Tachogram resampled over the whole recording, then a Hann-windowed FFT at each beat
+    times = np.asarray((beats.index - beats.index[0]) / pd.Timedelta(seconds=1))
+    grid = np.arange(int(np.floor(times[-1] * rate)) + 1) / rate
+    if lookback:
+        tachogram = _cubic(times, beats["interval"].to_numpy(), grid, lookback)
+    else:
+        tachogram = np.interp(grid, times, beats["interval"])
+    window = get_window("hann", length)
+    frequencies = np.fft.rfftfreq(length, 1 / rate)
+    rows = []
+    for time in times:
+        end = int(np.floor(time * rate)) + 1
+        if end < length:
+            rows.append([np.nan] * 3)
+            continue
+        samples = tachogram[end - length:end]
+        power = np.abs(np.fft.rfft((samples - samples.mean()) * window)) ** 2
+        lf_power = power[(frequencies >= lf[0]) & (frequencies < lf[1])].sum() / power[1:].sum()
+        hf_power = power[(frequencies >= hf[0]) & (frequencies < hf[1])].sum() / power[1:].sum()
+        rows.append([lf_power, hf_power, lf_power / hf_power / 6])
+    return pd.DataFrame(rows, index=beats.index, columns=["lf", "hf", "lf/hf"]).dropna()
+
+@pytest.mark.parametrize("sizes", [[300], [1] * 300, [7, 50, 13, 230]])
+def test_hrv_spectrum(sizes):
+    beats = _beats()
+    node = HRVSpectrum(rate=4, length=32)
+    chunks = []
+    start = 0
+    for size in sizes:
+        node.clear()
+        node.i.data = beats.iloc[start:start + size]
+        node.update()
+        if node.o.data is not None:
+            chunks.append(node.o.data)
+        start += size
+    result = pd.concat(chunks)
+    expected = _reference(beats, 4, 128, [0.04, 0.15], [0.15, 0.4])
+    pd.testing.assert_frame_equal(result, expected, check_freq=False, rtol=1e-8)
+
+@pytest.mark.parametrize("lookback", [4, 6])
+def test_hrv_spectrum_cubic(lookback):
+    beats = _beats()
+    node = HRVSpectrum(rate=4, length=32, interpolation="cubic", lookback=lookback)
+    chunks = []
+    for start in range(0, 300, 25):
+        node.clear()
+        node.i.data = beats.iloc[start:start + 25]
+        node.update()
+        if node.o.data is not None:
+            chunks.append(node.o.data)
+    result = pd.concat(chunks)
+    expected = _reference(beats, 4, 128, [0.04, 0.15], [0.15, 0.4], lookback)
+    pd.testing.assert_frame_equal(result, expected, check_freq=False, rtol=1e-8)
+    # The interpolation matters
+    assert not np.allclose(result, _reference(beats, 4, 128, [0.04, 0.15], [0.15, 0.4]), rtol=1e-3)
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from nodes.events import EventToSignal
+
+def _events(labels, data):
+    index = pd.date_range("2023-01-01", periods=len(labels), freq="ms")
+    return pd.DataFrame({"label": labels, "data": data}, index=index)
+
+def _run(node, events):
+    node.clear()
+    node.i.data = events
+    node.update()
+    return node.o.data
+
+def test_events():
+    events = _events(["peak", "other", "peak"], [{"interval": .8, "value": 1}, {"interval": 1}, '{"interval": 0.9, "value": 2}'])
+    data = _run(EventToSignal(labels="peak", meta_keys=["interval", "value"]), events)
+    expected = pd.DataFrame({"interval": [.8, .9], "value": [1., 2.]}, index=events.index[[0, 2]])
+    pd.testing.assert_frame_equal(data, expected, check_freq=False)
+
+def test_events_label():
+    events = _events(["peak", "other"], ['{"value": 1}', '{"value": 2}'])
+    data = _run(EventToSignal(meta_keys="value", drop_label=False), events)
+    assert list(data.columns) == ["label", "value"]
+    assert list(data["label"]) == ["peak", "other"]
+
+def test_events_missing_key():
+    events = _events(["peak"] * 3, ['{"interval": 0.8}', {"value": 3}, "{}"])
+    data = _run(EventToSignal(labels="peak", meta_keys=["interval", "value"]), events)
+    np.testing.assert_array_equal(data.values, [[.8, np.nan], [np.nan, 3], [np.nan, np.nan]])
+
+def test_events_null():
+    events = _events(["peak"] * 4, ["null", None, '{"value": 1}', "[1, 2]"])
+    data = _run(EventToSignal(labels="peak", meta_keys="value"), events)
+    np.testing.assert_array_equal(data["value"].values, [np.nan, np.nan, 1, np.nan])
+    assert data["value"].dtype == float
+
+def test_events_invalid():
+    events = _events(["peak"] * 5, ["", "{bad", "1, 2", '"foo"', '{"value": 1}'])
+    data = _run(EventToSignal(labels="peak", meta_keys="value"), events)
+    np.testing.assert_array_equal(data["value"].values, [np.nan, np.nan, np.nan, np.nan, 1])
+
+def test_events_not_numeric():
+    events = _events(["peak"] * 3, ['{"value": "foo"}', {"value": None}, '{"value": 2}'])
+    data = _run(EventToSignal(labels="peak", meta_keys="value"), events)
+    np.testing.assert_array_equal(data["value"].values, [np.nan, np.nan, 2])
+
+def test_events_empty():
+    events = _events(["other"], ['{"value": 1}'])
+    data = _run(EventToSignal(labels="peak", meta_keys="value"), events)
+    assert data.empty and list(data.columns) == ["value"]
@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+from math import inf
+from itertools import count
+from importlib import import_module
+from weakref import WeakValueDictionary
+from time import perf_counter, time_ns
+from multiprocessing import current_process
+from timeflux.core.io import Port
+from timeflux.core.node import Node
+from timeflux.core.registry import Registry
+
+_NANOSECONDS = {"s": 10 ** 9, "ms": 10 ** 6, "us": 10 ** 3, "ns": 1}
+
+COLUMNS = ["node", "updates", "duration", "duration_max", "rows_in", "rows_out", "age", "decisions", "decision"]
+
+# Instruments of this process, that is of this graph, in order of creation
+_instruments = WeakValueDictionary()
+_order = count()
+
+
+class Instrument(Node):
+    """Measure the performance of a node
+
+    This node wraps another node of the graph, and stands for it: the ports are those of the
+    wrapped node, so the edges are unchanged. Each update is timed, and the rows received and
+    sent are counted. Once the update is done, the age of the newest input sample (the current
+    time minus the last timestamp of the inputs) is measured. When the wrapped node provides
+    the timestamp of the last sample a decision is based on, in the ``sample`` meta key of an
+    output, the sample-to-decision latency is measured as well. The instrumentation costs a
+    few microseconds per update.
+
+    The measures are collected by the ``Metrics`` node of the same graph.
+
+    Args:
+        node (str): Wrapped node class, with its module, eg. ``nodes.predict.Accumulate``.
+        id (str|None): Name of the node in the metrics. If None, the class name is used
+            (default: None).
+        **params: Parameters of the wrapped node.
+
+    Example:
+        .. code-block:: yaml
+
+           - id: predict
+             module: nodes.metrics
+             class: Instrument
+             params:
+               node: nodes.predict.Accumulate
+               id: predict
+               threshold: 2
+    """
+
+    def __init__(self, node, id=None, **params):
+        module, _, name = node.rpartition(".")
+        self._node = getattr(import_module(module), name)(**params)
+        graph = current_process().name
+        self.name = (id or name) if graph == "MainProcess" else f"{graph}.{id or name}"
+        self.stats = _reset([None] * 8)
+        self._key = next(_order)
+        _instruments[self._key] = self
+
+    def __getattr__(self, name):
+        # Called for the attributes that are not set on the instrument, that is the ports
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._node, name)
+
+    def clear(self):
+        self._node.clear()
+
+    def iterate(self, name="*"):
+        return self._node.iterate(name)
+
+    def update(self):
+        stats = self.stats
+        rows_in, newest = _inputs(self._node)
+        start = perf_counter()
+        self._node.update()
+        duration = (perf_counter() - start) * 1e3
+        rows_out, sample = _outputs(self._node)
+        stats[0] += 1
+        stats[1] += duration
+        if duration > stats[2]:
+            stats[2] = duration
+        stats[3] += rows_in
+        stats[4] += rows_out
+        if newest is not None or sample is not None:
+            now = time_ns()
+            if newest is not None and (now - newest) / 1e6 > stats[5]:
+                stats[5] = (now - newest) / 1e6
+            if sample is not None:
+                stats[6] += 1
+                stats[7] = max(stats[7], (now - sample) / 1e6)
+
+    def terminate(self):
+        _instruments.pop(self._key, None)
+        self._node.terminate()
+
+
+class Metrics(Node):
+    """Send the performance of the instrumented nodes of the graph
+
+    The measures of the ``Instrument`` nodes of the same graph are aggregated per node over a
+    fixed interval, and sent as one row per node, so that the metrics of several graphs can be
+    published on the same topic and recorded together.
+
+    Attributes:
+        o (Port): Metrics, provides DataFrame with columns: 'node', 'updates', 'duration'
+            (mean, in ms), 'duration_max' (in ms), 'rows_in', 'rows_out', 'age' (max, in ms),
+            'decisions' and 'decision' (max sample-to-decision latency, in ms).
+
+    Args:
+        interval (float): Aggregation interval, in seconds (default: 1).
+    """
+
+    def __init__(self, interval=1):
+        self._interval = interval
+        self._start = None
+
+    def update(self):
+        if self._start is None:
+            self._start = Registry.cycle_start
+        if Registry.cycle_start - self._start >= self._interval:
+            instruments = list(_instruments.values())
+            if instruments:
+                self._send(instruments)
+            self._start = Registry.cycle_start
+
+    def _send(self, instruments):
+        values = np.array([instrument.stats for instrument in instruments], dtype=float)
+        for instrument in instruments:
+            _reset(instrument.stats)
+        updates, decisions = values[:, 0], values[:, 6]
+        values[updates > 0, 1] /= updates[updates > 0]
+        values[updates == 0, 1:3] = np.nan
+        values[decisions == 0, 7] = np.nan
+        values[values == -inf] = np.nan
+        index = np.full(len(values), np.datetime64(round(Registry.cycle_start * 1e6), "us"))
+        self.o.data = pd.DataFrame(values, index=index, columns=COLUMNS[1:])
+        self.o.data.insert(0, "node", [instrument.name for instrument in instruments])
+
+
+def _reset(stats):
+    stats[:] = [0, 0., 0., 0, 0, -inf, 0, -inf]
+    return stats
+
+
+def _inputs(node):
+    """Number of input rows, and timestamp of the newest input sample, in ns"""
+    rows = 0
+    newest = None
+    for name, port in node.ports.items():
+        data = port.data
+        if data is not None and name[0] == "i":
+            rows += len(data)
+            index = data.index
+            if isinstance(index, pd.DatetimeIndex) and len(index):
+                last = index.asi8[-1] * _NANOSECONDS[index.unit]
+                if newest is None or last > newest:
+                    newest = last
+    return rows, newest
+
+
+def _outputs(node):
+    """Number of output rows, and timestamp of the last sample of a decision, in ns, if any"""
+    rows = 0
+    sample = None
+    # Outputs may be aliased to inputs (``self.o = self.i``), so the ports are looked up on the node
+    for name, port in vars(node).items():
+        if name[0] == "o" and isinstance(port, Port):
+            if port.data is not None:
+                rows += len(port.data)
+                if port.meta and "sample" in port.meta:
+                    sample = pd.Timestamp(port.meta["sample"]).as_unit("ns").value
+    return rows, sample
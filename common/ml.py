@@ -0,0 +1,25 @@
+import numpy as np
+from timeflux.nodes.ml import Pipeline as BasePipeline
+
+class Pipeline(BasePipeline):
+    """Machine learning pipeline with typed probabilities
+
+    Same as ``timeflux.nodes.ml.Pipeline``, but in ``predict_proba`` mode, the probabilities are
+    also provided as a 2-D float array in the ``proba`` meta key of the events port, one row per
+    ``predict_proba`` event. Downstream nodes can then use them directly instead of parsing the
+    JSON data of each event, which is kept for other consumers (e.g. the UI).
+    For epochs, the timestamp of the last sample of each epoch is provided in the ``samples``
+    meta key, so that the latency of the decisions can be measured downstream.
+
+    Attributes:
+        o_events (Port): Predictions, provides DataFrame and meta.
+    """
+
+    def _send(self):
+        out = self._out
+        super()._send()
+        if out is not None and self.mode == "predict_proba" and self.o_events.ready():
+            meta = {**self.o_events.meta, "proba": np.asarray(out, dtype=float)}
+            if self._dimensions == 3 and len(self._X_indices) == len(out):
+                meta["samples"] = [indices[-1] for indices in self._X_indices]
+            self.o_events.meta = meta
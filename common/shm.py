@@ -0,0 +1,441 @@
+"""Publish and subscribe to numeric streams through shared memory
+
+On a single machine, the `Pub` and `Sub` nodes of this module can be used instead of the ones
+of ``timeflux.nodes.zmq`` for the bulk signals (raw or filtered data), with the same
+parameters. The samples do not go through the broker and are never serialized: each topic is
+a ring buffer in shared memory, written by a single publisher and read by any number of
+subscribers, each one with its own cursor. Events and other non-numeric streams must still go
+through the broker.
+"""
+
+import os
+import pickle
+import weakref
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory, resource_tracker
+from timeflux.core.node import Node
+
+# Fields of the header
+STATE, HEAD, CAPACITY, CHANNELS, META_SEQUENCE, META_LENGTH, META_SIZE, DESCRIPTION_LENGTH, OWNER = range(9)
+
+# States of a ring buffer
+INITIALIZING, OPEN, CLOSED = range(3)
+
+_HEADER = 128  # bytes
+_ALIGNMENT = 64  # bytes
+
+
+class Pub(Node):
+    """Publish a numeric stream to a shared-memory ring buffer
+
+    The ring buffer is created with the first chunk of data, which sets the columns and the
+    data type of the stream, and removed when the node terminates. As with the ZMQ
+    publisher, dynamic inputs are published to the topic followed by the suffix of the port.
+
+    Attributes:
+        i (Port): Default input, expects DataFrame and meta.
+        i_* (Port): Dynamic inputs, expect DataFrame and meta.
+
+    Args:
+        topic (str): The name of the topic.
+        capacity (int): The number of samples kept in the ring buffer. Subscribers must read
+            the data before it is overwritten, and keep it no longer than it takes to write
+            as many samples (default: 32768, more than 15 seconds at 2 kHz).
+        dtype (str|None): The data type of the samples. If None, the data type of the first
+            chunk is used (default: None).
+        meta_size (int): The maximum size of the pickled meta, in bytes (default: 65536).
+        namespace (str): A prefix for the names of the ring buffers, so that several
+            applications can run on the same machine (default: ``timeflux``).
+    """
+
+    def __init__(self, topic, capacity=32768, dtype=None, meta_size=65536, namespace="timeflux"):
+        if not topic.isidentifier():
+            raise ValueError(f"Invalid topic name: {topic}")
+        self._topic = topic
+        self._capacity = capacity
+        self._dtype = None if dtype is None else np.dtype(dtype)
+        self._meta_size = meta_size
+        self._namespace = namespace
+        self._rings = {}
+        # Remove the ring buffer left over by a previous run, if any
+        Ring.remove(_name(namespace, topic))
+
+    def update(self):
+        for _, suffix, port in self.iterate("i*"):
+            if not port.ready() and not port.meta:
+                continue
+            topic = self._topic + suffix
+            ring = self._rings.get(topic)
+            if ring is None:
+                if not port.ready():
+                    continue  # The meta is published along with the first chunk
+                ring = self._rings[topic] = self._create(topic, port.data)
+            if port.ready():
+                ring.write(port.data)
+            if port.meta:
+                if not ring.write_meta(port.meta):
+                    self.logger.warning("The meta of topic '%s' is too large, and was not published", topic)
+
+    def terminate(self):
+        for ring in self._rings.values():
+            ring.close(unlink=True)
+        self._rings = {}
+
+    def _create(self, topic, data):
+        if not isinstance(data.index, pd.DatetimeIndex):
+            raise ValueError(f"Only time series can be published to topic '{topic}'")
+        if not all(pd.api.types.is_numeric_dtype(dtype) for dtype in data.dtypes):
+            raise ValueError(f"Only numeric data can be published to topic '{topic}'")
+        dtype = self._dtype or np.result_type(*data.dtypes)
+        self.logger.debug("Publishing %d channels of %s to topic '%s'", data.shape[1], dtype, topic)
+        name = _name(self._namespace, topic)
+        Ring.remove(name)
+        return Ring.create(name, data.columns, dtype, self._capacity, self._meta_size)
+
+
+class Sub(Node):
+    """Subscribe to numeric streams published to shared-memory ring buffers
+
+    For each topic, the samples published since the last update are provided on the
+    ``o_<topic>`` output. The samples are not copied: they are a read-only view of the ring
+    buffer, which stays valid until the publisher writes ``capacity`` more samples. Nodes that
+    modify their input in place need a copy.
+
+    The subscription starts with the samples published after the ring buffer is found, and
+    with the last published meta. If a subscriber falls behind by more than ``capacity``
+    samples, the oldest ones are lost and a warning is issued.
+
+    Attributes:
+        o_* (Port): Dynamic outputs, one per topic, provide DataFrame and meta.
+
+    Args:
+        topics (list): The names of the topics.
+        copy (bool): Provide a copy of the data instead of a view (default: False).
+        namespace (str): The prefix of the names of the ring buffers (default: ``timeflux``).
+    """
+
+    def __init__(self, topics, copy=False, namespace="timeflux"):
+        for topic in topics:
+            if not topic.isidentifier():
+                raise ValueError(f"Invalid topic name: {topic}")
+        self._topics = topics
+        self._copy = copy
+        self._namespace = namespace
+        self._rings = {}
+        self._cursors = {}
+
+    def update(self):
+        for topic in self._topics:
+            ring = self._rings.get(topic)
+            if ring is None:
+                ring = Ring.open(_name(self._namespace, topic))
+                if ring is None:
+                    continue  # Not published yet
+                self._rings[topic] = ring
+                self._cursors[topic] = ring.head
+            port = getattr(self, "o_" + topic)
+            meta = ring.read_meta()
+            if meta:
+                port.meta = meta
+            cursor, lost, data = ring.read(self._cursors[topic], self._copy)
+            self._cursors[topic] = cursor
+            if lost:
+                self.logger.warning("Lost %d samples of topic '%s'", lost, topic)
+            if data is not None:
+                port.data = data
+            elif ring.closed:
+                # The publisher is gone: wait for the next one
+                ring.close()
+                del self._rings[topic]
+
+    def terminate(self):
+        for ring in self._rings.values():
+            ring.close()
+        self._rings = {}
+
+
+class Ring:
+    """A ring buffer of timestamped samples, in shared memory
+
+    The segment is made of a header, the description of the stream (columns and data type),
+    the last published meta, and the ring buffer itself: an array of timestamps, in
+    nanoseconds, and an array of samples. Both arrays are mirrored, each sample being written
+    at two positions, ``capacity`` apart, so that any range of samples is contiguous and can
+    be read without a copy.
+
+    The head, that is the number of samples written so far, is updated once the samples are
+    written, so that readers never see a partial chunk. The meta is protected by a sequence
+    number, which is odd while the meta is being written.
+
+    Use `Ring.create` or `Ring.open` rather than the constructor.
+    """
+
+    def __init__(self, memory, owner=False):
+        self._memory = memory
+        self._owner = owner
+        buffer = np.asarray(_Segment(memory))
+        self._header = buffer[:_HEADER].view(np.int64)
+        capacity, channels, meta_size, length = (
+            int(self._header[field]) for field in (CAPACITY, CHANNELS, META_SIZE, DESCRIPTION_LENGTH)
+        )
+        description = pickle.loads(buffer[_HEADER:_HEADER + length].tobytes())
+        self.columns = pd.Index(description["columns"])
+        self.dtype = np.dtype(description["dtype"])
+        offset = _HEADER + _align(length)
+        self._meta = buffer[offset:offset + meta_size]
+        self._meta_sequence = 0
+        offset += _align(meta_size)
+        self._timestamps = buffer[offset:offset + 2 * capacity * 8].view(np.int64)
+        offset += _align(self._timestamps.nbytes)
+        size = 2 * capacity * channels * self.dtype.itemsize
+        self._samples = buffer[offset:offset + size].view(self.dtype).reshape(2 * capacity, channels)
+        self.capacity = capacity
+        if not owner:
+            self._timestamps.flags.writeable = False
+            self._samples.flags.writeable = False
+
+    @classmethod
+    def create(cls, name, columns, dtype, capacity, meta_size=65536):
+        """Create a ring buffer
+
+        Args:
+            name (str): The name of the shared-memory segment.
+            columns (Index): The columns of the stream.
+            dtype (dtype): The data type of the samples.
+            capacity (int): The number of samples.
+            meta_size (int): The maximum size of the pickled meta, in bytes.
+
+        Returns:
+            Ring: The ring buffer, for writing.
+        """
+        dtype = np.dtype(dtype)
+        description = pickle.dumps({"columns": list(columns), "dtype": dtype.str})
+        channels = len(columns)
+        size = (
+            _HEADER + _align(len(description)) + _align(meta_size)
+            + _align(2 * capacity * 8) + 2 * capacity * channels * dtype.itemsize
+        )
+        memory = shared_memory.SharedMemory(name, create=True, size=size)
+        header = np.ndarray((OWNER + 1,), np.int64, memory.buf)
+        header[:] = [INITIALIZING, 0, capacity, channels, 0, 0, meta_size, len(description), os.getpid()]
+        memory.buf[_HEADER:_HEADER + len(description)] = description
+        del header
+        ring = cls(memory, owner=True)
+        # Readers may now map the segment
+        ring._header[STATE] = OPEN
+        return ring
+
+    @classmethod
+    def open(cls, name):
+        """Open an existing ring buffer, for reading
+
+        Returns:
+            Ring: The ring buffer, or None if it does not exist or is not ready yet.
+        """
+        try:
+            memory = _attach(name)
+        except (FileNotFoundError, ValueError):
+            return None  # Not created yet, or not sized yet
+        header = np.ndarray((OWNER + 1,), np.int64, memory.buf)
+        state = header[STATE]
+        del header
+        if state != OPEN:
+            memory.close()
+            return None
+        return cls(memory)
+
+    @staticmethod
+    def remove(name):
+        """Remove a ring buffer left over by a previous run, if any
+
+        Only a ring buffer that was closed, or whose publisher is no longer running, is removed.
+
+        Raises:
+            FileExistsError: If the ring buffer is still in use by another publisher.
+        """
+        try:
+            memory = _attach(name)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            raise FileExistsError(f"The shared memory '{name}' is being created by another publisher")
+        header = np.ndarray((OWNER + 1,), np.int64, memory.buf)
+        state, owner = int(header[STATE]), int(header[OWNER])
+        del header
+        memory.close()
+        if state != CLOSED and _running(owner):
+            raise FileExistsError(
+                f"The shared memory '{name}' is in use by another publisher (process {owner}): "
+                "use another topic or namespace"
+            )
+        try:
+            # Tracked, as it is removed right away
+            memory = shared_memory.SharedMemory(name)
+        except (FileNotFoundError, ValueError):
+            return
+        memory.close()
+        try:
+            memory.unlink()
+        except FileNotFoundError:
+            pass
+
+    @property
+    def head(self):
+        return int(self._header[HEAD])
+
+    @property
+    def closed(self):
+        return self._header[STATE] == CLOSED
+
+    def write(self, data):
+        """Append a chunk of data
+
+        Only the last ``capacity`` samples of a larger chunk are written.
+
+        Args:
+            data (DataFrame): The samples, with a DatetimeIndex and the columns of the stream.
+        """
+        if data.shape[1] != self._samples.shape[1] or not data.columns.equals(self.columns):
+            raise ValueError("The columns changed during the publication")
+        values = data.to_numpy(self.dtype, copy=False)
+        timestamps = data.index.as_unit("ns").asi8
+        if len(values) > self.capacity:
+            values, timestamps = values[-self.capacity:], timestamps[-self.capacity:]
+        head = int(self._header[HEAD])
+        count = len(values)
+        start = head % self.capacity
+        stop = start + count
+        self._samples[start:stop] = values
+        self._timestamps[start:stop] = timestamps
+        # Mirror the samples, in the second half first then in the first half
+        mirrored = min(stop, self.capacity) - start
+        self._samples[start + self.capacity:start + self.capacity + mirrored] = values[:mirrored]
+        self._timestamps[start + self.capacity:start + self.capacity + mirrored] = timestamps[:mirrored]
+        if stop > self.capacity:
+            self._samples[:stop - self.capacity] = values[mirrored:]
+            self._timestamps[:stop - self.capacity] = timestamps[mirrored:]
+        self._header[HEAD] = head + count
+
+    def read(self, cursor, copy=False):
+        """Read the samples written since a cursor
+
+        Args:
+            cursor (int): The number of samples already read.
+            copy (bool): Copy the samples instead of providing a view. The timestamps are
+                always copied.
+
+        Returns:
+            tuple: The new cursor, the number of samples lost, and the samples as a DataFrame,
+                or None if there is no new sample.
+        """
+        head = int(self._header[HEAD])
+        lost = max(0, head - cursor - self.capacity)
+        cursor += lost
+        if head == cursor:
+            return cursor, lost, None
+        start = cursor % self.capacity
+        stop = start + head - cursor
+        # The index is always copied, as copying a DataFrame does not copy its index
+        index = pd.DatetimeIndex(self._timestamps[start:stop].view("M8[ns]"), copy=True)
+        data = pd.DataFrame(self._samples[start:stop], index=index, columns=self.columns, copy=copy)
+        return head, lost, data
+
+    def write_meta(self, meta):
+        """Publish the meta
+
+        Returns:
+            bool: False if the meta is too large.
+        """
+        meta = pickle.dumps(meta)
+        if len(meta) > len(self._meta):
+            return False
+        self._header[META_SEQUENCE] += 1
+        self._meta[:len(meta)] = np.frombuffer(meta, np.uint8)
+        self._header[META_LENGTH] = len(meta)
+        self._header[META_SEQUENCE] += 1
+        return True
+
+    def read_meta(self):
+        """Read the meta, if it changed since the last call
+
+        Returns:
+            dict: The meta, or None if it did not change or is being written.
+        """
+        sequence = int(self._header[META_SEQUENCE])
+        if sequence == self._meta_sequence or sequence % 2:
+            return None
+        meta = self._meta[:int(self._header[META_LENGTH])].tobytes()
+        if self._header[META_SEQUENCE] != sequence:
+            return None  # Written in the meantime, read it on the next call
+        self._meta_sequence = sequence
+        return pickle.loads(meta)
+
+    def close(self, unlink=False):
+        """Release the segment, and remove it if requested
+
+        The segment is unmapped once the views of it that are still in use are gone.
+        """
+        if self._owner:
+            self._header[STATE] = CLOSED
+        del self._header, self._meta, self._timestamps, self._samples
+        if unlink:
+            try:
+                self._memory.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _name(namespace, topic):
+    return f"{namespace}_{topic}"
+
+
+def _align(size):
+    return -(-int(size) // _ALIGNMENT) * _ALIGNMENT
+
+
+def _attach(name):
+    """Map an existing segment, without handing it over to the resource tracker
+
+    Otherwise, the tracker of a subscriber would remove the segment when the subscriber exits,
+    or complain when the publisher removes it.
+    """
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:  # Python < 3.13
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name)
+        finally:
+            resource_tracker.register = register
+
+
+def _running(pid):
+    """Whether a process may still be running
+
+    Only a process that does not exist is known to be dead. On Windows, a segment is removed
+    along with its last handle, so a segment that still exists is in use.
+    """
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class _Segment:
+    """The mapping of a shared-memory segment, as seen by NumPy
+
+    The arrays of a ring buffer are built from this object, so that the segment stays mapped
+    for as long as any of them, or any view of them, is in use. It is closed along with the
+    last one.
+    """
+
+    def __init__(self, memory):
+        self.__array_interface__ = np.frombuffer(memory.buf, np.uint8).__array_interface__
+        weakref.finalize(self, memory.close)
@@ -0,0 +1,8 @@
+"""Test configuration"""
+
+import os
+import sys
+import pytest
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.append(root)
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from timeflux.core.node import Node
+from timeflux.core.registry import Registry
+from timeflux.core.scheduler import Scheduler
+from common.metrics import Instrument, Metrics
+
+class Source(Node):
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+
+    def update(self):
+        self.o.data, self.o.meta = next(self._chunks)
+
+class Sink(Node):
+    def update(self):
+        self.received = self.i.data
+
+def _scheduler(chunks, node, metrics):
+    nodes = {"source": Source(chunks), "node": node, "sink": Sink(), "metrics": metrics}
+    path = [
+        {"node": "source", "predecessors": []},
+        {"node": "node", "predecessors": [{"node": "source", "src_port": "o", "dst_port": "i", "copy": False}]},
+        {"node": "sink", "predecessors": [{"node": "node", "src_port": "o", "dst_port": "i", "copy": False}]},
+        {"node": "metrics", "predecessors": []},
+    ]
+    return Scheduler(path, nodes, 0), nodes
+
+def _chunk(rows, meta={}):
+    now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+    index = now - pd.to_timedelta(np.arange(rows)[::-1], unit="ms")
+    return pd.DataFrame(np.random.rand(rows, 3), index=index, columns=["a", "b", "c"]), meta
+
+def test_metrics():
+    node = Instrument(node="timeflux.nodes.query.LocQuery", id="query", key=["a", "b"])
+    metrics = Metrics(interval=1)
+    scheduler, nodes = _scheduler([_chunk(10) for _ in range(3)], node, metrics)
+    for cycle in range(2):
+        Registry.cycle_start = cycle * .5
+        scheduler.next()
+        assert metrics.o.data is None
+        # The instrument stands for the wrapped node
+        assert list(nodes["sink"].received.columns) == ["a", "b"]
+    Registry.cycle_start = 1
+    scheduler.next()
+    row = metrics.o.data.iloc[0]
+    assert len(metrics.o.data) == 1
+    assert row["node"] == "query"
+    assert row["updates"] == 3
+    assert row["rows_in"] == 30
+    assert row["rows_out"] == 30  # the output is aliased to the input
+    assert row["age"] >= 0
+    assert 0 < row["duration"] <= row["duration_max"]
+    assert row["decisions"] == 0
+    assert np.isnan(row["decision"])
+    node.terminate()
+
+def test_metrics_decision():
+    sample = pd.Timestamp.now(tz="UTC").tz_localize(None) - pd.Timedelta(seconds=1)
+    node = Instrument(node="timeflux.nodes.query.LocQuery", key=["a"])
+    metrics = Metrics(interval=0)
+    scheduler, _ = _scheduler([_chunk(5, {"sample": sample})] * 2, node, metrics)
+    Registry.cycle_start = 0
+    scheduler.next()
+    row = metrics.o.data.iloc[0]
+    assert row["node"] == "LocQuery"
+    assert row["decisions"] == 1
+    assert row["decision"] == pytest.approx(1000, abs=500)
+    # The measures are reset after each interval
+    Registry.cycle_start = 1
+    scheduler.next()
+    assert metrics.o.data.iloc[0]["updates"] == 1
+    node.terminate()
+
+def test_metrics_without_instruments():
+    metrics = Metrics(interval=0)
+    Registry.cycle_start = 0
+    metrics.update()
+    assert metrics.o.data is None
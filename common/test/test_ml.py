@@ -0,0 +1,51 @@
+import json
+import time
+import numpy as np
+import pandas as pd
+from timeflux.nodes.ml import READY
+from common.ml import Pipeline
+
+STEPS = [
+    {"module": "timeflux.estimators.transformers.shape", "class": "Reduce", "args": {"axis": 1}},
+    {"module": "sklearn.linear_model", "class": "LogisticRegression"},
+]
+
+def _epochs(start, count, rng):
+    epochs = []
+    for k in range(count):
+        index = [pd.Timestamp("2024-01-01") + pd.Timedelta(seconds=start + k)]
+        data = pd.DataFrame(rng.standard_normal((1, 2)) + 3 * (k % 2), index=index, columns=["a", "b"])
+        epochs.append((data, {"epoch": {"context": {"target": k % 2}}}))
+    return epochs
+
+def _update(node, event=None, time=0, epochs=(), prefix="i_"):
+    node.clear()
+    if event:
+        index = [pd.Timestamp("2024-01-01") + pd.Timedelta(seconds=time)]
+        node.i_events.data = pd.DataFrame({"label": [event], "data": [None]}, index=index)
+    for k, (data, meta) in enumerate(epochs):
+        port = getattr(node, f"{prefix}{k}")
+        port.data, port.meta = data, meta
+    node.update()
+
+def test_pipeline_proba():
+    rng = np.random.default_rng(42)
+    node = Pipeline(steps=STEPS, mode="predict_proba", event_start_accumulation="training_begins",
+                    event_stop_accumulation="training_ends", event_start_training="training_ends")
+    _update(node, "training_begins", 0)
+    _update(node, epochs=_epochs(10, 20, rng), prefix="i_training_")
+    _update(node, "training_ends", 40)
+    deadline = time.time() + 10
+    while node._status != READY and time.time() < deadline:
+        time.sleep(.01)
+        _update(node)
+    epochs = _epochs(60, 3, rng)
+    _update(node, epochs=epochs)
+    proba = node.o_events.meta["proba"]
+    assert proba.dtype == float and proba.shape == (3, 2)
+    # The typed probabilities match the JSON data of the events
+    results = [json.loads(data)["result"] for data in node.o_events.data["data"]]
+    np.testing.assert_allclose(proba, results)
+    assert list(proba.argmax(axis=1)) == [0, 1, 0]
+    # The sample of each epoch
+    assert [pd.Timestamp(sample) for sample in node.o_events.meta["samples"]] == [data.index[-1] for data, _ in epochs]
@@ -0,0 +1,155 @@
+import os
+import gc
+import logging
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+from common.shm import Pub, Sub, Ring, OWNER
+
+def _chunk(start, stop, channels=2):
+    index = (pd.Timestamp("2024-01-01") + pd.to_timedelta(np.arange(start, stop), unit="ms")).as_unit("ns")
+    data = np.arange(start, stop)[:, np.newaxis] * np.ones(channels)
+    return pd.DataFrame(data, index=index, columns=[f"ch{channel}" for channel in range(channels)])
+
+def _publish(pub, data, meta={}, port="i"):
+    pub.clear()
+    getattr(pub, port).data = data
+    getattr(pub, port).meta = meta
+    pub.update()
+
+def _receive(sub, topic="test"):
+    sub.clear()
+    sub.update()
+    return getattr(sub, "o_" + topic)
+
+@pytest.fixture()
+def namespace():
+    return f"test{os.getpid()}"
+
+def test_roundtrip(namespace):
+    pub = Pub("test", capacity=100, namespace=namespace)
+    sub = Sub(["test"], namespace=namespace)
+    assert _receive(sub).data is None  # not published yet
+    _publish(pub, _chunk(0, 10), {"rate": 1000})
+    port = _receive(sub)
+    assert port.data is None  # subscribed after the first chunk
+    assert port.meta == {"rate": 1000}
+    _publish(pub, _chunk(10, 30))
+    port = _receive(sub)
+    pd.testing.assert_frame_equal(port.data, _chunk(10, 30), check_freq=False)
+    assert port.meta == {}
+    with pytest.raises(ValueError):
+        port.data.iloc[0, 0] = -1  # read-only view
+    assert _receive(sub).data is None
+    sub.terminate()
+    pub.terminate()
+
+def test_readers(namespace):
+    pub = Pub("test", capacity=100, namespace=namespace)
+    _publish(pub, _chunk(0, 1))
+    fast = Sub(["test"], namespace=namespace)
+    slow = Sub(["test"], namespace=namespace, copy=True)
+    _receive(fast)
+    _receive(slow)
+    chunks = []
+    # Wrap around the ring buffer several times
+    for start in range(1, 300, 30):
+        _publish(pub, _chunk(start, start + 30))
+        data = _receive(fast).data
+        pd.testing.assert_frame_equal(data, _chunk(start, start + 30), check_freq=False)
+        chunks.append(data.copy())
+        if start == 61:
+            data = _receive(slow).data
+            pd.testing.assert_frame_equal(data, _chunk(1, 91), check_freq=False)
+            data.iloc[0, 0] = -1  # private copy
+    pd.testing.assert_frame_equal(pd.concat(chunks), _chunk(1, 301), check_freq=False)
+    fast.terminate()
+    slow.terminate()
+    pub.terminate()
+
+def test_overrun(namespace, caplog):
+    pub = Pub("test", capacity=100, namespace=namespace)
+    _publish(pub, _chunk(0, 1))
+    sub = Sub(["test"], namespace=namespace)
+    _receive(sub)
+    _publish(pub, _chunk(1, 101))
+    _publish(pub, _chunk(101, 151))
+    with caplog.at_level(logging.WARNING):
+        data = _receive(sub).data
+    assert "Lost 50 samples" in caplog.text
+    pd.testing.assert_frame_equal(data, _chunk(51, 151), check_freq=False)
+    sub.terminate()
+    pub.terminate()
+
+def test_suffix(namespace):
+    pub = Pub("test", namespace=namespace)
+    _publish(pub, _chunk(0, 1, 3), port="i_1")
+    sub = Sub(["test_1"], namespace=namespace)
+    _receive(sub, "test_1")
+    _publish(pub, _chunk(1, 5, 3), port="i_1")
+    assert _receive(sub, "test_1").data.shape == (4, 3)
+    sub.terminate()
+    pub.terminate()
+
+def test_restart(namespace):
+    pub = Pub("test", namespace=namespace)
+    _publish(pub, _chunk(0, 1))
+    sub = Sub(["test"], namespace=namespace)
+    _receive(sub)
+    _publish(pub, _chunk(1, 10))
+    data = _receive(sub).data
+    pub.terminate()
+    # The views remain valid once the publisher is gone
+    assert data.iloc[-1, 0] == 9
+    assert _receive(sub).data is None
+    pub = Pub("test", namespace=namespace)
+    _publish(pub, _chunk(0, 1, 4))
+    _receive(sub)
+    _publish(pub, _chunk(1, 3, 4))
+    assert _receive(sub).data.shape == (2, 4)
+    sub.terminate()
+    pub.terminate()
+
+def test_views(namespace):
+    pub = Pub("test", namespace=namespace)
+    _publish(pub, _chunk(0, 1))
+    sub = Sub(["test"], namespace=namespace)
+    _receive(sub)
+    _publish(pub, _chunk(1, 10))
+    data = _receive(sub).data
+    sub.terminate()
+    pub.terminate()
+    gc.collect()
+    # The segment stays mapped as long as the views are in use
+    pd.testing.assert_frame_equal(data, _chunk(1, 10), check_freq=False)
+
+def test_clash(namespace):
+    pub = Pub("test", namespace=namespace)
+    _publish(pub, _chunk(0, 1))
+    with pytest.raises(FileExistsError):
+        Pub("test", namespace=namespace)
+    pub.terminate()
+    Pub("test", namespace=namespace)  # Closed, and removed
+
+def test_leftover(namespace):
+    process = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    ring = Ring.create(f"{namespace}_test", ["ch0"], float, 10)
+    ring._header[OWNER] = int(process.stdout)  # Left open by a dead publisher
+    pub = Pub("test", namespace=namespace)
+    assert Ring.open(f"{namespace}_test") is None
+    _publish(pub, _chunk(0, 1))
+    pub.terminate()
+    ring.close()
+
+def test_invalid(namespace):
+    pub = Pub("test", namespace=namespace)
+    with pytest.raises(ValueError):
+        _publish(pub, pd.DataFrame({"label": ["foo"], "data": [None]}, index=[pd.Timestamp("2024-01-01")]))
+    _publish(pub, _chunk(0, 10))
+    with pytest.raises(ValueError):
+        _publish(pub, _chunk(10, 20, 3))
+    pub.terminate()
+    with pytest.raises(ValueError):
+        Sub(["not a topic"], namespace=namespace)
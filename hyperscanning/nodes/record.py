@@ -0,0 +1,324 @@
+import os
+import json
+import time
+import zlib
+import queue
+import threading
+import numpy as np
+import pandas as pd
+from timeflux.core.node import Node
+from timeflux.core.exceptions import WorkerInterrupt
+
+
+class Record(Node):
+    """Record streams to disk, without blocking the acquisition
+
+    Each input is recorded in its own directory, named after the port, as for the HDF5 `Save`
+    node (``i_eeg_1`` is recorded in ``eeg/1``). The writing is done in a background thread.
+
+    Numeric streams are accumulated in preallocated blocks. Once full, or once its first row
+    is older than the flush interval, each block is compressed column by column and appended
+    to ``data.bin``, and its position, size and time range are appended to the ``index.bin``
+    sidecar, so that any time range can be located without decoding the data. Streams with
+    non-numeric columns, such as events, are appended to a compact ``events.jsonl`` table
+    instead. The meta is saved in ``stream.json`` whenever it changes.
+
+    If the writer falls behind by more than ``backlog`` chunks, the updates wait for it to
+    catch up, so that the memory used by the pending chunks is bounded.
+
+    Use ``scripts/export.py`` to convert a recording to the HDF5 layout of the `Save` node.
+
+    Attributes:
+        i_* (Port): Dynamic inputs, expect DataFrame and meta.
+
+    Args:
+        path (str): The directory where the recordings are stored.
+        session (str|None): The name of the recording. If None, the current date and time
+            is used (default: None).
+        block (int): Number of rows per block (default: 4096).
+        level (int): Compression level, from 0 (no compression) to 9 (default: 1).
+        interval (float): Maximum time a row is kept in memory before being written, in
+            seconds (default: 1).
+        backlog (int): Maximum number of chunks waiting to be written (default: 1000).
+    """
+
+    def __init__(self, path, session=None, block=4096, level=1, interval=1, backlog=1000):
+        if session is None:
+            session = time.strftime("%Y%m%d-%H%M%S", time.gmtime())
+        self._path = os.path.join(path, session)
+        os.makedirs(self._path, exist_ok=True)
+        self.logger.info("Recording to %s", self._path)
+        self._block = block
+        self._level = level
+        self._interval = interval
+        self._streams = {}
+        self._meta = {}
+        self._error = None
+        self._queue = queue.Queue(backlog)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def update(self):
+        if self._error:
+            raise self._error
+        for _, suffix, port in self.iterate("i_*"):
+            key = suffix.replace("_", "/")
+            if port.data is not None and not port.data.empty:
+                self._queue.put((key, port.data, None))
+            if port.meta:
+                self._queue.put((key, None, port.meta))
+
+    def terminate(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self._interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                self._write(*item)
+            for key, stream in self._streams.items():
+                try:
+                    stream.expire(self._interval)
+                except Exception as error:
+                    self._fail(key, error)
+        for stream in self._streams.values():
+            stream.close()
+
+    def _write(self, key, data, meta):
+        try:
+            if key not in self._streams:
+                if data is None:
+                    # Keep the meta until the first chunk of data
+                    self._meta[key] = meta
+                    return
+                self._streams[key] = _open(os.path.join(self._path, key), data, self._block, self._level)
+                if key in self._meta:
+                    self._streams[key].meta = self._meta.pop(key)
+            if data is not None:
+                self._streams[key].write(data)
+            if meta is not None:
+                self._streams[key].meta = meta
+        except Exception as error:
+            self._fail(key, error)
+
+    def _fail(self, key, error):
+        self.logger.error("Could not record %s: %s", key, error)
+        self._error = WorkerInterrupt(f"Could not record {key}")
+
+
+class Session:
+    """Read a recording made by the `Record` node
+
+    Args:
+        path (str): The directory of the recording.
+    """
+
+    def __init__(self, path):
+        self._path = path
+
+    def keys(self):
+        """Keys of the recorded streams, as in the HDF5 layout (eg. ``/eeg/1``)"""
+        keys = []
+        for root, _, files in os.walk(self._path):
+            if "stream.json" in files:
+                keys.append("/" + os.path.relpath(root, self._path).replace(os.sep, "/"))
+        return sorted(keys)
+
+    def meta(self, key):
+        return self._header(key)["meta"]
+
+    def read(self, key, start=None, stop=None):
+        """Iterate over the chunks of a stream, optionally restricted to a time range
+
+        Yields:
+            DataFrame: One block, or a few events.
+        """
+        header = self._header(key)
+        path = os.path.join(self._path, key.strip("/"))
+        start = None if start is None else pd.Timestamp(start).value
+        stop = None if stop is None else pd.Timestamp(stop).value
+        if header["kind"] == "events":
+            yield from self._read_events(path, header["columns"], start, stop)
+        else:
+            yield from self._read_blocks(path, header, start, stop)
+
+    def _header(self, key):
+        with open(os.path.join(self._path, key.strip("/"), "stream.json")) as file:
+            return json.load(file)
+
+    def _read_blocks(self, path, header, start, stop):
+        columns = header["columns"]
+        index = np.fromfile(os.path.join(path, "index.bin"), dtype=np.int64).reshape(-1, 5 + len(columns))
+        # Skip the blocks outside the time range, using the sidecar index only
+        keep = np.ones(len(index), dtype=bool)
+        if start is not None:
+            keep &= index[:, 3] >= start
+        if stop is not None:
+            keep &= index[:, 2] < stop
+        with open(os.path.join(path, "data.bin"), "rb") as file:
+            for offset, rows, _, _, *sizes in index[keep]:
+                file.seek(offset)
+                times = np.frombuffer(zlib.decompress(file.read(sizes[0])), dtype=np.int64)
+                values = np.empty((rows, len(columns)), dtype=header["dtype"])
+                for column, size in enumerate(sizes[1:]):
+                    values[:, column] = np.frombuffer(zlib.decompress(file.read(size)), dtype=header["dtype"])
+                df = pd.DataFrame(values, index=pd.to_datetime(times), columns=columns, copy=False)
+                if start is not None or stop is not None:
+                    mask = np.ones(rows, dtype=bool)
+                    if start is not None:
+                        mask &= times >= start
+                    if stop is not None:
+                        mask &= times < stop
+                    df = df[mask]
+                yield df
+
+    def _read_events(self, path, columns, start, stop, chunksize=10000):
+        rows = []
+        with open(os.path.join(path, "events.jsonl")) as file:
+            for line in file:
+                row = json.loads(line)
+                if (start is not None and row[0] < start) or (stop is not None and row[0] >= stop):
+                    continue
+                rows.append(row)
+                if len(rows) == chunksize:
+                    yield _events(rows, columns)
+                    rows = []
+        if rows:
+            yield _events(rows, columns)
+
+
+def _open(path, data, block, level):
+    os.makedirs(path, exist_ok=True)
+    numeric = all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) for dtype in data.dtypes)
+    if numeric:
+        return _Blocks(path, data.columns, block, level)
+    return _Events(path, data.columns)
+
+
+def _events(rows, columns):
+    index = pd.to_datetime(np.array([row[0] for row in rows], dtype=np.int64))
+    return pd.DataFrame([row[1:] for row in rows], index=index, columns=columns)
+
+
+class _Stream:
+    """Common header of the recorded streams"""
+
+    kind = None
+    dtype = None
+
+    def __init__(self, path, columns):
+        self._path = path
+        self._columns = [str(column) for column in columns]
+        self._meta = {}
+        self._header = None
+        self._save_header()
+
+    @property
+    def meta(self):
+        return self._meta
+
+    @meta.setter
+    def meta(self, meta):
+        self._meta = meta
+        self._save_header()
+
+    def expire(self, interval):
+        """Write the rows kept in memory for longer than the interval, in seconds"""
+
+    def _check(self, data):
+        if list(map(str, data.columns)) != self._columns:
+            raise ValueError("the columns changed during the recording")
+
+    def _save_header(self):
+        header = json.dumps({"kind": self.kind, "columns": self._columns, "dtype": self.dtype, "meta": self._meta}, default=str)
+        if header == self._header:
+            return
+        with open(os.path.join(self._path, "stream.json"), "w") as file:
+            file.write(header)
+        self._header = header
+
+
+class _Blocks(_Stream):
+    """Numeric stream, written as compressed columnar blocks"""
+
+    kind = "blocks"
+    dtype = "float64"
+
+    def __init__(self, path, columns, block, level):
+        super().__init__(path, columns)
+        self._level = level
+        self._times = np.empty(block, dtype=np.int64)
+        self._values = np.empty((len(self._columns), block))  # column-major
+        self._rows = 0
+        self._since = None  # time of the first row of the current block
+        self._data = open(os.path.join(path, "data.bin"), "ab")
+        self._index = open(os.path.join(path, "index.bin"), "ab")
+
+    def write(self, data):
+        self._check(data)
+        times = data.index.values.astype("datetime64[ns]").view(np.int64)
+        values = data.to_numpy(dtype=float).T
+        position = 0
+        while position < len(times):
+            if not self._rows:
+                self._since = time.monotonic()
+            count = min(len(times) - position, len(self._times) - self._rows)
+            self._times[self._rows:self._rows + count] = times[position:position + count]
+            self._values[:, self._rows:self._rows + count] = values[:, position:position + count]
+            self._rows += count
+            position += count
+            if self._rows == len(self._times):
+                self._flush()
+
+    def expire(self, interval):
+        if self._rows and time.monotonic() - self._since >= interval:
+            self._flush()
+
+    def close(self):
+        self._flush()
+        self._data.close()
+        self._index.close()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        rows = self._rows
+        blocks = [zlib.compress(self._times[:rows].tobytes(), self._level)]
+        blocks += [zlib.compress(column[:rows].tobytes(), self._level) for column in self._values]
+        offset = self._data.tell()
+        self._data.write(b"".join(blocks))
+        self._data.flush()
+        entry = [offset, rows, self._times[0], self._times[rows - 1]] + [len(block) for block in blocks]
+        self._index.write(np.array(entry, dtype=np.int64).tobytes())
+        self._index.flush()
+        self._rows = 0
+        self._since = None
+
+
+class _Events(_Stream):
+    """Stream with non-numeric columns, written as one JSON array per row"""
+
+    kind = "events"
+
+    def __init__(self, path, columns):
+        super().__init__(path, columns)
+        self._file = open(os.path.join(path, "events.jsonl"), "a")
+
+    def write(self, data):
+        self._check(data)
+        times = data.index.values.astype("datetime64[ns]").view(np.int64).tolist()
+        lines = [
+            json.dumps([time] + row, default=str)
+            for time, row in zip(times, data.astype(object).where(data.notna(), None).values.tolist())
+        ]
+        self._file.write("\n".join(lines) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
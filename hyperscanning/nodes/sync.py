@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+from timeflux.core.node import Node
+
+
+class Synchronize(Node):
+    """Align multiple streams on their sync onset, in real time
+
+    Each device is aligned on the first sample of its sync channel reaching the threshold:
+    the samples before the onset are dropped, and the following ones are numbered from the
+    onset. The samples are kept in a small buffer per device, and released as soon as all
+    the devices have sent them. The rows of a given chunk therefore share the same
+    timestamps on all the outputs, starting from the onset of the first device.
+
+    If a device falls behind by more than the maximum latency, the other devices are not
+    held back: its missing rows are filled with NaN, and its late samples are dropped.
+    While waiting for the onset of every device, each buffer keeps the samples of the last
+    maximum latency only.
+
+    Attributes:
+        i_* (Port): Dynamic inputs, one per device, expect DataFrame.
+        o_* (Port): Dynamic outputs, matching the inputs, provide DataFrame and meta.
+
+    Args:
+        rate (float): Nominal sampling rate of the devices.
+        channel (str): Name of the sync channel (default: 'sync').
+        threshold (float): Value of the sync channel at the onset (default: 562500).
+        latency (float): Maximum latency added to the fastest device, in seconds (default: 0.5).
+        devices (int|None): Number of devices. If set, nothing is released until the onset of
+            every device is detected. Otherwise, the devices whose onset comes later are
+            considered late (default: None).
+    """
+
+    def __init__(self, rate, channel="sync", threshold=562500, latency=.5, devices=None):
+        self._period = pd.Timedelta(seconds=1 / rate)
+        self._channel = channel
+        self._threshold = threshold
+        self._latency = max(1, round(latency * rate))
+        self._devices = devices
+        self._buffers = {}
+        self._origin = None
+        self._emitted = 0
+
+    def update(self):
+
+        # Buffer the new samples
+        for _, suffix, port in list(self.iterate("i_*")):
+            if not port.ready():
+                continue
+            buffer = self._buffers.setdefault(suffix, _Buffer(self._latency))
+            buffer.meta = port.meta
+            if buffer.columns is None:
+                onsets = np.flatnonzero(port.data[self._channel].values == self._threshold)
+                if not len(onsets):
+                    continue
+                buffer.columns = port.data.columns
+                if self._origin is None:
+                    self._origin = port.data.index[onsets[0]]
+                buffer.append(port.data.values[onsets[0]:], self._emitted)
+            else:
+                buffer.append(port.data.values, self._emitted)
+
+        # Rows received from all the devices, or older than the maximum latency
+        buffers = [buffer for buffer in self._buffers.values() if buffer.columns is not None]
+        if not buffers:
+            return
+        if len(buffers) < (self._devices or 0):
+            # Keep the last maximum latency only while waiting for the other devices
+            self._emitted = max(self._emitted, min(buffer.stop for buffer in buffers) - self._latency)
+            return
+        stop = max(buffer.stop for buffer in buffers)
+        complete = min(buffer.stop for buffer in buffers)
+        stop = max(complete, stop - self._latency)
+        if stop <= self._emitted:
+            return
+
+        # Jointly chunked output
+        index = self._origin + np.arange(self._emitted, stop) * self._period
+        for suffix, buffer in self._buffers.items():
+            if buffer.columns is None:
+                continue
+            port = getattr(self, f"o_{suffix}")
+            port.data = pd.DataFrame(buffer.take(self._emitted, stop), index=index, columns=buffer.columns, copy=False)
+            port.meta = buffer.meta
+        self._emitted = stop
+
+
+class _Buffer:
+    """Samples of one device, numbered from its onset, in a ring buffer
+
+    The buffer holds the samples not yet released, up to the maximum latency, plus the
+    incoming chunk. Older samples are overwritten, and released as NaN.
+
+    Args:
+        latency (int): Maximum latency, in samples.
+    """
+
+    def __init__(self, latency):
+        self.columns = None
+        self.meta = {}
+        self.start = 0  # number of the first buffered sample
+        self.stop = 0  # number of the next sample
+        self._latency = latency
+        self._data = None
+
+    def append(self, values, emitted):
+        values = np.asarray(values, dtype=float)
+        # Drop the samples that were already released without this device
+        late = min(len(values), max(0, emitted - self.stop))
+        if late:
+            self.start = self.stop = self.stop + late
+            values = values[late:]
+        if self._data is None or len(self._data) < self._latency + len(values):
+            self._resize(self._latency + len(values), values.shape[1])
+        self._data[(self.stop + np.arange(len(values))) % len(self._data)] = values
+        self.stop += len(values)
+        self.start = max(self.start, self.stop - len(self._data))
+
+    def take(self, start, stop):
+        """Release the rows in [start, stop), with NaN for the missing ones"""
+        rows = np.full((stop - start, self._data.shape[1]), np.nan)
+        low, high = max(start, self.start), min(stop, self.stop)
+        if high > low:
+            rows[low - start:high - start] = self._data[np.arange(low, high) % len(self._data)]
+        self.start = max(self.start, high)
+        return rows
+
+    def _resize(self, capacity, columns):
+        data = np.full((capacity, columns), np.nan)
+        if self._data is not None:
+            samples = np.arange(self.start, self.stop)
+            data[samples % capacity] = self._data[samples % len(self._data)]
+        self._data = data
@@ -0,0 +1,330 @@
+"""Align the EEG nodes of several devices on a common timeline
+
+The sync pulses are detected on each device, and matched with the pulses of the reference
+device (the first EEG node). A linear clock model (offset and drift) is then fitted for each
+device, mapping its sample number to the reference time. The sample numbers are recovered
+from the `counter` column, so that dropped samples are accounted for: they are filled by
+linear interpolation and flagged in a `gap` column. Repeated counter values are dropped.
+Finally, every device is resampled on the same timeline, chunk by chunk.
+
+Example:
+    $ python scripts/align.py data/session.hdf5 --chunksize 100000 --jobs 4
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import tables
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from sync import CHANNEL, GROUP, THRESHOLD, copy
+
+COUNTER = "counter"
+
+
+def align(input, output=None, chunksize=100000, jobs=None, rate=None, modulo=256):
+
+    # Check files
+    if not os.path.exists(input):
+        exit("The input file does not exist.")
+    if not output:
+        name, extension = os.path.splitext(input)
+        output = f"{name}-aligned{extension}"
+    if os.path.exists(output):
+        print("The output file will be overwritten.")
+        os.remove(output)
+
+    store = pd.HDFStore(input, "r")
+    keys = store.keys()
+    store.close()
+    devices = [key for key in keys if key.startswith(GROUP)]
+    if not devices:
+        exit("There is no EEG node in the input file.")
+
+    with ProcessPoolExecutor(jobs) as executor:
+
+        # Detect the pulses and the gaps
+        scans = list(executor.map(scan, [input] * len(devices), devices, [chunksize] * len(devices), [modulo] * len(devices)))
+
+        # Fit the clock models
+        origin = scans[0]["origin"]
+        models = [fit(scan_, scans[0], origin) for scan_ in scans]
+        if rate is None:
+            rate = scans[0]["meta"].get("rate") or round(1 / scans[0]["slope"])
+        start = max(model["start"] for model in models)
+        stop = min(model["stop"] for model in models)
+        samples = int(np.floor((stop - start) * rate)) + 1
+        print("device\tpulses\tmatched\tgaps\toffset (ms)\tdrift (ppm)\tjitter std (ms)\tjitter max (ms)")
+        for key, scan_, model in zip(devices, scans, models):
+            print(
+                f"{key}\t{len(scan_['pulses'])}\t{model['matched']}\t{scan_['gaps']}\t"
+                f"{model['offset'] * 1e3:.2f}\t\t{(models[0]['slope'] / model['slope'] - 1) * 1e6:.1f}\t\t"
+                f"{model['jitter_std'] * 1e3:.3f}\t\t{model['jitter_max'] * 1e3:.3f}"
+            )
+
+        # Resample
+        folder = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output)))
+        try:
+            paths = [os.path.join(folder, f"{index}.hdf5") for index in range(len(devices))]
+            list(executor.map(
+                resample, [input] * len(devices), devices, paths, [chunksize] * len(devices), [modulo] * len(devices),
+                models, [origin] * len(devices), [start] * len(devices), [rate] * len(devices), [samples] * len(devices)
+            ))
+
+            # Copy data and meta
+            with tables.open_file(input, "r") as source, tables.open_file(output, "w") as destination:
+                for key in keys:
+                    if key in devices:
+                        with tables.open_file(paths[devices.index(key)], "r") as aligned:
+                            copy(aligned, destination, key)
+                    else:
+                        copy(source, destination, key)
+        finally:
+            shutil.rmtree(folder)
+
+
+def scan(input, key, chunksize, modulo):
+    """Detect the sync pulses and the dropped samples of a node, chunk by chunk
+
+    Pulses starting right after dropped samples are ignored, as their onset is uncertain.
+
+    Returns:
+        dict: The pulses, as sample numbers and timestamps, the number of gaps, and the
+            least-squares fit of the timestamps against the sample numbers.
+    """
+
+    store = pd.HDFStore(input, "r")
+    try:
+        rows = store.get_storer(key).nrows
+        meta = {}
+        if store.get_node(key)._v_attrs.__contains__("meta"):
+            meta = store.get_node(key)._v_attrs["meta"]
+        columns = [column for column in (COUNTER, CHANNEL) if column in store.select(key, stop=1).columns]
+        origin = store.select(key, stop=1).index[0]
+        counter = Counter(modulo)
+        pulses = []
+        times = []
+        gaps = 0
+        high = False
+        moments = np.zeros(5)  # count, mean of samples, mean of times, co-moment, sum of squares
+        for offset in range(0, rows, chunksize):
+            df = store.select(key, start=offset, stop=offset + chunksize, columns=columns)
+            last = counter.last
+            s, kept = counter.samples(df[COUNTER].values if COUNTER in df else None, len(df))
+            if not len(s):
+                continue
+            df = df[kept]
+            t = (df.index - origin) / pd.Timedelta(seconds=1)
+            gap = np.diff(s, prepend=last) > 1
+            gaps += np.count_nonzero(gap)
+            moments = _merge(moments, s, np.asarray(t))
+            if CHANNEL in df:
+                state = df[CHANNEL].values == THRESHOLD
+                onsets = state & ~np.concatenate(([high], state[:-1]))
+                high = state[-1]
+                # The actual onset of a pulse following dropped samples is unknown
+                onsets &= ~gap
+                pulses.append(s[onsets])
+                times.append(np.asarray(t)[onsets])
+    finally:
+        store.close()
+
+    count, mean_s, mean_t, comoment, squares = moments
+    slope = comoment / squares if squares else 1 / meta.get("rate", 1)
+    return {
+        "origin": origin,
+        "meta": meta if isinstance(meta, dict) else {},
+        "first": counter.first,
+        "last": counter.last,
+        "gaps": gaps,
+        "pulses": np.concatenate(pulses) if pulses else np.array([]),
+        "times": np.concatenate(times) if times else np.array([]),
+        "slope": slope,
+        "intercept": mean_t - slope * mean_s,
+    }
+
+
+def fit(device, reference, origin):
+    """Fit the clock model of a device against the reference
+
+    Returns:
+        dict: The intercept and slope mapping the sample numbers to the reference time, in
+            seconds since the origin, along with the matching statistics.
+    """
+
+    shift = (device["origin"] - origin) / pd.Timedelta(seconds=1)
+    pulses = device["pulses"]
+    times = device["times"] + shift
+
+    # Reference time of the reference pulses, from the de-jittered reference clock
+    targets = reference["intercept"] + reference["slope"] * reference["pulses"]
+
+    # Match each pulse with the nearest reference pulse
+    matched = np.zeros(len(pulses), dtype=bool)
+    nearest = np.zeros(len(pulses), dtype=int)
+    if len(pulses) and len(targets):
+        tolerance = np.diff(targets).min() / 2 if len(targets) > 1 else .5
+        right = np.clip(np.searchsorted(targets, times), 0, len(targets) - 1)
+        left = np.clip(right - 1, 0, len(targets) - 1)
+        nearest = np.where(np.abs(times - targets[left]) < np.abs(times - targets[right]), left, right)
+        matched = np.abs(times - targets[nearest]) <= tolerance
+
+    x = pulses[matched]
+    y = targets[nearest[matched]]
+    slope = device["slope"]
+    intercept = device["intercept"] + shift
+    if len(x) >= 2:
+        slope, intercept = np.polyfit(x, y, 1)
+    elif len(x) == 1:
+        intercept = y[0] - slope * x[0]
+    residuals = y - (intercept + slope * x)
+
+    return {
+        "intercept": intercept,
+        "slope": slope,
+        "matched": len(x),
+        "offset": intercept + slope * device["first"] - shift,
+        "start": intercept + slope * device["first"],
+        "stop": intercept + slope * device["last"],
+        "jitter_std": residuals.std() if len(x) else np.nan,
+        "jitter_max": np.abs(residuals).max() if len(x) else np.nan,
+    }
+
+
+def resample(input, key, output, chunksize, modulo, model, origin, start, rate, samples):
+    """Resample a node on the common timeline, chunk by chunk
+
+    The values are linearly interpolated between the two nearest samples, except for the
+    sync channel, which takes the value of the nearest sample.
+    """
+
+    store = pd.HDFStore(input, "r")
+    aligned = pd.HDFStore(output, "w")
+    try:
+        rows = store.get_storer(key).nrows
+        counter = Counter(modulo)
+        previous = None
+        emitted = 0
+        for offset in range(0, rows, chunksize):
+            df = store.select(key, start=offset, stop=offset + chunksize)
+            s, kept = counter.samples(df[COUNTER].values if COUNTER in df else None, len(df))
+            if not len(s):
+                continue
+            s = s.astype(float)
+            df = df[kept]
+            df = df.drop(columns=[column for column in (COUNTER,) if column in df])
+            columns = df.columns
+            values = df.to_numpy(dtype=float)
+
+            # Keep the last sample of the previous chunk, to interpolate across chunks
+            if previous is not None:
+                s = np.concatenate(([previous[0]], s))
+                values = np.vstack((previous[1], values))
+            previous = (s[-1], values[-1:])
+            if len(s) < 2:
+                continue
+
+            # Points of the common timeline covered by this chunk
+            last = min(int(np.floor((model["intercept"] + model["slope"] * s[-1] - start) * rate)), samples - 1)
+            if last < emitted:
+                continue
+            k = np.arange(emitted, last + 1)
+            emitted = last + 1
+            times = start + k / rate
+            target = (times - model["intercept"]) / model["slope"]
+
+            # Interpolate
+            j = np.clip(np.searchsorted(s, target, side="right") - 1, 0, len(s) - 2)
+            step = s[j + 1] - s[j]
+            fraction = np.clip((target - s[j]) / step, 0, 1)[:, np.newaxis]
+            resampled = values[j] + fraction * (values[j + 1] - values[j])
+            if CHANNEL in columns:
+                nearest = np.where(fraction[:, 0] < .5, j, j + 1)
+                resampled[:, columns.get_loc(CHANNEL)] = values[nearest, columns.get_loc(CHANNEL)]
+
+            index = origin + pd.to_timedelta(times, unit="s")
+            df = pd.DataFrame(resampled, index=index, columns=columns, copy=False)
+            df["gap"] = step > 1
+            aligned.append(key, df, complevel=3, format="table")
+
+        meta = {}
+        if store.get_node(key)._v_attrs.__contains__("meta"):
+            meta = store.get_node(key)._v_attrs["meta"]
+        if isinstance(meta, dict):
+            meta = {**meta, "rate": rate}
+        if aligned.get_node(key) is not None:
+            aligned.get_node(key)._v_attrs["meta"] = meta
+    finally:
+        store.close()
+        aligned.close()
+
+
+class Counter:
+    """Recover the sample numbers from a wrapping packet counter
+
+    Args:
+        modulo (int): The counter wraps around at this value.
+    """
+
+    def __init__(self, modulo):
+        self._modulo = modulo
+        self._counter = None
+        self.first = None
+        self.last = -1
+
+    def samples(self, counter, length):
+        """Sample numbers of the next rows
+
+        Without a counter, the rows are assumed to be consecutive samples. A repeated counter
+        value is a duplicate of the previous row, and is dropped.
+
+        Returns:
+            tuple: The sample numbers of the kept rows, and the mask of the kept rows.
+        """
+        if counter is None:
+            steps = np.ones(length, dtype=np.int64)
+        else:
+            counter = counter.astype(np.int64)
+            previous = counter[0] - 1 if self._counter is None else self._counter
+            steps = np.diff(counter, prepend=previous) % self._modulo
+            if length:
+                self._counter = counter[-1]
+        kept = steps > 0
+        s = self.last + np.cumsum(steps[kept])
+        if len(s):
+            if self.first is None:
+                self.first = s[0]
+            self.last = s[-1]
+        return s, kept
+
+
+def _merge(moments, x, y):
+    """Merge the co-moments of a new chunk, for a numerically stable linear regression"""
+    count, mean_x, mean_y, comoment, squares = moments
+    n = len(x)
+    chunk_mean_x, chunk_mean_y = x.mean(), y.mean()
+    dx, dy = x - chunk_mean_x, y - chunk_mean_y
+    total = count + n
+    delta_x, delta_y = chunk_mean_x - mean_x, chunk_mean_y - mean_y
+    comoment += (dx * dy).sum() + delta_x * delta_y * count * n / total
+    squares += (dx * dx).sum() + delta_x * delta_x * count * n / total
+    mean_x += delta_x * n / total
+    mean_y += delta_y * n / total
+    return np.array([total, mean_x, mean_y, comoment, squares])
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument("input", help="input path")
+    parser.add_argument("-o", "--output", default=None, help="output path")
+    parser.add_argument("-c", "--chunksize", type=int, default=100000, help="number of rows per chunk")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes")
+    parser.add_argument("-r", "--rate", type=float, default=None, help="rate of the common timeline (default: from the reference meta)")
+    parser.add_argument("-m", "--modulo", type=int, default=256, help="the counter wraps around at this value")
+    args = parser.parse_args()
+    align(args.input, args.output, args.chunksize, args.jobs, args.rate, args.modulo)
@@ -0,0 +1,59 @@
+"""Export a recording made by the Record node to the HDF5 layout of the Save node
+
+Example:
+    $ python scripts/export.py data/20230101-120000 -o data/20230101-120000.hdf5
+"""
+
+import os
+import sys
+import json
+import pandas as pd
+
+# Ignore the "object name is not a valid Python identifier" message
+import warnings
+from tables.exceptions import NaturalNameWarning
+warnings.simplefilter("ignore", NaturalNameWarning)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from nodes.record import Session
+
+
+def export(input, output=None, min_itemsize=200, complevel=None):
+
+    # Check files
+    if not os.path.isdir(input):
+        exit("The input recording does not exist.")
+    if not output:
+        output = f"{input.rstrip(os.sep)}.hdf5"
+    if os.path.exists(output):
+        print("The output file will be overwritten.")
+        os.remove(output)
+
+    session = Session(input)
+    store = pd.HDFStore(output, "w", complevel=complevel)
+    try:
+        for key in session.keys():
+            rows = 0
+            for df in session.read(key):
+                # Events data is stored as strings
+                for column in df.columns[df.dtypes == object]:
+                    df[column] = [value if isinstance(value, str) or value is None else json.dumps(value) for value in df[column]]
+                df.index.freq = None
+                store.append(key, df, min_itemsize=min_itemsize)
+                rows += len(df)
+            if rows and session.meta(key):
+                store.get_node(key)._v_attrs["meta"] = session.meta(key)
+            print(f"{key}\t{rows}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument("input", help="recording directory")
+    parser.add_argument("-o", "--output", default=None, help="output path")
+    parser.add_argument("-m", "--min-itemsize", type=int, default=200, help="size of the string columns")
+    parser.add_argument("-c", "--complevel", type=int, default=None, help="compression level")
+    args = parser.parse_args()
+    export(args.input, args.output, args.min_itemsize, args.complevel)
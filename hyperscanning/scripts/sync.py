@@ -1,5 +1,11 @@
 import os
+import shutil
+import posixpath
+import tempfile
+import numpy as np
 import pandas as pd
+import tables
+from concurrent.futures import ProcessPoolExecutor
 
 # Ignore the "object name is not a valid Python identifier" message
 import warnings
@@ -11,7 +17,7 @@ THRESHOLD = 562500
 CHANNEL = "sync"
 GROUP = "/eeg/"
 
-def sync(input, output=None):
+def sync(input, output=None, chunksize=None, jobs=None):
 
     # Check files
     if not os.path.exists(input):
@@ -23,6 +29,10 @@ def sync(input, output=None):
         print("The output file will be overwritten.")
         os.remove(output)
 
+    # Streaming mode
+    if chunksize:
+        return sync_chunked(input, output, chunksize, jobs)
+
     # Get data keys and meta from input file
     nodes = []
     store = pd.HDFStore(input, "r")
@@ -44,7 +54,7 @@ def sync(input, output=None):
             start = df.loc[df[CHANNEL] == THRESHOLD].index[0]
             print(f"{node['name']}\t{start}")
             df = df[start:]
-        df.to_hdf(output, node["name"], "a", complevel=3, format="table")
+        df.to_hdf(output, key=node["name"], mode="a", complevel=3, format="table")
 
     # Copy meta
     store = pd.HDFStore(output, "a")
@@ -53,10 +63,104 @@ def sync(input, output=None):
     store.close()
 
 
+def sync_chunked(input, output, chunksize, jobs=None):
+    """Trim the EEG nodes with a memory footprint bounded by the chunk size
+
+    Each EEG node is trimmed in its own worker process, into a temporary file: the sync
+    column is scanned chunk by chunk until the onset is found, and the remaining rows are
+    then copied chunk by chunk. The other nodes, and the trimmed nodes from the temporary
+    files, are copied at the storage level, without being decoded.
+    """
+
+    store = pd.HDFStore(input, "r")
+    keys = store.keys()
+    store.close()
+    devices = [key for key in keys if key.startswith(GROUP)]
+
+    folder = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output)))
+    try:
+
+        # Trim the EEG nodes in parallel
+        with ProcessPoolExecutor(jobs) as executor:
+            futures = {
+                key: executor.submit(trim, input, key, os.path.join(folder, f"{index}.hdf5"), chunksize)
+                for index, key in enumerate(devices)
+            }
+            results = {key: future.result() for key, future in futures.items()}
+
+        # Copy data and meta
+        with tables.open_file(input, "r") as source, tables.open_file(output, "w") as destination:
+            for key in keys:
+                if key not in results:
+                    copy(source, destination, key)
+                    continue
+                path, start = results[key]
+                if path is None:
+                    print(f"{key}\tno onset found, copied as is")
+                    copy(source, destination, key)
+                    continue
+                print(f"{key}\t{start}")
+                with tables.open_file(path, "r") as trimmed:
+                    copy(trimmed, destination, key)
+
+    finally:
+        shutil.rmtree(folder)
+
+
+def trim(input, key, output, chunksize):
+    """Copy a node from its onset, chunk by chunk
+
+    Returns:
+        tuple: The path of the trimmed file and the onset, or (None, None) if there is no onset.
+    """
+
+    store = pd.HDFStore(input, "r")
+    try:
+        rows = store.get_storer(key).nrows
+
+        # Find the onset, stopping at the first match
+        onset = None
+        for offset in range(0, rows, chunksize):
+            column = store.select(key, start=offset, stop=offset + chunksize, columns=[CHANNEL])[CHANNEL]
+            match = np.flatnonzero(column.values == THRESHOLD)
+            if len(match):
+                onset = offset + match[0]
+                start = column.index[match[0]]
+                break
+        if onset is None:
+            return None, None
+
+        # Copy the data from the onset
+        trimmed = pd.HDFStore(output, "w")
+        for offset in range(onset, rows, chunksize):
+            df = store.select(key, start=offset, stop=offset + chunksize)
+            trimmed.append(key, df, complevel=3, format="table")
+        if store.get_node(key)._v_attrs.__contains__("meta"):
+            trimmed.get_node(key)._v_attrs["meta"] = store.get_node(key)._v_attrs["meta"]
+        trimmed.close()
+
+    finally:
+        store.close()
+    return output, start
+
+
+def copy(source, destination, key):
+    """Copy a node between two open PyTables files, without decoding it"""
+    where, name = posixpath.split(key)
+    if where in destination:
+        parent = destination.get_node(where)
+    else:
+        parent_where, parent_name = posixpath.split(where)
+        parent = destination.create_group(parent_where, parent_name, createparents=True)
+    source.get_node(key)._f_copy(newparent=parent, newname=name, recursive=True)
+
+
 if __name__ == "__main__":
     from argparse import ArgumentParser
     parser = ArgumentParser()
     parser.add_argument("input", help="input path")
     parser.add_argument("-o", "--output", default=None, help="output path")
+    parser.add_argument("-c", "--chunksize", type=int, default=None, help="stream the data by chunks of this number of rows")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="number of worker processes in streaming mode")
     args = parser.parse_args()
-    sync(args.input, args.output)
+    sync(args.input, args.output, args.chunksize, args.jobs)
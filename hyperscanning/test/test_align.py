@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scripts.align import Counter, align, fit, scan
+from scripts.sync import CHANNEL, THRESHOLD
+
+RATE = 500
+ORIGIN = pd.Timestamp("2024-01-01")
+
+def _device(offset, drift, duration, dropped=(), repeated=(), seed=0):
+    """A device with a drifting clock, sampling a 1 Hz sine, with a pulse every 2 s"""
+    rng = np.random.default_rng(seed)
+    n = np.arange(int(duration * RATE))
+    times = offset + n * (1 + drift) / RATE
+    pulse = (times % 2) < .02
+    df = pd.DataFrame({
+        "ch1": np.sin(2 * np.pi * times),
+        CHANNEL: np.where(pulse, THRESHOLD, 0),
+        "counter": n % 256,
+    }, index=ORIGIN + pd.to_timedelta(times + rng.uniform(0, .002, len(n)), unit="s"))
+    rows = np.delete(n, dropped)
+    rows = np.sort(np.concatenate((rows, repeated)))
+    return df.iloc[rows]
+
+@pytest.fixture()
+def session(tmp_path):
+    path = str(tmp_path / "session.hdf5")
+    devices = {
+        "/eeg/a": _device(0, 0, 60),
+        "/eeg/b": _device(.3, 100e-6, 60, dropped=np.arange(10000, 10200), repeated=[5000, 5000, 20000], seed=1),
+        "/eeg/c": _device(1.1, -50e-6, 58, dropped=[7000, 7001, 15000], seed=2),
+    }
+    for key, df in devices.items():
+        df.to_hdf(path, key=key, mode="a", format="table")
+        store = pd.HDFStore(path, "a")
+        store.get_node(key)._v_attrs["meta"] = {"rate": RATE}
+        store.close()
+    return path
+
+def test_counter():
+    counter = Counter(256)
+    s, kept = counter.samples(np.array([250, 251, 253, 253, 255]), 5)
+    np.testing.assert_array_equal(s, [0, 1, 3, 5])
+    np.testing.assert_array_equal(kept, [True, True, True, False, True])
+    s, kept = counter.samples(np.array([255, 0, 1, 4]), 4)  # duplicate across chunks, then wrap
+    np.testing.assert_array_equal(s, [6, 7, 10])
+    assert counter.first == 0 and counter.last == 10
+    s, kept = counter.samples(None, 2)
+    np.testing.assert_array_equal(s, [11, 12])
+
+def test_scan(session):
+    reference = scan(session, "/eeg/a", 7000, 256)
+    device = scan(session, "/eeg/b", 7000, 256)
+    assert device["gaps"] == 1
+    assert device["first"] == 0
+    assert device["last"] == 30000 - 1
+    model = fit(device, reference, reference["origin"])
+    assert model["matched"] == 29  # the last pulse is after the end of the reference
+    assert (reference["slope"] / model["slope"] - 1) * 1e6 == pytest.approx(-100, abs=10)
+
+def test_align(session, tmp_path):
+    output = str(tmp_path / "aligned.hdf5")
+    align(session, output, chunksize=7000, jobs=2)
+    devices = {key: pd.read_hdf(output, key) for key in ("/eeg/a", "/eeg/b", "/eeg/c")}
+    index = devices["/eeg/a"].index
+    for df in devices.values():
+        pd.testing.assert_index_equal(df.index, index)
+    # The devices sampled the same sine, so they match once aligned, outside of the gaps
+    for key in ("/eeg/b", "/eeg/c"):
+        valid = ~devices[key]["gap"]
+        np.testing.assert_allclose(devices[key]["ch1"][valid], devices["/eeg/a"]["ch1"][valid], atol=.01)
+        assert devices[key]["gap"].any()
+    assert not devices["/eeg/a"]["gap"].any()
+    with pd.HDFStore(output, "r") as store:
+        assert store.get_node("/eeg/b")._v_attrs["meta"]["rate"] == RATE
@@ -0,0 +1,70 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from nodes.record import Record, Session
+from scripts.export import export
+
+ORIGIN = pd.Timestamp("2024-01-01")
+
+def _eeg(start, stop):
+    index = (ORIGIN + pd.to_timedelta(np.arange(start, stop) * 4, unit="ms")).as_unit("ns")
+    return pd.DataFrame(np.arange(start, stop)[:, np.newaxis] * [1., -1.], index=index, columns=["Fz", "Cz"])
+
+def _events(start, stop):
+    index = (ORIGIN + pd.to_timedelta(np.arange(start, stop) * 100, unit="ms")).as_unit("ns")
+    return pd.DataFrame({"label": ["marker"] * (stop - start), "data": [f'{{"n": {n}}}' for n in range(start, stop)]}, index=index)
+
+def _update(node, **chunks):
+    node.clear()
+    for name, (data, meta) in chunks.items():
+        port = getattr(node, name)
+        port.data = data
+        port.meta = meta
+    node.update()
+
+def test_roundtrip(tmp_path):
+    node = Record(str(tmp_path), session="session", block=100)
+    for start in range(0, 350, 50):
+        _update(node, i_eeg_1=(_eeg(start, start + 50), {"rate": 250}), i_events=(_events(start, start + 50), {}))
+    node.terminate()
+
+    session = Session(str(tmp_path / "session"))
+    assert session.keys() == ["/eeg/1", "/events"]
+    assert session.meta("/eeg/1") == {"rate": 250}
+    pd.testing.assert_frame_equal(pd.concat(session.read("/eeg/1")), _eeg(0, 350), check_freq=False)
+    pd.testing.assert_frame_equal(pd.concat(session.read("/events")), _events(0, 350), check_freq=False, check_dtype=False)
+    # Time range, from the sidecar index
+    selected = pd.concat(session.read("/eeg/1", start=_eeg(120, 121).index[0], stop=_eeg(230, 231).index[0]))
+    pd.testing.assert_frame_equal(selected, _eeg(120, 230), check_freq=False)
+
+    output = str(tmp_path / "session.hdf5")
+    export(str(tmp_path / "session"), output)
+    with pd.HDFStore(output, "r") as store:
+        pd.testing.assert_frame_equal(store["/eeg/1"], _eeg(0, 350), check_freq=False)
+        pd.testing.assert_frame_equal(store["/events"], _events(0, 350), check_freq=False, check_dtype=False)
+        assert store.get_node("/eeg/1")._v_attrs["meta"] == {"rate": 250}
+
+def test_flush_interval(tmp_path):
+    node = Record(str(tmp_path), session="session", block=4096, interval=.1)
+    _update(node, i_eeg=(_eeg(0, 10), {}))
+    time.sleep(1)
+    # The partial block is written before the recording ends
+    session = Session(str(tmp_path / "session"))
+    pd.testing.assert_frame_equal(pd.concat(session.read("/eeg")), _eeg(0, 10), check_freq=False)
+    node.terminate()
+
+def test_meta_changes(tmp_path):
+    node = Record(str(tmp_path), session="session")
+    header = tmp_path / "session" / "eeg" / "stream.json"
+    _update(node, i_eeg=(_eeg(0, 10), {"rate": 250}))
+    while not header.exists():
+        time.sleep(.01)
+    os.remove(header)
+    # The same meta is not written again
+    _update(node, i_eeg=(_eeg(10, 20), {"rate": 250}))
+    time.sleep(.5)
+    assert not header.exists()
+    _update(node, i_eeg=(_eeg(20, 30), {"rate": 500}))
+    node.terminate()
+    assert Session(str(tmp_path / "session")).meta("/eeg") == {"rate": 500}
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from nodes.sync import Synchronize
+
+THRESHOLD = 562500
+ORIGIN = pd.Timestamp("2024-01-01")
+
+def _device(onset, length, value):
+    """Samples numbered from -onset, with the sync onset at 0"""
+    samples = np.arange(-onset, length - onset)
+    sync = np.where(samples == 0, THRESHOLD, 0)
+    index = ORIGIN + pd.to_timedelta((samples + onset) * 4, unit="ms")
+    return pd.DataFrame({"ch1": samples + value, "sync": sync}, index=index)
+
+def _update(node, chunks):
+    node.clear()
+    for name, data in chunks.items():
+        getattr(node, f"i_{name}").data = data
+    node.update()
+    return {suffix: port.data for _, suffix, port in node.iterate("o_*")}
+
+def _values(outputs, name):
+    return np.concatenate([output[name]["ch1"].values for output in outputs if output.get(name) is not None])
+
+def test_aligned():
+    node = Synchronize(rate=250, devices=2)
+    a, b = _device(10, 1000, 0), _device(37, 1000, 1000)
+    outputs = [_update(node, {"a": a.iloc[start:start + 50], "b": b.iloc[start:start + 50]}) for start in range(0, 1000, 50)]
+    # Both devices start from their onset, and share the same timestamps
+    np.testing.assert_array_equal(_values(outputs, "a"), np.arange(0, 963))
+    np.testing.assert_array_equal(_values(outputs, "b"), np.arange(0, 963) + 1000)
+    for output in outputs:
+        if output["a"] is not None:
+            pd.testing.assert_index_equal(output["a"].index, output["b"].index)
+    assert outputs[0]["a"].index[0] == a.index[10]
+
+def test_lag_within_latency():
+    node = Synchronize(rate=250, latency=.4, devices=2)
+    a, b = _device(0, 1000, 0), _device(0, 1000, 1000)
+    outputs = []
+    # b lags a by 80 samples, below the maximum latency of 100 samples
+    for start in range(0, 1100, 20):
+        chunks = {"a": a.iloc[start:start + 20]} if start < 1000 else {}
+        if start >= 80:
+            chunks["b"] = b.iloc[start - 80:start - 60]
+        outputs.append(_update(node, chunks))
+    np.testing.assert_array_equal(_values(outputs, "a"), np.arange(1000))
+    np.testing.assert_array_equal(_values(outputs, "b"), np.arange(1000) + 1000)
+
+def test_lag_beyond_latency():
+    node = Synchronize(rate=250, latency=.2, devices=2)
+    a, b = _device(0, 600, 0), _device(0, 600, 1000)
+    outputs = []
+    # b stalls for 100 samples, above the maximum latency of 50 samples, then resumes
+    for start in range(0, 700, 20):
+        chunks = {"a": a.iloc[start:start + 20]} if start < 600 else {}
+        if start < 100 or start >= 200:
+            lag = 0 if start < 100 else 100
+            chunks["b"] = b.iloc[start - lag:start - lag + 20]
+        outputs.append(_update(node, chunks))
+    np.testing.assert_array_equal(_values(outputs, "a"), np.arange(600))
+    late = _values(outputs, "b")
+    # The rows of b released without it are NaN, the others stay aligned
+    assert len(late) == 600
+    assert np.isnan(late).sum() >= 50
+    valid = ~np.isnan(late)
+    np.testing.assert_array_equal(late[valid] - 1000, np.arange(600)[valid])
+
+def test_missing_device():
+    node = Synchronize(rate=250, latency=.2, devices=2)
+    a = _device(0, 20000, 0)
+    b = _device(0, 1000, 1000)
+    for start in range(0, 19000, 100):
+        assert _update(node, {"a": a.iloc[start:start + 100]}).get("a") is None
+    # The buffer of the first device is capped while waiting for the second one
+    assert len(node._buffers["a"]._data) <= 150
+    outputs = [_update(node, {"a": a.iloc[19000 + start:19100 + start], "b": b.iloc[start:start + 100]}) for start in range(0, 1000, 100)]
+    # The first device resumes from its last samples within the latency
+    values = _values(outputs, "a")
+    np.testing.assert_array_equal(values, np.arange(19000 - 50, len(values) + 19000 - 50))
+    # The samples of the second device are too old, and are dropped
+    assert np.isnan(_values(outputs, "b")).all()
+    assert len(_values(outputs, "b")) == len(values)
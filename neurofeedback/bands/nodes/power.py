@@ -1,30 +1,211 @@
-from timeflux.nodes.window import TimeWindow
+from timeflux.core.node import Node
+from timeflux_dsp.utils.filters import construct_iir_filter
+from scipy import signal
 import numpy as np
 import pandas as pd
 
-class Power(TimeWindow):
+class Power(Node):
     """ Average of squared samples on a moving window
 
+    The power is computed incrementally: the last squared samples of each channel are kept in
+    a ring buffer. For the mean, a running sum is kept along with the number of missing values
+    in the window, so that each new sample costs O(1). For the median, the window is gathered
+    from the ring buffer and sorted at each output only. The output can be emitted at any step,
+    down to once per chunk. A window with missing values yields NaN.
+
     Attributes:
         i (Port): Default input, expects DataFrame.
         o (Port): Default output, provides DataFrame and meta.
 
     Args:
-        length (float): Window length
-        step (float): Step length
+        length (float): Window length, in seconds
+        step (float): Step length, in seconds. If 0, a value is emitted for each chunk (default: 0).
         average (mean|median) : Average method
+        rate (float|None): Nominal sampling rate. If None, it is read from the meta, or
+            estimated from the first chunk (default: None).
 
     """
 
-    def __init__(self, length, step, average='median'):
-        super().__init__(length=length, step=step)
-        if average == 'mean':
-            self._average_method = np.mean
+    def __init__(self, length, step=0, average='median', rate=None):
+        self._length = length
+        self._step = pd.Timedelta(seconds=step) if step else None
+        self._median = average != 'mean'
+        self._rate = rate
+        self._ring = None
+        self._origin = None
+        self._last_step = -1
+
+    def update(self):
+
+        if not self.i.ready():
+            return
+        if self._ring is None:
+            self._init(self.i.data.shape[1])
+
+        x = np.square(np.asarray(self.i.data.values, dtype=float))
+        powers, index = self._power(x, self.i.data.index)
+        if not len(index):
+            return
+        self.o.data = pd.DataFrame(powers, index=index, columns=self.i.data.columns)
+        self.o.meta = self.i.meta
+
+    def _power(self, x, index):
+        """ Slide the window over new squared samples.
+
+        Args:
+            x (ndarray): Squared samples, shape (n_samples, n_channels).
+            index (DatetimeIndex): Timestamps of the samples.
+
+        Returns:
+            tuple: The powers, shape (n_outputs, n_channels), and their timestamps.
+        """
+
+        n_samples = len(x)
+        window = len(self._ring)
+
+        # Positions where the window is full and a value is due
+        full = self._count + np.arange(n_samples) + 1 >= window
+        if self._step is None:
+            due = np.zeros(n_samples, dtype=bool)
+            due[-1] = True
+        else:
+            # Keep the first sample of each new step
+            if self._origin is None:
+                self._origin = index[0]
+            steps = (index - self._origin) // self._step
+            due = np.diff(steps, prepend=self._last_step) > 0
+            self._last_step = steps[-1]
+        due &= full
+
+        if self._median:
+            powers = self._update_median(x, due)
         else:
-            self._average_method = np.median
+            powers = self._update_mean(x, due)
+
+        # Store the new samples
+        count = self._count
+        keep = min(n_samples, window)
+        self._ring[(count + np.arange(n_samples - keep, n_samples)) % window] = x[-keep:]
+        self._count += n_samples
+        if not self._median and self._count // window > count // window:
+            # Reset the running sum once per cycle to avoid drifting
+            self._sum = np.nansum(self._ring, axis=0)
+
+        return powers, index[due]
+
+    def _init(self, n_channels):
+        if not self._rate:
+            self._rate = self.i.meta.get('rate')
+        if not self._rate:
+            duration = (self.i.data.index[-1] - self.i.data.index[0]).total_seconds()
+            self._rate = (len(self.i.data) - 1) / duration
+        self._ring = np.zeros((max(1, round(self._length * self._rate)), n_channels))
+        self._sum = np.zeros(n_channels)
+        self._nans = np.zeros(n_channels, dtype=int)
+        self._count = 0
+
+    def _update_mean(self, x, due):
+        n_samples = len(x)
+        window = len(self._ring)
+
+        # Sample leaving the window for each new sample, if any
+        leaving = self._count + np.arange(n_samples) - window
+        outgoing = np.zeros_like(x)
+        from_ring = (leaving >= 0) & (leaving < self._count)
+        from_chunk = leaving >= self._count
+        outgoing[from_ring] = self._ring[leaving[from_ring] % window]
+        outgoing[from_chunk] = x[leaving[from_chunk] - self._count]
+
+        # Missing values are counted, and left out of the running sum
+        missing = np.isnan(x)
+        gone = np.isnan(outgoing)
+        sums = self._sum + np.cumsum(np.where(missing, 0, x) - np.where(gone, 0, outgoing), axis=0)
+        nans = self._nans + np.cumsum(missing.astype(int) - gone, axis=0)
+        self._sum = sums[-1]
+        self._nans = nans[-1]
+        return np.where(nans[due] > 0, np.nan, sums[due] / window)
+
+    def _update_median(self, x, due):
+        window = len(self._ring)
+        positions = np.flatnonzero(due)
+        powers = np.empty((len(positions), x.shape[1]))
+        for row, position in enumerate(positions):
+            # Samples of the window that are still in the ring buffer
+            size = window - position - 1
+            if size > 0:
+                indices = (self._count - size + np.arange(size)) % window
+                values = np.concatenate((self._ring[indices], x[:position + 1]))
+            else:
+                values = x[position + 1 - window:position + 1]
+            powers[row] = np.median(values, axis=0)
+        return powers
+
+
+class FilterBankPower(Power):
+    """ Band power of all channels in all frequency bands
+
+    All channels are filtered through all bands at once: the second-order sections of the
+    bands are stacked, and each band filters the whole (samples, channels) array in a single
+    call. The squared outputs are laid out as a (samples, bands * channels) array, so that
+    the band powers are averaged on a moving window in one vectorized pass.
+    This replaces a ``FilterBank`` followed by a ``Power`` node.
+
+    Attributes:
+        i (Port): Default input, expects DataFrame.
+        o (Port): Default output, provides DataFrame and meta. There is one column per band
+            and channel, named ``{channel}_{band}``, as for ``FilterBank``.
+
+    Args:
+        bands (dict): Frequency range of each band, eg. ``{'alpha': [8, 12]}``.
+        length (float): Window length, in seconds
+        step (float): Step length, in seconds. If 0, a value is emitted for each chunk (default: 0).
+        average (mean|median) : Average method
+        order (int): Order of the bandpass filters (default: 3).
+        design (str): Design of the bandpass filters (default: 'butter').
+        rate (float|None): Nominal sampling rate. If None, it is read from the meta, or
+            estimated from the first chunk (default: None).
+
+    """
+
+    def __init__(self, bands, length, step=0, average='median', order=3, design='butter', rate=None):
+        super().__init__(length=length, step=step, average=average, rate=rate)
+        self._bands = bands
+        self._order = order
+        self._design = design
 
     def update(self):
-        super().update()
-        if not self.o.ready(): return
-        self.o.data = pd.DataFrame((self.o.data ** 2).apply(self._average_method),
-                                   columns=[self.i.data.index[-1]]).T
\ No newline at end of file
+
+        if not self.i.ready():
+            return
+        if self._ring is None:
+            self._init(len(self._bands) * self.i.data.shape[1])
+
+        x = np.asarray(self.i.data.values, dtype=float)
+        if self._zi is None:
+            self._zi = self._zi_steady * x[0]
+
+        # Filter bank, shape (bands, samples, channels)
+        filtered = np.empty((len(self._sos),) + x.shape)
+        for band, sos in enumerate(self._sos):
+            filtered[band], self._zi[band] = signal.sosfilt(sos, x, axis=0, zi=self._zi[band])
+
+        # Squared samples, shape (samples, bands * channels)
+        np.square(filtered, out=filtered)
+        x = filtered.transpose(1, 0, 2).reshape(len(x), -1)
+        powers, index = self._power(x, self.i.data.index)
+        if not len(index):
+            return
+        self.o.data = pd.DataFrame(powers, index=index, columns=self._columns, copy=False)
+        self.o.meta = self.i.meta
+
+    def _init(self, n_channels):
+        super()._init(n_channels)
+        self._sos = np.stack([
+            construct_iir_filter(rate=self._rate, frequencies=frequencies, filter_type='bandpass',
+                                 order=self._order, design=self._design, output='sos')[0]
+            for frequencies in self._bands.values()
+        ])
+        # Steady-state initial conditions, shape (bands, sections, 2, 1)
+        self._zi_steady = np.stack([signal.sosfilt_zi(sos) for sos in self._sos])[..., np.newaxis]
+        self._zi = None
+        self._columns = [f'{channel}_{band}' for band in self._bands for channel in self.i.data.columns]
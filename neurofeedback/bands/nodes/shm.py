@@ -0,0 +1,7 @@
+"""Shared-memory Pub/Sub, shared by the demos: see ``common/shm.py``"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", ".."))
+from common.shm import Pub, Sub
@@ -0,0 +1,81 @@
+"""Compare the per-chunk latency of a filter bank followed by Power and of FilterBankPower
+
+Example:
+    $ python scripts/benchmark_power.py --channels 8 32 64 --rate 1000
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from time import perf_counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from timeflux_dsp.nodes.filters import IIRFilter
+from nodes.power import Power, FilterBankPower
+
+BANDS = {
+    "delta": [1, 4],
+    "theta": [5, 7],
+    "alpha": [8, 12],
+    "beta": [13, 20],
+    "gamma": [25, 40],
+}
+
+
+def chain(rate, length, step, average):
+    filters = {band: IIRFilter(rate=rate, filter_type="bandpass", frequencies=frequencies, order=3) for band, frequencies in BANDS.items()}
+    return filters, Power(length=length, step=step, average=average, rate=rate)
+
+
+def run_chain(nodes, chunk):
+    filters, power = nodes
+    bands = []
+    for band, node in filters.items():
+        node.o.data = None
+        node.i.data = chunk
+        node.update()
+        bands.append(node.o.data.add_suffix(f"_{band}"))
+    power.o.data = None
+    power.i.data = pd.concat(bands, axis=1)
+    power.update()
+
+
+def run_bank(node, chunk):
+    node.o.data = None
+    node.i.data = chunk
+    node.update()
+
+
+def benchmark(channels, rate=1000, chunk=100, duration=10, length=3, step=0, average="median", seed=42):
+    rng = np.random.default_rng(seed)
+    samples = rate * duration
+    index = pd.date_range("2023-01-01", periods=samples, freq=pd.Timedelta(seconds=1 / rate))
+    data = pd.DataFrame(rng.normal(size=(samples, channels)), index=index, columns=[f"ch{channel}" for channel in range(channels)])
+    chunks = [data.iloc[start:start + chunk] for start in range(0, samples, chunk)]
+    bank = FilterBankPower(bands=BANDS, length=length, step=step, average=average, rate=rate)
+    results = {}
+    for name, node, run in (("chain", chain(rate, length, step, average), run_chain), ("bank", bank, run_bank)):
+        latencies = []
+        for data in chunks:
+            start = perf_counter()
+            run(node, data)
+            latencies.append(perf_counter() - start)
+        results[name] = np.array(latencies) * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument("-c", "--channels", type=int, nargs="+", default=[8, 32, 64], help="number of channels")
+    parser.add_argument("-r", "--rate", type=int, default=1000, help="sampling rate")
+    parser.add_argument("-s", "--chunk", type=int, default=100, help="chunk size, in samples")
+    parser.add_argument("-d", "--duration", type=int, default=10, help="duration of the signal, in seconds")
+    parser.add_argument("-a", "--average", default="median", choices=["mean", "median"], help="average method")
+    args = parser.parse_args()
+    print("channels\tchain median (us)\tchain p95 (us)\tbank median (us)\tbank p95 (us)")
+    for channels in args.channels:
+        results = benchmark(channels, args.rate, args.chunk, args.duration, average=args.average)
+        chain_, bank = results["chain"], results["bank"]
+        print(f"{channels}\t\t{np.median(chain_):.0f}\t\t\t{np.percentile(chain_, 95):.0f}\t\t{np.median(bank):.0f}\t\t\t{np.percentile(bank, 95):.0f}")
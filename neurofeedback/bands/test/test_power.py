@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import signal
+from timeflux_dsp.utils.filters import construct_iir_filter
+from nodes.power import Power, FilterBankPower
+
+def _stream(node, data, sizes):
+    chunks = []
+    start = 0
+    for size in sizes:
+        node.clear()
+        node.i.data = data.iloc[start:start + size]
+        node.update()
+        if node.o.data is not None:
+            chunks.append(node.o.data)
+        start += size
+    return pd.concat(chunks)
+
+def _data(n_samples=3000, n_channels=3):
+    np.random.seed(42)
+    data = pd.DataFrame(np.random.randn(n_samples, n_channels), columns=["Fz", "Cz", "Pz"][:n_channels],
+                        index=pd.date_range("2023-01-01", periods=n_samples, freq="ms"))
+    data.iloc[[1000, 1001, 1800], 0] = np.nan
+    data.iloc[2200, 1] = np.nan
+    return data
+
+def _reference(data, window, average):
+    # Any missing value in the window yields NaN, as with np.mean and np.median
+    rolling = np.square(data).rolling(window)
+    expected = rolling.mean() if average == "mean" else rolling.median()
+    expected[data.isna().rolling(window).sum() > 0] = np.nan
+    return expected
+
+@pytest.mark.parametrize("average", ["mean", "median"])
+def test_power_chunk(average):
+    data = _data()
+    sizes = [1, 99, 150, 50, 700, 1000, 40, 960]
+    node = Power(length=.2, average=average, rate=1000)
+    result = _stream(node, data, sizes)
+    ends = np.cumsum(sizes) - 1
+    expected = _reference(data, 200, average).iloc[ends[ends >= 199]]
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+@pytest.mark.parametrize("average", ["mean", "median"])
+def test_power_step(average):
+    data = _data()
+    node = Power(length=.25, step=.1, average=average, rate=1000)
+    result = _stream(node, data, [70] * 42 + [60])
+    expected = _reference(data, 250, average).iloc[300::100]
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+def test_power_recovers_from_nan():
+    data = _data()
+    result = _stream(Power(length=.1, step=.05, average="mean", rate=1000), data, [100] * 30)
+    assert np.isnan(result.loc[data.index[1050], "Fz"])
+    assert np.isfinite(result.iloc[-1]).all()
+
+def test_power_rate_from_index():
+    data = pd.DataFrame(np.ones((500, 1)), index=pd.date_range("2023-01-01", periods=500, freq="4ms"))
+    node = Power(length=1)
+    _stream(node, data, [500])
+    assert len(node._ring) == 250
+
+def _filter_bank(data, bands, window, average):
+    # One filter per band, applied to the whole recording
+    columns = {}
+    for band, frequencies in bands.items():
+        sos = construct_iir_filter(rate=1000, frequencies=frequencies, filter_type="bandpass",
+                                   order=3, design="butter", output="sos")[0]
+        zi = signal.sosfilt_zi(sos)[..., np.newaxis] * data.values[0]
+        filtered = signal.sosfilt(sos, data.values, axis=0, zi=zi)[0]
+        for channel, values in zip(data.columns, filtered.T):
+            columns[f"{channel}_{band}"] = values
+    squared = pd.DataFrame(columns, index=data.index) ** 2
+    rolling = squared.rolling(window)
+    return rolling.mean() if average == "mean" else rolling.median()
+
+@pytest.mark.parametrize("average", ["mean", "median"])
+def test_filter_bank_power(average):
+    data = _data().fillna(0)
+    bands = {"theta": [4, 8], "alpha": [8, 12], "beta": [12, 30]}
+    node = FilterBankPower(bands=bands, length=.5, step=.1, average=average, rate=1000)
+    result = _stream(node, data, [30, 270, 1] + [133] * 20 + [39])
+    expected = _filter_bank(data, bands, 500, average).iloc[500::100]
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+    assert list(result.columns[:4]) == ["Fz_theta", "Cz_theta", "Pz_theta", "Fz_alpha"]
+
+def test_filter_bank_power_chunk():
+    data = _data().fillna(0)
+    bands = {"alpha": [8, 12]}
+    sizes = [600, 100, 1, 299, 2000]
+    result = _stream(FilterBankPower(bands=bands, length=.5, average="median", rate=1000), data, sizes)
+    expected = _filter_bank(data, bands, 500, "median").iloc[np.cumsum(sizes) - 1]
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
@@ -3,9 +3,29 @@ from sklearn.base import BaseEstimator, TransformerMixin
 from sklearn.utils.validation import check_array
 
 class EMGFeatures(BaseEstimator, TransformerMixin):
-    """EMG Temporal features"""
+    """EMG Temporal features
+
+    All features are computed in a single vectorized pass over the samples axis.
+
+    Parameters
+    ----------
+    features : list, (default ["max", "std", "zcr"])
+        Features to extract, in order, amongst:
+        ``max`` (maximum), ``std`` (standard deviation), ``zcr`` (zero-crossing rate),
+        ``rms`` (root mean square), ``mav`` (mean absolute value),
+        ``wl`` (waveform length) and ``ssc`` (slope-sign changes rate).
+    """
+
+    FEATURES = ("max", "std", "zcr", "rms", "mav", "wl", "ssc")
+
+    def __init__(self, features=("max", "std", "zcr")):
+        self.features = features
+
     def fit(self, X, y=None):
         """"""
+        unknown = set(self.features) - set(self.FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown features: {', '.join(sorted(unknown))}")
         return self
 
     def transform(self, X):
@@ -16,8 +36,8 @@ class EMGFeatures(BaseEstimator, TransformerMixin):
             Data to extract features from
         Returns
         -------
-        features : ndarray, shape (n_trials, n_features)
-            Temporal features
+        features : ndarray, shape (n_trials, n_features * n_channels)
+            Temporal features, grouped by feature
         """
         X = check_array(X, allow_nd=True)
         shapeX = X.shape
@@ -26,9 +46,12 @@ class EMGFeatures(BaseEstimator, TransformerMixin):
             Nt, Ns, Ne = shapeX
         else:
             raise ValueError("X.shape should be (n_trials, n_samples, n_electrodes).")
-        
-        features = np.hstack([np.max(X, axis=1), np.std(X, axis=1), np.apply_along_axis(self._zero_crossing_rate, 1, X)])
-        return features
+
+        features = []
+        cache = {}
+        for feature in self.features:
+            features.append(getattr(self, f"_feature_{feature}")(X, cache))
+        return np.hstack(features)
 
     def fit_transform(self, X, y=None):
         """
@@ -40,12 +63,48 @@ class EMGFeatures(BaseEstimator, TransformerMixin):
             labels corresponding to each trial, not used (mentioned for sklearn comp)
         Returns
         -------
-        X : ndarray, shape (n_trials, n_features)
+        X : ndarray, shape (n_trials, n_features * n_channels)
             Temporal features
         """
         self.fit(X, y)
         return self.transform(X)
-    
+
+    # Intermediate results shared between features are kept in a cache for the current call
+
+    @staticmethod
+    def _diff(X, cache):
+        if "diff" not in cache:
+            cache["diff"] = np.diff(X, axis=1)
+        return cache["diff"]
+
     @staticmethod
-    def _zero_crossing_rate(x):
-        return len(np.where(np.diff(np.sign(x)))[0]) / len(x)
+    def _feature_max(X, cache):
+        return np.max(X, axis=1)
+
+    @staticmethod
+    def _feature_std(X, cache):
+        return np.std(X, axis=1)
+
+    @staticmethod
+    def _feature_zcr(X, cache):
+        # Number of sign changes, over the number of samples
+        signs = np.sign(X)
+        return np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / X.shape[1]
+
+    @staticmethod
+    def _feature_rms(X, cache):
+        return np.sqrt(np.einsum("ijk,ijk->ik", X, X) / X.shape[1])
+
+    @staticmethod
+    def _feature_mav(X, cache):
+        return np.abs(X).mean(axis=1)
+
+    @classmethod
+    def _feature_wl(cls, X, cache):
+        return np.abs(cls._diff(X, cache)).sum(axis=1)
+
+    @classmethod
+    def _feature_ssc(cls, X, cache):
+        # Number of local extrema, over the number of samples
+        diff = cls._diff(X, cache)
+        return np.count_nonzero(diff[:, 1:] * diff[:, :-1] < 0, axis=1) / X.shape[1]
@@ -1,12 +1,19 @@
 import numpy as np
 import pandas as pd
-from scipy.stats import linregress
+from scipy import signal
 from timeflux.core.node import Node
+from timeflux_dsp.utils.filters import construct_iir_filter
+from nodes.stats import RunningStats, RollingMean, RollingSum
+from estimators.emg import EMGFeatures
 
 class TKEO(Node):
     """TKEO : Teager–Kaiser energy operator
     Known to increase the EMG onset detection
-    
+
+    The operator at sample n requires samples n-1 and n+1. Only the last two samples of each
+    channel are kept between updates, so that exactly one value is computed per input sample,
+    with a delay of one sample.
+
     Attributes:
         i (Port): Default input, expects DataFrame.
         o (Port): Default output, provides DataFrame and meta.
@@ -14,106 +21,375 @@ class TKEO(Node):
     """
 
     def __init__(self):
-        self._previous = None
+        self._buffer = None
+        self._times = None
+        self._history = 0
         self._columns = None
 
     def update(self):
         if not self.i.ready():
             return
-            
-        self.o.meta = self.i.meta 
+
+        self.o.meta = self.i.meta
 
         if self._columns is None:
             self._columns = self.i.data.columns
-        else:
-            self.i.data = pd.concat(
-                [self._previous, self.i.data]
-            ) 
+            self._times = np.empty(2, dtype=self.i.data.index.dtype)
         x = self.i.data.values
-        tkeo = np.power(x[1:-1], 2) - np.multiply(x[2:], x[:-2])
-        self._previous = self.i.data
-        self.o.data = pd.DataFrame(
-            tkeo, columns=self._columns, index=self.i.data.index[1:-1]
-        )
+        length = len(x)
+
+        # Place the new samples right after the last two ones
+        if self._buffer is None or len(self._buffer) < length + 2 or self._buffer.shape[1] != x.shape[1]:
+            buffer = np.empty((length + 2, x.shape[1]))
+            if self._buffer is not None:
+                buffer[:2] = self._buffer[:2]
+            self._buffer = buffer
+        self._buffer[2:length + 2] = x
+        s = self._buffer[2 - self._history:length + 2]
+        times = np.concatenate((self._times[2 - self._history:], self.i.data.index.values))
+
+        if len(s) > 2:
+            tkeo = np.square(s[1:-1])
+            tkeo -= s[2:] * s[:-2]
+            self.o.data = pd.DataFrame(
+                tkeo, columns=self._columns, index=times[1:-1]
+            )
+
+        # Keep the last two samples
+        self._history = min(2, len(s))
+        self._buffer[2 - self._history:2] = s[-self._history:]
+        self._times[2 - self._history:] = times[-self._history:]
 
 
 class DetectBurst(Node):
     """Detect EMG activation  Burst
+
+    The detection threshold is interpolated between the 0% level (signal mean) and the
+    100% level (energy maximum), expressed in signal standard deviations. The energy is
+    then scaled by the mean plus one standard deviation of the values above the threshold.
+    All statistics are streaming, so that the cost of an update stays constant.
+
     Attributes:
-        i (Port): Default input, expects DataFrame.
+        i_signal (Port): Signal, expects DataFrame.
+        i_energy (Port): Energy, expects DataFrame.
         o (Port): Default output, provides DataFrame and meta.
+
+    Args:
+        intensity (float): Threshold level, in percent.
+        window (float|None): If set, time constant of the exponential forgetting of the statistics, in samples (default: None).
     """
 
-    def __init__(self, intensity):
+    def __init__(self, intensity, window=None):
         self._intensity = intensity
-
-        self._signal_sum = None
-        self._signal_samples = 0
+        self._signal = RunningStats(window)
+        self._above_thres = RunningStats(window)
         self._energy_max = None
-        self._last_burst = pd.DataFrame()
-        self._labels = {-1: "burst_ends", 1: "burst_begins"}
-        self._previous = pd.DataFrame()
         self._threshold = None
-        self._signal_ready = self._energy_ready = False
-        self._above_thres = []
 
     def update(self):
         self._update_threshold()
 
         if self.i_energy.ready() and self._threshold is not None:
-            # if we want a boolean activation
-            # burst = (self._previous.append(self.i_energy.data) > self._threshold).astype(float)
-            self._above_thres.append(
-                self.i_energy.data[self.i_energy.data > self._threshold]
-            )
-
-            _tmp = pd.concat(self._above_thres).dropna()
-            _max = _tmp.mean() + _tmp.std()  # todo; until convergence!
+            energy = self.i_energy.data.values
+            self._above_thres.update(np.where(energy > self._threshold, energy, np.nan))
+            _max = self._above_thres.mean + self._above_thres.std  # todo; until convergence!
             # if we want scaled activation between 0 and 1
-            burst = self._previous.append(self.i_energy.data)
-            burst = burst / _max
-
-            self.o.data = burst
-            self._previous = self.i_energy.data.iloc[[-1], :]
+            self.o.data = pd.DataFrame(
+                energy / _max, index=self.i_energy.data.index, columns=self.i_energy.data.columns
+            )
+            self.o.meta = self.i_energy.meta
 
     def _update_threshold(self):
         if self.i_signal.ready():
-            self._signal_samples += len(self.i_signal.data)
-            if not self._signal_ready:
-                self._signal_sum = self.i_signal.data.sum()
-                self._signal_mean = self._signal_sum / self._signal_samples
-                self._signal_sumsq = (
-                    (self.i_signal.data - self._signal_mean) ** 2
-                ).sum()
-                self._signal_std = self._signal_sumsq / self._signal_samples
-                self._signal_ready = True
-            else:
-                self._signal_sum += self.i_signal.data.sum()
-                self._signal_mean = self._signal_sum / self._signal_samples
-                self._signal_std = np.sqrt((self._signal_sumsq / self._signal_samples))
+            self._signal.update(self.i_signal.data.values)
         if self.i_energy.ready():
-            if not self._energy_ready:
-                self._energy_max = self.i_energy.data.max()
-                self._energy_ready = True
-            else:
-                self._energy_max = np.maximum(
-                    self._energy_max, self.i_energy.data.max()
-                )
-
-        if self._signal_ready and self._energy_ready:
-            self._threshold_0_perc_level = (-self._signal_mean) / self._signal_std
-            self._threshold_100_perc_level = (
-                self._energy_max - self._signal_mean
-            ) / self._signal_std
-            self._threshold = pd.concat(
-                [self._threshold_0_perc_level, self._threshold_100_perc_level], axis=1
-            ).apply(self._estimate_threshold, axis=1)
-
-    def _estimate_threshold(self, x):
-        """
-        Regression function that with a percent input gives an absolute value of the threshold
-        level (used in the muscular activation detection algorithm).
-        Converts a relative threshold level to an absolute value.
-        """
-        self._slope, self._intercept = linregress([0, 100], x.values)[:2]
-        return self._slope * self._intensity + self._intercept
+            _max = self.i_energy.data.values.max(axis=0)
+            self._energy_max = _max if self._energy_max is None else np.maximum(self._energy_max, _max)
+
+        if self._signal.ready() and self._energy_max is not None:
+            # Linear interpolation between the 0% and 100% levels
+            mean, std = self._signal.mean, self._signal.std
+            low = -mean / std
+            high = (self._energy_max - mean) / std
+            self._threshold = low + (high - low) * self._intensity / 100
+
+
+class EMGPreprocessing(Node):
+    """Fused EMG preprocessing
+
+    Equivalent to the chain DropOutsider -> notch IIRFilter -> bandpass IIRFilter -> TKEO
+    -> MovingAverage -> RecursiveScaler (minmax), computed on NumPy arrays in a single node,
+    without intermediate DataFrames. Both filters are cascaded into a single set of second-order
+    sections with a persistent state.
+
+    Attributes:
+        i (Port): Raw EMG, expects DataFrame.
+        o (Port): Scaled burst activation, provides DataFrame and meta.
+        o_filtered (Port): Filtered EMG, provides DataFrame and meta.
+
+    Args:
+        rate (float|None): Nominal sampling rate. If None, it is read from the meta, or
+            estimated from the first chunk (default: None).
+        saturation (list): Saturation range of the raw signal (default: [-1.5, 1.5]).
+        drop (bool): If True, chunks with saturated samples are dropped. Else, saturated
+            samples are clipped (default: True).
+        notch (list): Bandstop frequencies (default: [45, 55]).
+        notch_order (int): Bandstop filter order (default: 1).
+        bandpass (list): Bandpass frequencies (default: [10, 200]).
+        bandpass_order (int): Bandpass filter order (default: 2).
+        smoothing (float): Length of the moving average applied to the TKEO, in seconds (default: 0.5).
+        limits (list|None): Clipping range before minmax scaling (default: [0.1, 2]).
+    """
+
+    def __init__(self, rate=None, saturation=[-1.5, 1.5], drop=True, notch=[45, 55], notch_order=1, bandpass=[10, 200], bandpass_order=2, smoothing=.5, limits=[.1, 2]):
+        self._rate = rate
+        self._saturation = saturation
+        self._drop = drop
+        self._filters = [("bandstop", notch, notch_order), ("bandpass", bandpass, bandpass_order)]
+        self._smoothing = smoothing
+        self._limits = limits
+        self._sos = None
+
+    def update(self):
+        if not self.i.ready():
+            return
+        if self._sos is None:
+            self._init()
+
+        x = self.i.data.values
+        length = len(x)
+        columns = self.i.data.columns
+
+        # Saturation
+        if self._saturation is not None:
+            low, high = self._saturation
+            if ((x < low) | (x > high)).any():
+                if self._drop:
+                    return
+                x = np.clip(x, low, high)
+
+        # Cascaded notch and bandpass filters
+        if self._zi is None:
+            self._zi = signal.sosfilt_zi(self._sos)[:, :, np.newaxis] * x[0]
+        filtered, self._zi = signal.sosfilt(self._sos, x, axis=0, zi=self._zi)
+        self.o_filtered.data = pd.DataFrame(filtered, index=self.i.data.index, columns=columns, copy=False)
+        self.o_filtered.meta = self.i.meta
+
+        # TKEO, with the last two samples of the previous chunk
+        if len(self._buffer) < length + 2:
+            buffer = np.empty((length + 2, x.shape[1]))
+            buffer[:2] = self._buffer[:2]
+            self._buffer = buffer
+        self._buffer[2:length + 2] = filtered
+        s = self._buffer[2 - self._history:length + 2]
+        times = np.concatenate((self._times[2 - self._history:], self.i.data.index.values))
+        history = min(2, len(s))
+        if len(s) > 2:
+            energy = np.square(s[1:-1])
+            energy -= s[2:] * s[:-2]
+        self._buffer[2 - history:2] = s[-history:]
+        self._times[2 - history:] = times[-history:]
+        self._history = history
+        if len(s) <= 2:
+            return
+
+        # Smoothing and scaling, in place
+        self._rolling.update(energy, out=energy)
+        if self._limits is not None:
+            np.clip(energy, self._limits[0], self._limits[1], out=energy)
+        self._max = np.fmax(self._max, np.fmax.reduce(energy, axis=0))
+        self._min = np.fmin(self._min, np.fmin.reduce(energy, axis=0))
+        energy -= self._min
+        energy /= self._max - self._min
+        self.o.data = pd.DataFrame(energy, index=times[1:-1], columns=columns, copy=False)
+        self.o.meta = self.i.meta
+
+    def _init(self):
+        rate = self._rate or self.i.meta.get("rate")
+        if not rate:
+            duration = (self.i.data.index[-1] - self.i.data.index[0]).total_seconds()
+            rate = (len(self.i.data) - 1) / duration
+        channels = self.i.data.shape[1]
+        self._sos = np.vstack([
+            construct_iir_filter(rate=rate, frequencies=frequencies, filter_type=filter_type, order=order, output="sos")[0]
+            for filter_type, frequencies, order in self._filters
+        ])
+        self._zi = None
+        self._buffer = np.empty((2, channels))
+        self._times = np.empty(2, dtype=self.i.data.index.dtype)
+        self._history = 0
+        self._rolling = RollingMean(round(self._smoothing * rate), channels)
+        self._max = np.full(channels, -np.inf)
+        self._min = np.full(channels, np.inf)
+
+
+class SlidingFeatures(Node):
+    """EMG temporal features on sliding windows
+
+    Streaming equivalent of ``timeflux.nodes.window.Slide`` followed by
+    ``estimators.emg.EMGFeatures``. Instead of copying and featurizing each window, running sums
+    (of samples, squares, absolute values, zero crossings, absolute differences and slope-sign
+    changes) are kept over the window, so that the cost per sample does not depend on the window
+    length. The maximum is computed at each complete window only, in a single vectorized pass
+    over the last samples.
+
+    Attributes:
+        i (Port): Default data input, expects DataFrame.
+        o_* (Port): Feature vectors, one row per window, provide DataFrame and meta.
+
+    Args:
+        length (float): The length of the window, in seconds.
+        step (float): The sliding step, in seconds.
+        features (list): Features, see ``estimators.emg.EMGFeatures`` (default: ["max", "std", "zcr"]).
+        rate (float|None): Nominal sampling rate. If None, it is read from the meta, or
+            estimated from the first chunk (default: None).
+    """
+
+    # Running sums required by each feature
+    _REQUIRES = {"max": [], "std": ["sum", "squares"], "zcr": ["crossings"], "rms": ["squares"], "mav": ["absolute"], "wl": ["length"], "ssc": ["slopes"]}
+
+    # Number of previous samples involved in each running sum
+    _LAGS = {"sum": 0, "squares": 0, "absolute": 0, "crossings": 1, "length": 1, "slopes": 2}
+
+    def __init__(self, length, step, features=["max", "std", "zcr"], rate=None):
+        EMGFeatures(features).fit(None)
+        self._length = length
+        self._step = step
+        self._features = features
+        self._rate = rate
+        self._sums = None
+
+    def update(self):
+        if not self.i.ready():
+            return
+        if self._sums is None:
+            self._init()
+
+        x = self.i.data.values.astype(float)
+        length = len(x)
+        positions = np.arange(length)
+        indices = self._count + positions
+
+        # Contributions of each new sample, with the last two samples of the previous chunk
+        s = np.vstack((self._history, x))
+        self._history = s[-2:]
+        diff = np.diff(s, axis=0)
+        contributions = {}
+        for name in self._names:
+            if name == "sum":
+                contribution = x
+            elif name == "squares":
+                contribution = np.square(x)
+            elif name == "absolute":
+                contribution = np.abs(x)
+            elif name == "crossings":
+                signs = np.sign(s)
+                contribution = signs[2:] != signs[1:-1]
+            elif name == "length":
+                contribution = np.abs(diff[1:])
+            elif name == "slopes":
+                contribution = diff[1:] * diff[:-1] < 0
+            lag = self._LAGS[name]
+            if self._count < lag:
+                contribution = contribution * (indices >= lag)[:, np.newaxis]
+            contributions.setdefault(lag, []).append(contribution)
+
+        # Window sums at each new sample
+        sums = {}
+        for lag, items in contributions.items():
+            stacked = self._sums[lag].update(np.hstack(items).astype(float))
+            names = [name for name in self._names if self._LAGS[name] == lag]
+            sums.update(zip(names, np.hsplit(stacked, len(names))))
+
+        # Positions of the complete windows
+        window = self._window
+        positions = positions[(indices >= window - 1) & ((indices - (window - 1)) % self._hop == 0)]
+
+        # Sliding maximum
+        if "max" in self._features:
+            maxima = self._maxima(x, positions)
+
+        # Features of each complete window
+        for port, position in enumerate(positions):
+            row = []
+            for feature in self._features:
+                if feature == "max":
+                    row.append(maxima[port])
+                elif feature == "std":
+                    mean = sums["sum"][position] / window
+                    row.append(np.sqrt(np.maximum(sums["squares"][position] / window - mean ** 2, 0)))
+                elif feature == "zcr":
+                    row.append(sums["crossings"][position] / window)
+                elif feature == "rms":
+                    row.append(np.sqrt(sums["squares"][position] / window))
+                elif feature == "mav":
+                    row.append(sums["absolute"][position] / window)
+                elif feature == "wl":
+                    row.append(sums["length"][position])
+                elif feature == "ssc":
+                    row.append(sums["slopes"][position] / window)
+            o = getattr(self, "o_" + str(port))
+            o.data = pd.DataFrame(np.hstack(row)[np.newaxis], index=self.i.data.index[[position]], columns=self._columns)
+            o.meta = self.i.meta
+        if len(positions):
+            self.o = self.o_0  # Bind default output to the first window
+
+        self._count += length
+
+    def _maxima(self, x, positions):
+        """Return the maximum of each complete window, and keep the samples of the next ones."""
+        s = np.vstack((self._tail, x))
+        self._tail = s[len(s) - self._window + 1:]
+        # The window ending at each new sample starts at the same position in s
+        windows = np.lib.stride_tricks.sliding_window_view(s, self._window, axis=0)
+        return windows[positions].max(axis=-1)
+
+    def _init(self):
+        rate = self._rate or self.i.meta.get("rate")
+        if not rate:
+            duration = (self.i.data.index[-1] - self.i.data.index[0]).total_seconds()
+            rate = (len(self.i.data) - 1) / duration
+        channels = self.i.data.shape[1]
+        self._window = max(1, round(self._length * rate))
+        self._hop = max(1, round(self._step * rate))
+        self._names = []
+        for feature in self._features:
+            self._names += [name for name in self._REQUIRES[feature] if name not in self._names]
+        self._sums = {}
+        for lag in (0, 1, 2):
+            width = channels * sum(self._LAGS[name] == lag for name in self._names)
+            if width:
+                self._sums[lag] = RollingSum(self._window - lag, width)
+        self._history = np.zeros((2, channels))
+        self._tail = np.zeros((self._window - 1, channels))
+        self._count = 0
+        self._columns = [f"{feature}_{column}" for feature in self._features for column in self.i.data.columns]
+
+
+class EpochFeatures(Node):
+    """EMG temporal features on epochs
+
+    Applies ``estimators.emg.EMGFeatures`` to each input epoch, so that epochs can be
+    used alongside ``SlidingFeatures`` vectors.
+
+    Attributes:
+        i_* (Port): Epochs, expect DataFrame and meta.
+        o_* (Port): Feature vectors, one row per epoch, provide DataFrame and meta.
+
+    Args:
+        features (list): Features, see ``estimators.emg.EMGFeatures`` (default: ["max", "std", "zcr"]).
+    """
+
+    def __init__(self, features=["max", "std", "zcr"]):
+        self._features = features
+        self._estimator = EMGFeatures(features).fit(None)
+
+    def update(self):
+        for _, suffix, port in list(self.iterate("i*")):
+            if port.ready():
+                data = port.data
+                features = self._estimator.transform(data.values[np.newaxis])
+                columns = [f"{feature}_{column}" for feature in self._features for column in data.columns]
+                o = getattr(self, "o" + suffix)
+                o.data = pd.DataFrame(features, index=data.index[[-1]], columns=columns)
+                o.meta = port.meta
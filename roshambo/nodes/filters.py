@@ -1,95 +1,119 @@
 import numpy as np
 import pandas as pd
 from timeflux.core.node import Node
-from timeflux.nodes.window import Slide
+from nodes.stats import RunningStats, RollingMean
 
 
-class MovingAverage(Slide):
+class MovingAverage(Node):
     """Average the data on a rolling window
+
+    The last samples of each channel are kept in a ring buffer, along with their running sum,
+    so that a smoothed value can be computed for every input sample at a constant cost.
+
     Attributes:
         i (Port): Default input, expects DataFrame.
         o (Port): Default output, provides DataFrame and meta.
 
     Args:
         length (float): The length of the window, in seconds.
+        step (float): If 0, a value is emitted for each input sample. Otherwise, a value is
+            emitted once per step, in seconds (default: 0).
+        rate (float|None): Nominal sampling rate. If None, it is read from the meta, or
+            estimated from the first chunk (default: None).
     """
 
-    def __init__(self, length, step):
-
-        super(self.__class__, self).__init__(length=length, step=step)
-        self._columns = None
+    def __init__(self, length, step=0, rate=None):
+        self._length = length
+        self._step = pd.Timedelta(seconds=step) if step else None
+        self._rate = rate
+        self._rolling = None
+        self._origin = None
+        self._last_step = -1
 
     def update(self):
 
         if not self.i.ready():
             return
-        if self._columns is None:
-            self._columns = self.i.data.columns
-
-        # At this point, we are sure that we have some data to process
-        super(self.__class__, self).update()
-
-        # if the window output is ready, fit the scaler with its values
-        if self.o.ready():
-            time = self.i.data.index[-1]
-            self.o.data = pd.DataFrame(
-                np.mean(self.o.data.values, axis=0).reshape(1, -1),
-                index=[time],
-                columns=self._columns,
-            )
+        if self._rolling is None:
+            self._init()
+
+        averages = self._rolling.update(self.i.data.values)
+
+        # Output
+        index = self.i.data.index
+        if self._step is not None:
+            # Keep the first sample of each new step
+            if self._origin is None:
+                self._origin = index[0]
+            steps = (index - self._origin) // self._step
+            keep = np.diff(steps, prepend=self._last_step) > 0
+            self._last_step = steps[-1]
+            if not keep.any():
+                return
+            averages, index = averages[keep], index[keep]
+        self.o.data = pd.DataFrame(averages, index=index, columns=self.i.data.columns)
+        self.o.meta = self.i.meta
+
+    def _init(self):
+        rate = self._rate or self.i.meta.get("rate")
+        if not rate:
+            duration = (self.i.data.index[-1] - self.i.data.index[0]).total_seconds()
+            rate = (len(self.i.data) - 1) / duration
+        self._rolling = RollingMean(round(self._length * rate), self.i.data.shape[1])
 
 
 class RecursiveScaler(Node):
     """Scale data with recursively updated parameters (min, max, mean..)
+
+    Statistics are kept per channel in NumPy arrays, and each chunk is clipped (in minmax mode)
+    and scaled in a single copy of its values.
+
         Attributes:
         i (Port): Default input, expects DataFrame.
         o (Port): Default output, provides DataFrame and meta.
 
     Args:
-        method (str): Method of scaling (minmax or mean)
+        method (str): Method of scaling (minmax or standard)
         kxargs (kwargs): Depends on the chosen smethod
             If minmax, one can et the limit range.
-            If standard, one can choose either to scale with centering and/or scaling
+            If standard, one can choose either to scale with centering and/or scaling,
+            and set the time constant of the exponential forgetting (window, in samples).
     """
 
     def __init__(self, method="minmax", **kwargs):
         self._range = kwargs.get("limits")
-        self._with_scaling = kwargs.get("with_scaling") or True
-        self._with_centering = kwargs.get("_with_centering") or True
+        self._with_scaling = kwargs.get("with_scaling", True)
+        self._with_centering = kwargs.get("with_centering", True)
+        self._window = kwargs.get("window")
         self._method = method
         self.reset()
 
     def update(self):
         if not self.i.ready():
             return
-        # copy the data and the meta
-        self.o = self.i
+        x = np.array(self.i.data.values, dtype=float)
         if self._method == "minmax":
             if self._range is not None:
-                self.i.data[self.i.data > self._range[1]] = self._range[1]
-                self.i.data[self.i.data > self._range[0]] = self._range[0]
+                np.clip(x, self._range[0], self._range[1], out=x)
             # estimate min/max of samples distribution recursively
-            self._max = np.maximum(self._max, self.i.data.max())
-            self._min = np.minimum(self._min, self.i.data.min())
-            self.o.data = (self.i.data - self._min) / (self._max - self._min)
+            self._max = np.fmax(self._max, np.fmax.reduce(x, axis=0))
+            self._min = np.fmin(self._min, np.fmin.reduce(x, axis=0))
+            x -= self._min
+            x /= self._max - self._min
         else:  # self._method == "standard":
             # estimate mean/std of samples distribution recursively
-            self._sum += self.i.data.sum()
-            self._mean = self._signal_sum / self._n
-            self._std = np.sqrt((self._sum / self._n))
-
-            if self._with_centering:
-                self.o.data -= self._mean
+            self._stats.update(x)
             if self._with_centering:
-                self.o.data /= self._std
+                x -= self._stats.mean
+            if self._with_scaling:
+                x /= self._stats.std
+        self.o.data = pd.DataFrame(x, index=self.i.data.index, columns=self.i.data.columns, copy=False)
+        self.o.meta = self.i.meta
 
     def reset(self):
         self._max = -np.inf
         self._min = np.inf
-        self._n = 0
-        self._sum = 0
-        self._mean = 0
-        self._std = 0
+        self._stats = RunningStats(self._window)
 
 
 class DropOutsider(Node):
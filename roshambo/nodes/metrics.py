@@ -0,0 +1,7 @@
+"""Performance metrics, shared by the demos: see ``common/metrics.py``"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.metrics import Instrument, Metrics
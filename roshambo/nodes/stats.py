@@ -0,0 +1,168 @@
+import numpy as np
+
+
+class RunningStats:
+    """Streaming per-channel statistics
+
+    Mean and variance are updated chunk by chunk with the parallel form of Welford's algorithm,
+    so that the cost of an update only depends on the chunk size. NaN values are ignored.
+    Optionally, older samples are exponentially forgotten. Minimum and maximum are never forgotten.
+
+    Args:
+        window (float|None): Time constant of the exponential forgetting, in samples.
+            If None, all samples have the same weight (default: None).
+
+    Attributes:
+        count (ndarray): Weighted number of samples, per channel.
+        mean (ndarray): Mean, per channel.
+        min (ndarray): Minimum, per channel.
+        max (ndarray): Maximum, per channel.
+    """
+
+    def __init__(self, window=None):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.count = None
+        self.mean = None
+        self.min = None
+        self.max = None
+        self._m2 = None
+
+    def ready(self):
+        """Return True once at least one valid sample has been seen for every channel."""
+        return self.count is not None and bool(np.all(self.count > 0))
+
+    @property
+    def var(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._m2 / self.count
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def update(self, x):
+        """Update the statistics with a new chunk.
+
+        Args:
+            x (ndarray): New samples, shape (n_samples, n_channels).
+        """
+        x = np.asarray(x, dtype=float)
+        if self.count is None:
+            channels = x.shape[1]
+            self.count = np.zeros(channels)
+            self.mean = np.zeros(channels)
+            self._m2 = np.zeros(channels)
+            self.min = np.full(channels, np.inf)
+            self.max = np.full(channels, -np.inf)
+
+        valid = ~np.isnan(x)
+        if self.window:
+            # Forget older samples, and weight the new ones by their age
+            decay = 1 - 1 / self.window
+            self.count *= decay ** len(x)
+            self._m2 *= decay ** len(x)
+            weights = decay ** np.arange(len(x) - 1, -1, -1)[:, np.newaxis] * valid
+        else:
+            weights = valid
+        count = weights.sum(axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.nansum(weights * x, axis=0) / count
+            m2 = np.nansum(weights * (x - mean) ** 2, axis=0)
+
+        # Merge the chunk statistics
+        total = self.count + count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            delta = mean - self.mean
+            self.mean = np.where(count > 0, self.mean + delta * count / total, self.mean)
+            self._m2 = np.where(count > 0, self._m2 + m2 + delta ** 2 * self.count * count / total, self._m2)
+        self.count = total
+        self.min = np.fmin(self.min, np.fmin.reduce(x, axis=0))
+        self.max = np.fmax(self.max, np.fmax.reduce(x, axis=0))
+
+
+class RollingSum:
+    """Streaming per-channel moving sum
+
+    The last samples are kept in a ring buffer, along with their running sum, so that a sum
+    is computed for every input sample at a constant cost. The running sum is recomputed from the
+    buffer once per window to avoid numerical drift. Until the buffer is full, the sum is
+    computed over the available samples.
+
+    Args:
+        window (int): Length of the window, in samples.
+        channels (int): Number of channels.
+    """
+
+    def __init__(self, window, channels):
+        self.window = max(1, int(window))
+        self._buffer = np.zeros((self.window, channels))
+        self._sum = np.zeros(channels)
+        self._head = 0
+        self._count = 0
+        self._since = 0
+
+    def update(self, x, out=None):
+        """Sum each new sample with the previous ones.
+
+        Args:
+            x (ndarray): New samples, shape (n_samples, n_channels).
+            out (ndarray|None): Optional output array, may be ``x`` itself.
+
+        Returns:
+            ndarray, shape (n_samples, n_channels)
+        """
+        length = len(x)
+        window = self.window
+
+        # Samples leaving the window: oldest buffered samples, then the chunk itself
+        # (unfilled buffer slots are zeros)
+        indices = np.arange(length)
+        dropped = np.empty(x.shape)
+        dropped[:window] = self._buffer[(self._head + indices[:window]) % window]
+        if length > window:
+            dropped[window:] = x[:length - window]
+
+        # Update the buffer before x is possibly overwritten
+        recent = min(length, window)
+        self._buffer[(self._head + indices[length - recent:]) % window] = x[length - recent:]
+
+        # Running sum at each sample
+        np.subtract(x, dropped, out=dropped)
+        sums = np.cumsum(dropped, axis=0, out=dropped if out is None else out)
+        sums += self._sum
+        self._sum = sums[-1].copy()
+
+        # Update the state
+        self._counts = np.minimum(self._count + indices + 1, window)
+        self._head = (self._head + length) % window
+        self._count = min(self._count + length, window)
+        self._since += length
+        if self._since >= window:
+            self._sum = self._buffer.sum(axis=0)
+            self._since = 0
+
+        return sums
+
+
+class RollingMean(RollingSum):
+    """Streaming per-channel moving average
+
+    Same as RollingSum, divided by the number of samples in the window.
+    """
+
+    def update(self, x, out=None):
+        """Average each new sample with the previous ones.
+
+        Args:
+            x (ndarray): New samples, shape (n_samples, n_channels).
+            out (ndarray|None): Optional output array, may be ``x`` itself.
+
+        Returns:
+            ndarray, shape (n_samples, n_channels)
+        """
+        sums = super().update(x, out)
+        sums /= self._counts[:, np.newaxis]
+        return sums
@@ -0,0 +1,77 @@
+"""Compare the per-chunk latency of the EMG preprocessing chain and of the fused node
+
+Example:
+    $ python scripts/benchmark_preprocessing.py --channels 2 8 --chunk 100
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+from time import perf_counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from timeflux_dsp.nodes.filters import IIRFilter
+from nodes.emg import TKEO, EMGPreprocessing
+from nodes.filters import DropOutsider, MovingAverage, RecursiveScaler
+
+
+def chain(rate):
+    return [
+        DropOutsider(left=-1.5, right=1.5),
+        IIRFilter(rate=rate, filter_type="bandstop", frequencies=[45, 55], order=1),
+        IIRFilter(rate=rate, filter_type="bandpass", frequencies=[10, 200], order=2),
+        TKEO(),
+        MovingAverage(length=.5, rate=rate),
+        RecursiveScaler(method="minmax", limits=[.1, 2]),
+    ]
+
+
+def run_chain(nodes, chunk):
+    port = chunk
+    for node in nodes:
+        node.o.data = None
+        node.i.data = port
+        node.update()
+        port = node.o.data
+        if port is None:
+            break
+
+
+def run_fused(node, chunk):
+    node.o.data = node.o_filtered.data = None
+    node.i.data = chunk
+    node.update()
+
+
+def benchmark(channels, rate=1000, chunk=100, duration=60, seed=42):
+    rng = np.random.default_rng(seed)
+    samples = rate * duration
+    index = pd.date_range("2023-01-01", periods=samples, freq=pd.Timedelta(seconds=1 / rate))
+    data = pd.DataFrame(rng.normal(scale=.3, size=(samples, channels)), index=index)
+    chunks = [data.iloc[start:start + chunk] for start in range(0, samples, chunk)]
+    results = {}
+    for name, node, run in (("chain", chain(rate), run_chain), ("fused", EMGPreprocessing(rate=rate), run_fused)):
+        latencies = []
+        for data in chunks:
+            start = perf_counter()
+            run(node, data)
+            latencies.append(perf_counter() - start)
+        results[name] = np.array(latencies) * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument("-c", "--channels", type=int, nargs="+", default=[2, 8, 32], help="number of channels")
+    parser.add_argument("-r", "--rate", type=int, default=1000, help="sampling rate")
+    parser.add_argument("-s", "--chunk", type=int, default=100, help="chunk size, in samples")
+    parser.add_argument("-d", "--duration", type=int, default=60, help="duration of the signal, in seconds")
+    args = parser.parse_args()
+    np.seterr(all="ignore")  # warm-up of the minmax scaling
+    print("channels\tchain median (us)\tchain p95 (us)\tfused median (us)\tfused p95 (us)")
+    for channels in args.channels:
+        results = benchmark(channels, args.rate, args.chunk, args.duration)
+        chain_, fused = results["chain"], results["fused"]
+        print(f"{channels}\t\t{np.median(chain_):.0f}\t\t\t{np.percentile(chain_, 95):.0f}\t\t{np.median(fused):.0f}\t\t\t{np.percentile(fused, 95):.0f}")
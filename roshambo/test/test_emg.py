@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+from nodes.emg import TKEO, DetectBurst, EMGPreprocessing, SlidingFeatures, EpochFeatures
+from estimators.emg import EMGFeatures
+
+def test_tkeo_streaming():
+    np.random.seed(42)
+    data = pd.DataFrame(np.random.randn(1000, 2), columns=["A1_EMG", "A2_EMG"], index=pd.date_range("2023-01-01", periods=1000, freq="ms"))
+    node = TKEO()
+    chunks = []
+    # Irregular chunk sizes, including single samples
+    for start, stop in zip([0, 1, 2, 50, 51, 400], [1, 2, 50, 51, 400, 1000]):
+        node.o.data = None
+        node.i.data = data.iloc[start:stop]
+        node.update()
+        if node.o.data is not None:
+            chunks.append(node.o.data)
+    result = pd.concat(chunks)
+    x = data.values
+    expected = pd.DataFrame(x[1:-1] ** 2 - x[2:] * x[:-2], columns=data.columns, index=data.index[1:-1])
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+def test_detect_burst_threshold():
+    np.random.seed(42)
+    index = pd.date_range("2023-01-01", periods=1000, freq="ms")
+    signal = pd.DataFrame(np.random.randn(1000, 2), index=index)
+    energy = signal ** 2
+    node = DetectBurst(intensity=10)
+    for start in range(0, 1000, 100):
+        node.i_signal.data = signal.iloc[start:start + 100]
+        node.i_energy.data = energy.iloc[start:start + 100]
+        node.update()
+    mean, std = signal.values.mean(axis=0), signal.values.std(axis=0)
+    low, high = -mean / std, (energy.values.max(axis=0) - mean) / std
+    np.testing.assert_allclose(node._threshold, low + (high - low) * .1)
+    assert node.o.data.shape == (100, 2)
+
+def test_preprocessing_matches_chain():
+    from timeflux_dsp.nodes.filters import IIRFilter
+    from nodes.filters import DropOutsider, MovingAverage, RecursiveScaler
+    np.random.seed(42)
+    data = pd.DataFrame(np.random.randn(3000, 2) * .5, columns=["A1_EMG", "A2_EMG"], index=pd.date_range("2023-01-01", periods=3000, freq="ms"))
+    data.iloc[1234, 0] = 2  # saturated chunk
+    chain = [
+        DropOutsider(left=-1.5, right=1.5),
+        IIRFilter(rate=1000, filter_type="bandstop", frequencies=[45, 55], order=1),
+        IIRFilter(rate=1000, filter_type="bandpass", frequencies=[10, 200], order=2),
+        TKEO(),
+        MovingAverage(length=.5, rate=1000),
+        RecursiveScaler(method="minmax", limits=[.01, 2]),
+    ]
+    fused = EMGPreprocessing(rate=1000, limits=[.01, 2])
+    for start in range(0, 3000, 100):
+        chunk = data.iloc[start:start + 100]
+        fused.i.data = chunk
+        fused.o.data = fused.o_filtered.data = None
+        fused.update()
+        port = chunk
+        for node in chain:
+            node.o.data = None
+            node.i.data = port
+            node.update()
+            port = node.o.data
+            if port is None:
+                break
+            if node is chain[2]:
+                pd.testing.assert_frame_equal(fused.o_filtered.data, port)
+        if port is None:
+            assert fused.o.data is None
+        else:
+            pd.testing.assert_frame_equal(fused.o.data, port)
+    assert not fused.o.data.isna().values.any()
+
+def test_sliding_features():
+    np.random.seed(42)
+    rate, length, step = 100, 300, 20
+    data = pd.DataFrame(np.random.randn(2000, 2), columns=["A1_EMG", "A2_EMG"], index=pd.date_range("2023-01-01", periods=2000, freq="10ms"))
+    data.iloc[100:110] = 0
+    features = ["max", "std", "zcr", "rms", "mav", "wl", "ssc"]
+    node = SlidingFeatures(length=3, step=.2, features=features, rate=rate)
+    rows = []
+    for start in range(0, 2000, 37):
+        node.i.data = data.iloc[start:start + 37]
+        for _, _, port in list(node.iterate("o_*")):
+            port.data = None
+        node.update()
+        for _, suffix, port in sorted(node.iterate("o_*"), key=lambda item: int(item[1])):
+            if port.ready():
+                rows.append(port.data)
+    result = pd.concat(rows)
+    windows = np.array([data.values[start:start + length] for start in range(0, 2000 - length + 1, step)])
+    expected = EMGFeatures(features).fit_transform(windows)
+    np.testing.assert_allclose(result.values, expected, atol=1e-9)
+    assert list(result.index) == list(data.index[length - 1::step])
+    assert list(result.columns[:2]) == ["max_A1_EMG", "max_A2_EMG"]
+
+def test_epoch_features():
+    np.random.seed(42)
+    data = pd.DataFrame(np.random.randn(300, 2), index=pd.date_range("2023-01-01", periods=300, freq="10ms"))
+    node = EpochFeatures()
+    node.i_0.data = data
+    node.i_0.meta = {"epoch": {"context": {"id": "rock"}}}
+    node.update()
+    np.testing.assert_allclose(node.o_0.data.values, EMGFeatures().fit_transform(data.values[np.newaxis]))
+    assert node.o_0.meta == node.i_0.meta
@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+from estimators.emg import EMGFeatures
+
+def test_features_default():
+    np.random.seed(42)
+    X = np.random.randn(5, 300, 2)
+    X[0, 10:20, 0] = 0
+    result = EMGFeatures().fit_transform(X)
+    zcr = [[len(np.where(np.diff(np.sign(X[i, :, j])))[0]) / 300 for j in range(2)] for i in range(5)]
+    expected = np.hstack([X.max(axis=1), X.std(axis=1), zcr])
+    np.testing.assert_allclose(result, expected)
+
+def test_features_extended():
+    np.random.seed(42)
+    X = np.random.randn(5, 300, 2)
+    result = EMGFeatures(features=["rms", "mav", "wl", "ssc"]).fit_transform(X)
+    diff = np.diff(X, axis=1)
+    ssc = [[sum(diff[i, k, j] * diff[i, k + 1, j] < 0 for k in range(298)) / 300 for j in range(2)] for i in range(5)]
+    expected = np.hstack([np.sqrt((X ** 2).mean(axis=1)), np.abs(X).mean(axis=1), np.abs(diff).sum(axis=1), ssc])
+    np.testing.assert_allclose(result, expected)
+
+def test_features_unknown():
+    with pytest.raises(ValueError):
+        EMGFeatures(features=["foo"]).fit(np.zeros((1, 10, 1)))
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+from nodes.filters import MovingAverage, RecursiveScaler
+
+def _stream(node, data, sizes):
+    chunks = []
+    start = 0
+    for size in sizes:
+        node.o.data = None
+        node.i.data = data.iloc[start:start + size]
+        node.update()
+        if node.o.data is not None:
+            chunks.append(node.o.data)
+        start += size
+    return pd.concat(chunks)
+
+def test_moving_average():
+    np.random.seed(42)
+    data = pd.DataFrame(np.random.randn(2000, 2), columns=["A1_EMG", "A2_EMG"], index=pd.date_range("2023-01-01", periods=2000, freq="ms"))
+    node = MovingAverage(length=.1, rate=1000)
+    result = _stream(node, data, [1, 30, 99, 250, 120, 1500])
+    expected = data.rolling(100, min_periods=1).mean()
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+def test_moving_average_step():
+    np.random.seed(42)
+    data = pd.DataFrame(np.random.randn(2000, 2), index=pd.date_range("2023-01-01", periods=2000, freq="ms"))
+    node = MovingAverage(length=.1, step=.2, rate=1000)
+    result = _stream(node, data, [150] * 13 + [50])
+    expected = data.rolling(100, min_periods=1).mean().iloc[::200]
+    pd.testing.assert_frame_equal(result, expected, check_freq=False)
+
+def test_moving_average_rate_from_index():
+    data = pd.DataFrame(np.ones((500, 1)), index=pd.date_range("2023-01-01", periods=500, freq="4ms"))
+    node = MovingAverage(length=1)
+    _stream(node, data, [500])
+    assert node._rolling.window == 250
+
+def test_recursive_scaler_minmax():
+    np.random.seed(42)
+    data = pd.DataFrame(np.random.randn(1000, 2) * 3, index=pd.date_range("2023-01-01", periods=1000, freq="ms"))
+    node = RecursiveScaler(method="minmax", limits=[-2, 2])
+    result = _stream(node, data, [100] * 10)
+    clipped = data.clip(-2, 2)
+    expected = (clipped - clipped.cummin()) / (clipped.cummax() - clipped.cummin())
+    # Statistics are updated once per chunk
+    np.testing.assert_allclose(result.values[-100:], expected.values[-100:])
+    assert result.values.min() >= 0 and result.values.max() <= 1
+
+def test_recursive_scaler_standard():
+    np.random.seed(42)
+    data = pd.DataFrame(np.random.randn(1000, 2) * [1, 5] + [3, -2], index=pd.date_range("2023-01-01", periods=1000, freq="ms"))
+    node = RecursiveScaler(method="standard")
+    result = _stream(node, data, [100] * 10)
+    expected = (data - data.mean()) / data.std(ddof=0)
+    np.testing.assert_allclose(result.values[-100:], expected.values[-100:])
+
+def test_recursive_scaler_standard_limits():
+    # The limits only apply to the minmax mode
+    np.random.seed(42)
+    data = pd.DataFrame(np.random.randn(1000, 2) * 3, index=pd.date_range("2023-01-01", periods=1000, freq="ms"))
+    result = _stream(RecursiveScaler(method="standard", limits=[-1, 1]), data, [100] * 10)
+    expected = _stream(RecursiveScaler(method="standard"), data, [100] * 10)
+    pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from nodes.stats import RunningStats
+
+def test_running_stats():
+    np.random.seed(42)
+    x = np.random.randn(1000, 3) * [1, 2, 3] + [0, 1, 2]
+    x[::7, 1] = np.nan
+    stats = RunningStats()
+    for chunk in np.array_split(x, 13):
+        stats.update(chunk)
+    np.testing.assert_allclose(stats.mean, np.nanmean(x, axis=0))
+    np.testing.assert_allclose(stats.std, np.nanstd(x, axis=0))
+    np.testing.assert_allclose(stats.min, np.nanmin(x, axis=0))
+    np.testing.assert_allclose(stats.max, np.nanmax(x, axis=0))
+
+def test_running_stats_forgetting():
+    stats = RunningStats(window=100)
+    stats.update(np.zeros((10000, 1)))
+    stats.update(np.ones((1000, 1)))
+    # Older samples are forgotten
+    assert stats.mean[0] == pytest.approx(1, abs=1e-3)
+    assert stats.count[0] == pytest.approx(100, rel=1e-2)
+
+def test_running_stats_not_ready():
+    stats = RunningStats()
+    assert not stats.ready()
+    stats.update(np.array([[1, np.nan]]))
+    assert not stats.ready()
+    stats.update(np.array([[1, 2]]))
+    assert stats.ready()
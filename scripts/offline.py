@@ -0,0 +1,302 @@
+"""Run an application offline, on a recorded session, as fast as possible
+
+All the graphs of the application are merged into a single one. The ZMQ and shared-memory
+publishers and subscribers are replaced by direct edges, the interfaces and the HDF5 recorders
+are removed, and the HDF5 replay nodes read the session by large blocks and send it in chunks
+of constant duration, without waiting. Every published topic is saved in the output file.
+
+Example:
+    $ python scripts/offline.py neurofeedback/bands/main.yaml -i data/bitalino_eeg.hdf5 -o bands.hdf5
+"""
+
+import os
+import logging
+import pandas as pd
+import networkx as nx
+from time import perf_counter
+from timeflux.core.node import Node
+from timeflux.core.manager import Manager
+from timeflux.core.worker import Worker
+from timeflux.core.scheduler import Scheduler
+from timeflux.core.registry import Registry
+from timeflux.core.exceptions import WorkerInterrupt
+from timeflux.nodes.hdf5 import Replay
+
+# Publishers and subscribers, replaced by direct edges
+PUBLISHERS = {("timeflux.nodes.zmq", "Pub"), ("nodes.shm", "Pub")}
+SUBSCRIBERS = {("timeflux.nodes.zmq", "Sub"), ("nodes.shm", "Sub")}
+
+# Nodes that are only useful online
+REMOVED = {
+    ("timeflux.nodes.zmq", None),
+    ("timeflux.nodes.debug", None),
+    ("timeflux.nodes.hdf5", "Save"),
+    ("timeflux_ui.nodes.ui", None),
+}
+
+
+class Source(Replay):
+    """Replay a HDF5 file as fast as possible
+
+    The data is read by large blocks of rows, and sent in chunks of constant duration.
+    The timestamps are not resynchronized.
+
+    Args:
+        filename (str): The path to the HDF5 file.
+        keys (list): The list of keys to replay.
+        timespan (float): The duration of each chunk, in seconds.
+        start (float): Start directly at the given time offset, in seconds (default: 0).
+        block (int): The number of rows read at once (default: 100000).
+    """
+
+    def __init__(self, filename, keys, timespan, start=0, block=100000, **kwargs):
+        super().__init__(filename, keys, timespan=timespan, resync=False, start=start)
+        self._block = block
+        for source in self._sources.values():
+            source["position"] = 0
+            source["buffer"] = None
+
+    def update(self):
+        if self._current > self._stop:
+            raise WorkerInterrupt("No more data.")
+        low = self._current
+        high = low + self._timespan
+        for key, source in self._sources.items():
+            buffer = source["buffer"]
+            while (buffer is None or buffer.empty or buffer.index[-1] < high) and source["position"] < source["nrows"]:
+                block = self._store.select(key, start=source["position"], stop=source["position"] + self._block)
+                buffer = block if buffer is None else pd.concat([buffer, block])
+                source["position"] += len(block)
+            if buffer is None:
+                continue
+            split = buffer.index.searchsorted(high)
+            data = buffer.iloc[:split]
+            source["buffer"] = buffer.iloc[split:]
+            getattr(self, source["name"]).data = data[data.index >= low]
+            getattr(self, source["name"]).meta = source["meta"]
+        self._current = high
+
+    @property
+    def current(self):
+        return self._current
+
+
+class Output(Node):
+    """Save the published topics, by large blocks
+
+    Each topic is saved under its own key (eg. ``/raw``).
+
+    Args:
+        filename (str): The path to the HDF5 file.
+        min_itemsize (int): The size of the string columns (default: 200).
+        block (int): The number of rows accumulated before writing (default: 100000).
+    """
+
+    def __init__(self, filename, min_itemsize=200, block=100000):
+        self._store = pd.HDFStore(filename, "w")
+        self._min_itemsize = min_itemsize
+        self._block = block
+        self._chunks = {}
+        self._rows = {}
+        self._meta = {}
+
+    def update(self):
+        for _, topic, port in self.iterate("i_*"):
+            if port.ready():
+                self._chunks.setdefault(topic, []).append(port.data)
+                self._rows[topic] = self._rows.get(topic, 0) + len(port.data)
+                if self._rows[topic] >= self._block:
+                    self._flush(topic)
+            if port.meta:
+                self._meta[topic] = port.meta
+
+    def terminate(self):
+        for topic in self._chunks:
+            self._flush(topic)
+        for topic, meta in self._meta.items():
+            if f"/{topic}" in self._store:
+                self._store.get_node(topic)._v_attrs["meta"] = meta
+        self._store.close()
+
+    def _flush(self, topic):
+        if not self._chunks[topic]:
+            return
+        data = pd.concat(self._chunks[topic])
+        data.index.freq = None
+        self._store.append(topic, data, min_itemsize=self._min_itemsize)
+        self._chunks[topic] = []
+        self._rows[topic] = 0
+
+
+class Loopback(Node):
+    """Forward data to another node, without any edge between them
+
+    Two nodes with the same name form a pair: the data received by the first one is sent by
+    the second one, during the same cycle if it comes later in the graph, or else during
+    the next one.
+
+    Args:
+        name (str): The name of the pair.
+        send (bool): Whether this node is the sending end of the pair.
+    """
+
+    _mailboxes = {}
+
+    def __init__(self, name, send):
+        self._name = name
+        self._send = send
+
+    def update(self):
+        mailbox = Loopback._mailboxes.setdefault(self._name, [])
+        if not self._send:
+            if self.i.ready() or self.i.meta:
+                mailbox.append((self.i.data, self.i.meta))
+        elif mailbox:
+            data, meta = zip(*mailbox)
+            frames = [frame for frame in data if frame is not None]
+            self.o.data = pd.concat(frames) if frames else None
+            self.o.meta = meta[-1]
+            mailbox.clear()
+
+
+def merge(graphs, input=None, output=None, chunk=None, drop=()):
+    """Merge the graphs of an application into a single offline graph
+
+    Args:
+        graphs (list): The graphs, as loaded by the manager.
+        input (str|None): If set, replaces the file of the replay nodes.
+        output (str|None): If set, the published topics are saved in this HDF5 file.
+        chunk (float|None): Duration of the replayed chunks, in seconds. If None, the
+            chunks match the rate of the replay graph.
+        drop (list): Ids of additional nodes to remove.
+
+    Returns:
+        dict: The merged graph.
+    """
+
+    nodes = []
+    edges = []
+    publishers = {}  # topic -> list of sources
+    subscribers = []  # (topic, target)
+    replays = {}  # key -> node id
+    recorded = set()  # topics published by removed nodes
+
+    for graph in graphs:
+        prefix = graph["id"] + "."
+        kinds = {}
+        for node in graph["nodes"]:
+            module, name = node["module"], node["class"]
+            if (module, name) in PUBLISHERS:
+                kinds[node["id"]] = ("pub", node["params"]["topic"])
+            elif (module, name) in SUBSCRIBERS:
+                kinds[node["id"]] = ("sub", None)
+            elif (module, None) in REMOVED or (module, name) in REMOVED or node["id"] in drop:
+                kinds[node["id"]] = ("removed", None)
+            else:
+                node = {**node, "id": prefix + node["id"], "params": dict(node.get("params", {}))}
+                if module == "timeflux.nodes.hdf5" and name == "Replay":
+                    node["module"], node["class"] = __name__, "Source"
+                    if input:
+                        node["params"]["filename"] = os.path.abspath(input)
+                    if not chunk:
+                        chunk = 1 / graph["rate"] if graph.get("rate") else .1
+                    node["params"]["timespan"] = chunk
+                    for key in node["params"]["keys"]:
+                        replays[key.strip("/").replace("/", "_")] = node["id"]
+                nodes.append(node)
+        for edge in graph.get("edges", []):
+            source, target = edge["source"], edge["target"]
+            source_id, _, source_port = source.partition(":")
+            target_id, _, target_port = target.partition(":")
+            source_kind = kinds.get(source_id, (None,))[0]
+            target_kind = kinds.get(target_id, (None,))[0]
+            if source_kind == "removed" and target_kind == "pub":
+                # Published by an interface, eg. events: use the recording instead
+                recorded.add(kinds[target_id][1])
+            if "removed" in (source_kind, target_kind):
+                continue
+            if target_kind == "pub":
+                publishers.setdefault(kinds[target_id][1], []).append(prefix + source)
+            elif source_kind == "sub":
+                subscribers.append((source_port, prefix + target))
+            elif source_kind != "pub":
+                edges.append({"source": prefix + source, "target": prefix + target})
+
+    # Replace the subscriptions by direct edges
+    # Through ZMQ, a graph can subscribe to its own outputs, one cycle later. Such feedback
+    # edges would close a cycle, and are replaced by a pair of loopback nodes instead.
+    dag = nx.DiGraph()
+    dag.add_nodes_from(node["id"] for node in nodes)
+    dag.add_edges_from((edge["source"].split(":")[0], edge["target"].split(":")[0]) for edge in edges)
+    loopbacks = 0
+    for topic, target in subscribers:
+        sources = list(publishers.get(topic, []))
+        if topic in replays and (topic in recorded or topic not in publishers):
+            sources.append(f"{replays[topic]}:{topic}")
+        if not sources:
+            logging.getLogger(__name__).warning("Topic '%s' is never published", topic)
+        for source in sources:
+            source_id, target_id = source.split(":")[0], target.split(":")[0]
+            if nx.has_path(dag, target_id, source_id):
+                loopback = f"offline.loopback_{loopbacks}"
+                loopbacks += 1
+                nodes.append({"id": f"{loopback}_in", "module": __name__, "class": "Loopback", "params": {"name": loopback, "send": False}})
+                nodes.append({"id": f"{loopback}_out", "module": __name__, "class": "Loopback", "params": {"name": loopback, "send": True}})
+                edges.append({"source": source, "target": f"{loopback}_in"})
+                edges.append({"source": f"{loopback}_out", "target": target})
+            else:
+                dag.add_edge(source_id, target_id)
+                edges.append({"source": source, "target": target})
+
+    # Save the published topics
+    if output:
+        nodes.append({
+            "id": "offline.save",
+            "module": __name__,
+            "class": "Output",
+            "params": {"filename": os.path.abspath(output)},
+        })
+        for topic, sources in publishers.items():
+            for source in sources:
+                edges.append({"source": source, "target": f"offline.save:{topic}"})
+
+    return {"id": "offline", "nodes": nodes, "edges": edges, "rate": 0}
+
+
+def run(app, input=None, output=None, chunk=None, drop=()):
+    if output and os.path.exists(output):
+        print("The output file will be overwritten.")
+        os.remove(output)
+    manager = Manager(app)
+    graph = merge(manager._graphs, input, output, chunk, drop)
+    path, nodes = Worker(graph).load()
+    sources = [node for node in nodes.values() if isinstance(node, Source)]
+    if not sources:
+        exit("There is no replay node in this application.")
+    scheduler = Scheduler(path, nodes, 0)
+    cycles = 0
+    start = perf_counter()
+    try:
+        while True:
+            # Nodes relying on the cycle time see the time of the recording
+            Registry.cycle_start = sources[0].current.value / 1e9
+            scheduler.next()
+            cycles += 1
+    except WorkerInterrupt:
+        pass
+    finally:
+        scheduler.terminate()
+    print(f"{cycles} cycles in {perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument("app", help="application file")
+    parser.add_argument("-i", "--input", default=None, help="HDF5 file to replay instead of the one of the application")
+    parser.add_argument("-o", "--output", default=None, help="HDF5 file where the published topics are saved")
+    parser.add_argument("-c", "--chunk", type=float, default=None, help="duration of each chunk, in seconds (default: graph rate)")
+    parser.add_argument("-d", "--drop", nargs="*", default=[], help="ids of additional nodes to remove")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    run(args.app, args.input, args.output, args.chunk, args.drop)
@@ -3,48 +3,210 @@ from sklearn.base import BaseEstimator, ClassifierMixin
 from sklearn.cross_decomposition import CCA
 
 class CVEP_CCA(BaseEstimator, ClassifierMixin):
+    """CCA-based CVEP classifier
 
-    def __init__(self, n_classes=None, offset=None):
+    Each epoch is scored against every template with the first canonical correlation.
+
+    Args:
+        n_classes (int): Total number of targets, including the untrained ones (default: None).
+        offset (int): Shift between two consecutive targets, in samples (default: None).
+        method (string): Scoring method: 'closed' for the batched closed-form solution
+            or 'nipals' for the iterative scikit-learn CCA (default: 'closed').
+    """
+
+    def __init__(self, n_classes=None, offset=None, method="closed"):
         self._cca = CCA(n_components=1, max_iter=1000)
-        self._templates = {}
+        self._classes = []
+        self._templates = None
         self.n_classes=n_classes
         self.offset=offset
-    
+        self.method=method
+
     def fit(self, X, y, sample_weight=None):
-        
+
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y)
         trained = np.unique(y)
-        
+
         # Mean of trained sequences
-        for template_id in trained:
-            indices = np.where(y == template_id)            
-            self._templates[template_id] = X[indices].mean(axis=0)
-            
+        templates = np.array([X[y == template_id].mean(axis=0) for template_id in trained])
+        self._classes = list(trained)
+
         # Mean of shifted trained sequences
+        # Rolling is linear: the trained templates are realigned on the first target and averaged
+        # once, then each untrained template is a single shifted view of this reference.
         if self.n_classes and self.offset:
-            for i in [x for x in range(self.n_classes) if x not in trained]:
-                templates = []
-                for template_id in trained:
-                    offset = (i - template_id) * self.offset
-                    template = np.concatenate((self._templates[template_id][:, offset:], self._templates[template_id][:, :offset]), axis=1)
-                    templates.append(template)
-                self._templates[i] = np.array(templates).mean(axis=0)
-                
-        return self    
-    
+            untrained = np.array([x for x in range(self.n_classes) if x not in trained], dtype=int)
+            if len(untrained):
+                reference = _roll(templates, trained * self.offset).mean(axis=0)
+                shifted = _roll(np.broadcast_to(reference, (len(untrained),) + reference.shape), -untrained * self.offset)
+                templates = np.concatenate((templates, shifted))
+                self._classes += list(untrained)
+        self._templates = templates
+
+        # Whitening factors, computed once for all templates
+        if self.method == "closed":
+            self._bases = _whiten(self._templates)
+
+        return self
+
     def predict(self, X):
+        if self.method == "closed":
+            return [self._classes[j] for j in self._correlations(X).argmax(axis=1)]
         y = []
         for x in X:
-            correlations = {}            
-            for template_id in self._templates:                            
-                x_score, y_score = self._cca.fit_transform(x.T, self._templates[template_id].T)
+            correlations = {}
+            for template_id, template in zip(self._classes, self._templates):
+                x_score, y_score = self._cca.fit_transform(x.T, template.T)
                 correlations[template_id] = np.corrcoef(x_score.T, y_score.T)[0, 1]
             y.append(max(correlations, key=lambda k: correlations[k]))
-        return y   
-    
+        return y
+
     def predict_proba(self, X):
-        P = np.zeros(shape=(len(X), len(self._templates)))
-        for i, x in enumerate(X):
-            for j, template_id in enumerate(self._templates):
-                x_score, y_score = self._cca.fit_transform(x.T, self._templates[template_id].T)
-                P[i, j] = np.corrcoef(x_score.T, y_score.T)[0, 1]
-        return P / np.resize(P.sum(axis=1), P.T.shape).T
\ No newline at end of file
+        if self.method == "closed":
+            P = self._correlations(X)
+        else:
+            P = np.zeros(shape=(len(X), len(self._templates)))
+            for i, x in enumerate(X):
+                for j, template in enumerate(self._templates):
+                    x_score, y_score = self._cca.fit_transform(x.T, template.T)
+                    P[i, j] = np.corrcoef(x_score.T, y_score.T)[0, 1]
+        return P / np.resize(P.sum(axis=1), P.T.shape).T
+
+    def _correlations(self, X):
+        """ First canonical correlation between each epoch and each template.
+
+        The canonical correlations are the singular values of Ux'Uy, where Ux and Uy
+        are orthonormal bases of the centered epoch and template.
+
+        Returns:
+            ndarray, shape (n_epochs, n_templates)
+        """
+        Ux = _whiten(np.asarray(X, dtype=float))
+        n_epochs, n_samples, n_x = Ux.shape
+        n_templates, _, n_y = self._bases.shape
+        # One product for all the (epoch, template) pairs
+        Uy = self._bases.transpose(1, 0, 2).reshape(n_samples, n_templates * n_y)
+        M = (Ux.transpose(0, 2, 1) @ Uy).reshape(n_epochs, n_x, n_templates, n_y)
+        M = M.transpose(0, 2, 1, 3)
+        return np.linalg.svd(M, compute_uv=False)[..., 0].clip(max=1)
+
+
+class CVEP_FFT(BaseEstimator, ClassifierMixin):
+    """Circular cross-correlation CVEP classifier
+
+    All the targets are circular shifts of the same m-sequence. The trained epochs are
+    therefore realigned on a single reference template, and each epoch is scored against
+    every shift at once with one FFT-based circular cross-correlation.
+    The cost per epoch is O(n_samples * log(n_samples)), whatever the number of classes.
+
+    Args:
+        n_classes (int): Total number of targets.
+        offset (int): Shift between two consecutive targets, in samples.
+    """
+
+    def __init__(self, n_classes=16, offset=8):
+        self.n_classes=n_classes
+        self.offset=offset
+
+    def fit(self, X, y, sample_weight=None):
+
+        # Realign each epoch on the first target
+        X = np.asarray(X, dtype=float)
+        y = np.asarray(y)
+        X = _roll(X, y * self.offset)
+
+        # Reference template, giving the same weight to each trained target
+        trained = np.unique(y)
+        reference = np.array([X[y == target].mean(axis=0) for target in trained]).mean(axis=0)
+
+        # Spatial filters maximizing the correlation between the epochs and the reference
+        epochs = np.hstack(X)
+        templates = np.tile(reference, len(X))
+        self._filter, reference_filter = _cca_weights(epochs, templates)
+        self._reference = _normalize(reference_filter @ reference)
+
+        # Lag matching each target
+        self._lags = (-np.arange(self.n_classes) * self.offset) % X.shape[-1]
+
+        return self
+
+    def predict(self, X):
+        return list(self._correlations(X).argmax(axis=1))
+
+    def predict_proba(self, X):
+        P = self._correlations(X).clip(min=np.finfo(float).eps)
+        return P / P.sum(axis=1, keepdims=True)
+
+    def _correlations(self, X):
+        """ Correlation between each spatially filtered epoch and each shifted reference.
+
+        Returns:
+            ndarray, shape (n_epochs, n_classes)
+        """
+        x = _normalize(self._filter @ np.asarray(X, dtype=float))
+        n_samples = x.shape[-1]
+        spectrum = np.fft.rfft(x, axis=-1) * np.conj(np.fft.rfft(self._reference))
+        correlations = np.fft.irfft(spectrum, n=n_samples, axis=-1)
+        return correlations[:, self._lags]
+
+
+def _whiten(X):
+    """ Orthonormal basis of each centered signal.
+
+    Directions with negligible variance are zeroed out, so that rank-deficient
+    signals (e.g. after common average rereferencing) do not inflate the correlation.
+
+    Args:
+        X (ndarray): Signals, shape (..., n_channels, n_samples).
+
+    Returns:
+        ndarray, shape (..., n_samples, n_channels)
+    """
+    X = X - X.mean(axis=-1, keepdims=True)
+    U, s, _ = np.linalg.svd(np.swapaxes(X, -1, -2), full_matrices=False)
+    tol = s[..., :1] * max(X.shape[-2:]) * np.finfo(s.dtype).eps
+    return U * (s > tol)[..., np.newaxis, :]
+
+
+def _roll(X, shifts):
+    """ Circularly shift each signal by its own number of samples, as np.roll would.
+
+    Args:
+        X (ndarray): Signals, shape (n_signals, n_channels, n_samples).
+        shifts (array-like): Shift of each signal, shape (n_signals,).
+
+    Returns:
+        ndarray, shape (n_signals, n_channels, n_samples)
+    """
+    n_samples = X.shape[-1]
+    indices = (np.arange(n_samples) - np.asarray(shifts)[:, np.newaxis]) % n_samples
+    return np.take_along_axis(X, indices[:, np.newaxis, :], axis=-1)
+
+
+def _normalize(x):
+    """ Center and scale the last axis to unit norm."""
+    x = x - x.mean(axis=-1, keepdims=True)
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+def _cca_weights(X, Y):
+    """ First pair of canonical weights.
+
+    Args:
+        X (ndarray): First signal, shape (n_channels, n_samples).
+        Y (ndarray): Second signal, shape (n_channels, n_samples).
+
+    Returns:
+        tuple of ndarray, shape (n_channels,)
+    """
+    weights = []
+    bases = []
+    for Z in (X, Y):
+        Z = (Z - Z.mean(axis=-1, keepdims=True)).T
+        U, s, Vt = np.linalg.svd(Z, full_matrices=False)
+        rank = s > s[0] * max(Z.shape) * np.finfo(s.dtype).eps
+        bases.append(U[:, rank])
+        weights.append(Vt[rank].T / s[rank])
+    A, _, Bt = np.linalg.svd(bases[0].T @ bases[1])
+    return weights[0] @ A[:, 0], weights[1] @ Bt[0]
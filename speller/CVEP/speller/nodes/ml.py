@@ -0,0 +1,7 @@
+"""Machine learning pipeline with typed probabilities, shared by the demos: see ``common/ml.py``"""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", ".."))
+from common.ml import Pipeline
@@ -15,9 +15,11 @@ class Accumulate(Node):
     Optionnaly, a recovery period can be applied for all classes or a specific set of classes. This is useful to discard stale epochs.
 
     Attributes:
-        i_model (Port): Single-trial predictions from the ML node, expects DataFrame.
+        i_model (Port): Single-trial predictions from the ML node, expects DataFrame and optional typed probabilities in meta.
         i_reset (Port): Reset events for updating arguments, expects DataFrame.
-        o_events (Port): Final predictions and optional feedback, provides DataFrame
+        o_events (Port): Final predictions and optional feedback, provides DataFrame. If the timestamps of
+            the last sample of the epochs are available in the ``samples`` input meta key, the timestamp of
+            the last sample a prediction is based on is provided in the ``sample`` meta key.
 
     Args:
         accumulation (string): Accumulation method: 'sum' for mean or 'prod' for bayesian (default: 'prod').
@@ -41,7 +43,8 @@ class Accumulate(Node):
         self.feedback = feedback
         self.classes = classes
         self.source = source
-        self._buffer = []
+        self._buffer = None
+        self._size = 0
         self._iterations = 0
         self._recovery = False
 
@@ -65,6 +68,16 @@ class Accumulate(Node):
                 epochs = iter(self.i_model.meta["epochs"])
             else:
                 epochs = None
+            # Get an iterator over typed probabilities, if any
+            if "proba" in self.i_model.meta:
+                probas = iter(self.i_model.meta["proba"])
+            else:
+                probas = None
+            # Get an iterator over the timestamps of the last sample of each epoch, if any
+            if "samples" in self.i_model.meta:
+                samples = iter(self.i_model.meta["samples"])
+            else:
+                samples = None
             for timestamp, row in self.i_model.data.iterrows():
                 # Check if the model is fitted and forward the event
                 if row.label == "ready":
@@ -72,6 +85,12 @@ class Accumulate(Node):
                     return
                 # Check probabilities
                 elif row.label == "predict_proba":
+                    # Use the typed probabilities if available, otherwise parse the event
+                    if probas:
+                        proba = next(probas)
+                    else:
+                        proba = json.loads(row["data"])["result"]
+                    sample = next(samples) if samples else None
                     # Use the epoch timestamp if available, otherwise use the event timestamp
                     if epochs:
                         onset = next(epochs)["epoch"]["onset"]
@@ -87,10 +106,7 @@ class Accumulate(Node):
                             self._recovery = timestamp
                             continue
                     # Append to buffer
-                    proba = json.loads(row["data"])["result"]
-                    self._buffer.append(proba)
-                    if len(self._buffer) > self.max_buffer_size:
-                        self._buffer.pop(0)
+                    self._append(proba)
                     self._iterations += 1
                     # Accumulate
                     scores = getattr(self, f"_accumulation_{self.accumulation}")()
@@ -101,7 +117,7 @@ class Accumulate(Node):
                         meta = {"scores": list(scores), "source": self.source}
                         self.o.data = make_event("feedback", meta, False)
                     # Wait for enough data
-                    if len(self._buffer) < self.min_buffer_size:
+                    if self._size < self.min_buffer_size:
                         continue
                     # Score
                     if len(scores) < 2:
@@ -113,10 +129,12 @@ class Accumulate(Node):
                         target = int(scores.argmax())
                         meta = {"timestamp": timestamp, "target": target, "score": score, "accumulation": list(scores), "iterations": self._iterations, "source": self.source}
                         self.o.data = make_event("predict", meta, False)
+                        if sample is not None:
+                            self.o.meta = {"sample": sample}
                         self.logger.debug(meta)
-                        self._buffer = []
+                        self._clear()
                         self._iterations = 0
-                        if self.classes is None or indices[0] in self.classes:
+                        if self.classes is None or target in self.classes:
                             self._recovery = timestamp
 
     def _reset(self, settings):
@@ -127,27 +145,63 @@ class Accumulate(Node):
         if settings.get("max_buffer_size"): self.max_buffer_size = settings["max_buffer_size"]
         if settings.get("recovery"): self.recovery = settings["recovery"]
         if settings.get("feedback") != None: self.feedback = settings["feedback"]
-        self._buffer = []
+        self._buffer = None
         self._iterations = 0
 
+    def _append(self, proba):
+        """ Append probabilities to the ring buffer and update the running sums.
+
+            The buffer is allocated on the first call, when the number of classes is known.
+            Once full, the oldest probabilities are overwritten and removed from the sums.
+        """
+        proba = np.asarray(proba, dtype=float)
+        if self._buffer is None or self._buffer.shape[1] != len(proba):
+            self._buffer = np.zeros((self.max_buffer_size, len(proba)))
+            self._log_buffer = np.zeros((self.max_buffer_size, len(proba)))
+            self._clear()
+        log_proba = np.log(np.maximum(proba, np.finfo(float).tiny))
+        if self._size == self.max_buffer_size:
+            self._sum -= self._buffer[self._head]
+            self._log_sum -= self._log_buffer[self._head]
+        else:
+            self._size += 1
+        self._buffer[self._head] = proba
+        self._log_buffer[self._head] = log_proba
+        self._sum += proba
+        self._log_sum += log_proba
+        self._head = (self._head + 1) % self.max_buffer_size
+        if self._head == 0:
+            # Re-anchor the running sums once per cycle to avoid numerical drift
+            self._sum = self._buffer[:self._size].sum(axis=0)
+            self._log_sum = self._log_buffer[:self._size].sum(axis=0)
+
+    def _clear(self):
+        """ Empty the buffer, keeping the allocated memory.
+        """
+        self._size = 0
+        self._head = 0
+        if self._buffer is not None:
+            self._sum = np.zeros(self._buffer.shape[1])
+            self._log_sum = np.zeros(self._buffer.shape[1])
+
     def _accumulation_mean(self):
         """ Sum the probabilities together.
             After scaling, this is equivalent to averaging the epochs.
         """
-        return np.sum(np.array(self._buffer), axis=0)
+        return self._sum.copy()
 
     def _accumulation_bayesian(self):
         """ Multiply the probabilities together.
+            The product is computed in the log domain and rescaled by its maximum to avoid underflow.
         """
-        return np.prod(np.array(self._buffer), axis=0)
+        return np.exp(self._log_sum - self._log_sum.max())
 
     def _scoring_ratio(self, scores):
-        indices = np.flip(np.argsort(scores))
-        return scores[indices[0]] / scores[indices[1]]
+        second, first = np.sort(scores[np.argpartition(scores, -2)[-2:]])
+        return first / second
 
     def _scoring_highest(self, scores):
-        indices = np.flip(np.argsort(scores))
-        return scores[indices[0]]
+        return scores.max()
 
     def _scoring_iteration(self, scores):
         return self._iterations
@@ -5,6 +5,12 @@ from timeflux.core.node import Node
 class Shift(Node):
     """Shift CVEP predictions
 
+    Each prediction is rotated by the target of its epoch, provided in the ``epochs`` meta key.
+    If the probabilities are also available as an array in the ``proba`` meta key, all the
+    epochs are shifted at once, and the JSON data of each event is updated from the result.
+    Otherwise, the JSON data of each event is shifted. Without epochs, the predictions are
+    left untouched.
+
     Attributes:
         i (Port): Single-trial predictions from the ML node, expects DataFrame.
         o (Port): Shifted predictions, provides DataFrame
@@ -13,15 +19,32 @@ class Shift(Node):
     def update(self):
         if self.i.ready():
             self.o = self.i
-            if "epochs" in self.o.meta:
-                meta = iter(self.o.meta["epochs"])
+            if "epochs" not in self.o.meta:
+                self.logger.warning("No epochs, the predictions are not shifted")
+                return
+            if "proba" in self.o.meta:
+                self.o.meta["proba"] = self._shift(self.o.meta["proba"], self.o.meta["epochs"])
+                probas = iter(self.o.meta["proba"].tolist())
+            else:
+                probas = None
+            meta = iter(self.o.meta["epochs"])
             for timestamp, row in self.i.data.iterrows():
                 if row.label == "predict_proba":
                     data = json.loads(row["data"])
-                    scores = data["result"]
-                    target = next(meta)["epoch"]["context"]["target"]
-                    if target != 0:
+                    if probas:
+                        data["result"] = next(probas)
+                    else:
+                        scores = data["result"]
+                        target = next(meta)["epoch"]["context"]["target"]
+                        if target == 0:
+                            continue
                         data["result"] = scores[target:] + scores[0:target]
-                        self.o.data.at[timestamp, "data"] = json.dumps(data)
+                    self.o.data.at[timestamp, "data"] = json.dumps(data)
         else:
             self.o.data = None
+
+    def _shift(self, proba, epochs):
+        """ Rotate each row of probabilities by the target of its epoch."""
+        targets = np.array([epoch["epoch"]["context"]["target"] for epoch in epochs])
+        indices = (np.arange(proba.shape[1]) + targets[:, np.newaxis]) % proba.shape[1]
+        return np.take_along_axis(proba, indices, axis=1)
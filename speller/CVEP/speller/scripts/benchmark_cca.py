@@ -0,0 +1,45 @@
+"""Compare the closed-form and iterative CCA scoring of CVEP_CCA
+
+Example:
+    $ python scripts/benchmark_cca.py --channels 8 16 32
+"""
+
+import os
+import sys
+import numpy as np
+from time import perf_counter
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from estimators.cvep import CVEP_CCA
+
+
+def benchmark(channels, n_classes=16, step=8, length=127, epochs=32, seed=42):
+
+    # Synthetic shifted m-sequence responses
+    rng = np.random.default_rng(seed)
+    code = rng.integers(0, 2, length).astype(float)
+    mixing = rng.normal(size=(channels, 1))
+    y = rng.integers(0, n_classes, epochs)
+    X = np.array([mixing * np.roll(code, -target * step) + rng.normal(size=(channels, length)) for target in y])
+
+    # Epochs per second for each method
+    results = {}
+    for method in ("nipals", "closed"):
+        model = CVEP_CCA(n_classes=n_classes, offset=step, method=method).fit(X, y)
+        start = perf_counter()
+        model.predict_proba(X)
+        results[method] = epochs / (perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+    parser = ArgumentParser()
+    parser.add_argument("-c", "--channels", type=int, nargs="+", default=[8, 16, 32], help="number of channels")
+    parser.add_argument("-e", "--epochs", type=int, default=32, help="number of epochs to score")
+    parser.add_argument("-l", "--length", type=int, default=127, help="epoch length, in samples")
+    args = parser.parse_args()
+    print("channels\tnipals (epochs/s)\tclosed (epochs/s)\tspeedup")
+    for channels in args.channels:
+        results = benchmark(channels, length=args.length, epochs=args.epochs)
+        print(f"{channels}\t\t{results['nipals']:.1f}\t\t\t{results['closed']:.1f}\t\t\t{results['closed'] / results['nipals']:.0f}x")
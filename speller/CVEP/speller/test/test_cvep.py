@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from estimators.cvep import CVEP_CCA, CVEP_FFT
+
+def _dataset(n_classes=16, n_channels=8, step=8, repetitions=3, seed=42):
+    rng = np.random.default_rng(seed)
+    code = rng.integers(0, 2, 127).astype(float)
+    mixing = rng.normal(size=(n_channels, 1))
+    X, y = [], []
+    for target in range(n_classes):
+        for _ in range(repetitions):
+            x = mixing * np.roll(code, -target * step) + rng.normal(size=(n_channels, 127))
+            X.append(x - x.mean(axis=0))  # rank-deficient, as after rereferencing
+            y.append(target)
+    return np.array(X), np.array(y)
+
+def test_closed_form_matches_nipals():
+    X, y = _dataset()
+    train = y < 8
+    nipals = CVEP_CCA(n_classes=16, offset=8, method="nipals").fit(X[train], y[train])
+    closed = CVEP_CCA(n_classes=16, offset=8, method="closed").fit(X[train], y[train])
+    np.testing.assert_allclose(closed.predict_proba(X), nipals.predict_proba(X), atol=1e-4)
+    assert closed.predict(X) == nipals.predict(X)
+
+def test_shifted_templates():
+    X, y = _dataset(repetitions=1)
+    trained = np.isin(y, [0, 3, 5])
+    model = CVEP_CCA(n_classes=16, offset=8).fit(X[trained], y[trained])
+    assert model._classes == [0, 3, 5] + [i for i in range(16) if i not in (0, 3, 5)]
+    for template_id, template in zip(model._classes[3:], model._templates[3:]):
+        expected = np.mean([np.roll(X[y == i][0], -(template_id - i) * 8, axis=1) for i in (0, 3, 5)], axis=0)
+        np.testing.assert_allclose(template, expected)
+
+def test_closed_form_proba_sums_to_one():
+    X, y = _dataset(repetitions=1)
+    proba = CVEP_CCA(n_classes=16, offset=8).fit(X, y).predict_proba(X)
+    assert proba.shape == (16, 16)
+    np.testing.assert_allclose(proba.sum(axis=1), np.ones(16))
+
+def test_fft_matches_direct_correlation():
+    X, y = _dataset()
+    train = y < 8
+    model = CVEP_FFT(n_classes=16, offset=8).fit(X[train], y[train])
+    # Brute-force correlation against each shifted reference
+    x = model._filter @ X
+    expected = np.array([[np.corrcoef(epoch, np.roll(model._reference, -target * 8))[0, 1] for target in range(16)] for epoch in x])
+    np.testing.assert_allclose(model._correlations(X), expected, atol=1e-10)
+
+def test_fft_predict():
+    X, y = _dataset()
+    train = y < 8
+    model = CVEP_FFT(n_classes=16, offset=8).fit(X[train], y[train])
+    np.testing.assert_array_equal(model.predict(X), y)
+    np.testing.assert_allclose(model.predict_proba(X).sum(axis=1), np.ones(len(X)))
@@ -1,3 +1,4 @@
+import json
 import numpy as np
 import pandas as pd
 import pytest
@@ -5,17 +6,81 @@ from nodes.predict import Accumulate
 
 def test_accumulation_mean():
     node = Accumulate()
-    node._buffer = [[1, 2, 3], [4, 5, 6]]
+    node._append([1, 2, 3])
+    node._append([4, 5, 6])
     result = node._accumulation_mean()
     expected = [5, 7, 9]
     np.testing.assert_array_equal(result, expected)
 
 def test_accumulation_bayesian():
     node = Accumulate()
-    node._buffer = [[1, 2, 3], [4, 5, 6]]
+    node._append([1, 2, 3])
+    node._append([4, 5, 6])
     result = node._accumulation_bayesian()
     expected = [4, 10, 18]
-    np.testing.assert_array_equal(result, expected)
+    np.testing.assert_allclose(result / result.sum(), np.array(expected) / 32)
+
+def test_accumulation_mean_long_buffer():
+    node = Accumulate(max_buffer_size=64)
+    np.random.seed(42)
+    probas = np.random.dirichlet(np.ones(16), 1000)
+    for proba in probas:
+        node._append(proba)
+    assert node._size == 64
+    np.testing.assert_allclose(node._accumulation_mean(), probas[-64:].sum(axis=0))
+
+def test_accumulation_bayesian_long_buffer():
+    node = Accumulate(max_buffer_size=500)
+    np.random.seed(42)
+    probas = np.random.dirichlet(np.ones(16), 2000)
+    for proba in probas:
+        node._append(proba)
+    # The raw product underflows, the log-domain accumulation does not
+    assert np.all(np.prod(probas[-500:], axis=0) == 0)
+    log = np.log(probas[-500:]).sum(axis=0)
+    expected = np.exp(log - log.max())
+    result = node._accumulation_bayesian()
+    np.testing.assert_allclose(result / result.sum(), expected / expected.sum(), rtol=1e-6)
+
+def test_accumulation_clear():
+    node = Accumulate(max_buffer_size=4)
+    for _ in range(10):
+        node._append([.2, .8])
+    node._clear()
+    node._append([.4, .6])
+    np.testing.assert_array_equal(node._accumulation_mean(), [.4, .6])
+
+def test_update_predict():
+    node = Accumulate(threshold=2, min_buffer_size=3, max_buffer_size=8, recovery=0)
+    proba = json.dumps({"result": [.2, .5, .3]})
+    node.i_model.data = pd.DataFrame([["predict_proba", proba]] * 4, columns=["label", "data"], index=pd.date_range("2023-01-01", periods=4, freq="s"))
+    node.update()
+    row = node.o.data.iloc[-1]
+    assert row.label == "predict"
+    assert row.data["target"] == 1
+    assert row.data["iterations"] == 3
+    assert row.data["score"] == pytest.approx((.5 / .3) ** 3)
+
+def test_update_predict_typed():
+    node = Accumulate(threshold=2, min_buffer_size=3, max_buffer_size=8, recovery=0)
+    # The typed probabilities take precedence over the JSON data
+    proba = json.dumps({"result": [1, 0, 0]})
+    node.i_model.data = pd.DataFrame([["predict_proba", proba]] * 4, columns=["label", "data"], index=pd.date_range("2023-01-01", periods=4, freq="s"))
+    node.i_model.meta = {"proba": np.tile([.2, .5, .3], (4, 1))}
+    node.update()
+    row = node.o.data.iloc[-1]
+    assert row.data["target"] == 1
+    assert row.data["score"] == pytest.approx((.5 / .3) ** 3)
+
+def test_update_predict_sample():
+    node = Accumulate(threshold=2, min_buffer_size=3, max_buffer_size=8, recovery=0)
+    proba = json.dumps({"result": [.2, .5, .3]})
+    index = pd.date_range("2023-01-01", periods=4, freq="s")
+    node.i_model.data = pd.DataFrame([["predict_proba", proba]] * 4, columns=["label", "data"], index=index)
+    node.i_model.meta = {"samples": list(index)}
+    node.update()
+    # The last sample the decision is based on, for the decision latency
+    assert node.o.meta == {"sample": index[2]}
 
 def test_scoring_ratio():
     node = Accumulate()
@@ -36,4 +101,4 @@ def test_scoring_iteration():
     node._iterations = 42
     result = node._scoring_iteration(None)
     expected = 42
-    assert result == expected
\ No newline at end of file
+    assert result == expected
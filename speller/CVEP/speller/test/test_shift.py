@@ -0,0 +1,44 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from nodes.shift import Shift
+
+def _events(probas, targets):
+    data = [["predict_proba", json.dumps({"result": list(proba)})] for proba in probas]
+    index = pd.date_range("2023-01-01", periods=len(probas), freq="s")
+    epochs = [{"epoch": {"context": {"target": target}}} for target in targets]
+    return pd.DataFrame(data, index=index, columns=["label", "data"]), {"epochs": epochs}
+
+def test_shift_json():
+    node = Shift()
+    node.i.data, node.i.meta = _events([[.1, .2, .3, .4]] * 3, [0, 1, 3])
+    node.update()
+    result = [json.loads(data)["result"] for data in node.o.data["data"]]
+    expected = [[.1, .2, .3, .4], [.2, .3, .4, .1], [.4, .1, .2, .3]]
+    assert result == expected
+
+def test_shift_typed():
+    np.random.seed(42)
+    probas = np.random.rand(10, 16)
+    targets = list(np.random.randint(16, size=10))
+    legacy = Shift()
+    legacy.i.data, legacy.i.meta = _events(probas, targets)
+    legacy.update()
+    expected = [json.loads(data)["result"] for data in legacy.o.data["data"]]
+    node = Shift()
+    node.i.data, node.i.meta = _events(probas, targets)
+    node.i.meta["proba"] = probas
+    node.update()
+    np.testing.assert_array_equal(node.o.meta["proba"], expected)
+    # The JSON data is shifted as well
+    result = [json.loads(data)["result"] for data in node.o.data["data"]]
+    np.testing.assert_array_equal(result, expected)
+
+def test_shift_no_epochs():
+    node = Shift()
+    data, _ = _events([[.1, .2, .3, .4]] * 2, [1, 2])
+    node.i.data, node.i.meta = data.copy(), {"proba": np.array([[.1, .2, .3, .4]] * 2)}
+    node.update()
+    pd.testing.assert_frame_equal(node.o.data, data)
+    np.testing.assert_array_equal(node.o.meta["proba"], [[.1, .2, .3, .4]] * 2)
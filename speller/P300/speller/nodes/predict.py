@@ -1,5 +1,6 @@
 import json
 import numpy as np
+from scipy.special import logsumexp
 from time import time
 from datetime import datetime
 from timeflux.core.node import Node
@@ -48,6 +49,7 @@ class Direct(Node):
         if self.i_model.ready():
             if "epochs" in self.i_model.meta:
                 meta = self.i_model.meta["epochs"]
+            probas = iter(self.i_model.meta["proba"]) if "proba" in self.i_model.meta else None
             for timestamp, row in self.i_model.data.iterrows():
 
                 # Check if the model is fitted and forward the event
@@ -56,11 +58,13 @@ class Direct(Node):
 
                 # Match flashes and epochs, and update probabilities
                 elif row.label == "predict_proba":
+                    proba = next(probas) if probas else None
                     if self.ready:
                         info = meta.pop(0)["epoch"]
                         group = info["context"]["group"]
                         onset = info["onset"]
-                        proba = json.loads(row["data"])["result"]
+                        if proba is None:
+                            proba = json.loads(row["data"])["result"]
                         self._update(proba, group)
                         if onset == self.time:
                             char = self.chars[self.scores.index(max(self.scores))]
@@ -121,36 +125,44 @@ class ASAP(Node):
         if self.i_model.ready():
             if "epochs" in self.i_model.meta:
                 meta = self.i_model.meta["epochs"]
+            probas = iter(self.i_model.meta["proba"]) if "proba" in self.i_model.meta else None
+            # The trials are accumulated in one batch, up to the decision
+            trials, groups = [], []
             for timestamp, row in self.i_model.data.iterrows():
 
                 # Check if the model is fitted and forward the event
                 if row.label == "ready":
                     self.o.data = make_event("ready", serialize=False)
 
-                # Match flashes and epochs, and update probabilities
+                # Match flashes and epochs, and buffer probabilities
                 elif row.label == "predict_proba":
+                    proba = next(probas) if probas else None
                     if self.ready:
                         info = meta.pop(0)["epoch"]
-                        group = info["context"]["group"]
+                        groups.append(info["context"]["group"])
                         onset = info["onset"]
-                        proba = json.loads(row["data"])["result"]
-                        self._update(proba, group)
+                        if proba is None:
+                            proba = json.loads(row["data"])["result"]
+                        trials.append(proba)
                         if onset == self.time:
+                            self._update(trials, groups)
+                            trials, groups = [], []
                             max = np.amax(self.scores)
                             char = self.chars[np.where(self.scores == max)[0][0]]
                             self.o.data = make_event("predict", {"target": char}, False)
                             self.logger.debug(f"Scores:\n{self.scores}")
                             self.logger.debug(f"Predicted: {char}")
                             break
+            if trials:
+                self._update(trials, groups)
 
     def _init(self, setup):
         self.infer = ASAP_Accumulation(len(self.chars))
 
-    def _update(self, proba, group):
-        mask = np.zeros(len(self.chars))
-        for char in group:
-            mask[char] = 1
-        self.scores = self.infer.predict_proba(proba, mask)
+    def _update(self, probas, groups, each_trial=False):
+        masks = _masks(groups, len(self.chars))
+        self.scores = self.infer.predict_proba(probas, masks, each_trial)
+        return self.scores
 
     def _reset(self):
         self.infer.reset()
@@ -159,6 +171,10 @@ class ASAP(Node):
 class ASAP_DynamicStopping(Node):
     """ ASAP (Bayesian accumulation of probabilities) with early stopping rule.
 
+    If the timestamps of the last sample of the epochs are available in the ``samples`` meta
+    key of the model input, the timestamp of the last sample a prediction is based on is
+    provided in the ``sample`` meta key of the output.
+
     Args:
         threshold (float): ratio between the two better scores above which we feel
             confident enough to make a prediction. Default: ``2``.
@@ -189,6 +205,9 @@ class ASAP_DynamicStopping(Node):
         if self.i_model.ready():
             if "epochs" in self.i_model.meta:
                 meta = self.i_model.meta["epochs"]
+            probas = iter(self.i_model.meta["proba"]) if "proba" in self.i_model.meta else None
+            samples = iter(self.i_model.meta["samples"]) if "samples" in self.i_model.meta else None
+            trials, groups, trial_samples = [], [], []
             for timestamp, row in self.i_model.data.iterrows():
 
                 # Check if the model is fitted and forward the event
@@ -197,36 +216,61 @@ class ASAP_DynamicStopping(Node):
                     #self.fitted = True
                     self.o.data = make_event("ready", serialize=False)
 
-                # Match flashes and epochs, and update probabilities
+                # Match flashes and epochs, and buffer probabilities
                 elif row.label == "predict_proba":
+                    proba = next(probas) if probas else None
+                    sample = next(samples) if samples else None
                     if self.ready:
-                        proba = json.loads(row["data"])["result"]
-                        group = meta.pop(0)["epoch"]["context"]["group"]
-                        self._update(proba, group)
-                        indices = np.flip(np.argsort(self.scores))
-                        ratio = self.scores[indices[0]] / self.scores[indices[1]]
-                        self.logger.debug(f"Ratio {self.chars[indices[0]]}/{self.chars[indices[1]]}: {ratio}")
-                        if ratio >= self.threshold:
-                            char = self.chars[indices[0]]
-                            self.o.data = make_event("predict", {"target": char}, False)
-                            self.logger.debug(f"Scores:\n{self.scores}")
-                            self.logger.debug(f"Predicted: {char}")
-                            self._reset()
+                        if proba is None:
+                            proba = json.loads(row["data"])["result"]
+                        trials.append(proba)
+                        groups.append(meta.pop(0)["epoch"]["context"]["group"])
+                        trial_samples.append(sample)
+
+            # Accumulate the buffered trials in one batch, and stop at the first confident one
+            while trials:
+                scores = self._update(trials, groups, each_trial=True)
+                best = np.partition(scores, -2, axis=1)[:, -2:]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    ratios = best[:, 1] / best[:, 0]
+                confident = np.flatnonzero(ratios >= self.threshold)
+                if not len(confident):
+                    self.scores = scores[-1]
+                    break
+                trial = confident[0]
+                self.scores = scores[trial]
+                char = self.chars[np.flip(np.argsort(self.scores))[0]]
+                self.logger.debug(f"Ratio: {ratios[trial]}")
+                self.o.data = make_event("predict", {"target": char}, False)
+                if trial_samples[trial] is not None:
+                    self.o.meta = {"sample": trial_samples[trial]}
+                self.logger.debug(f"Scores:\n{self.scores}")
+                self.logger.debug(f"Predicted: {char}")
+                self._reset()
+                # Start over with the trials that follow the decision
+                trial += 1
+                trials, groups, trial_samples = trials[trial:], groups[trial:], trial_samples[trial:]
 
     def _init(self, setup):
         self.infer = ASAP_Accumulation(len(self.chars))
 
-    def _update(self, proba, group):
-        mask = np.zeros(len(self.chars))
-        for char in group:
-            mask[char] = 1
-        self.scores = self.infer.predict_proba(proba, mask)
+    def _update(self, probas, groups, each_trial=False):
+        masks = _masks(groups, len(self.chars))
+        return self.infer.predict_proba(probas, masks, each_trial)
 
     def _reset(self):
         self.infer.reset()
         self.time = datetime.fromtimestamp(time() + (3600 * 24))
 
 
+def _masks(groups, n_characters):
+    """Flash masks, one row per trial"""
+    masks = np.zeros((len(groups), n_characters))
+    for mask, group in zip(masks, groups):
+        mask[group] = 1
+    return masks
+
+
 class ASAP_Accumulation():
     """ ASAP for P300-speller.
 
@@ -234,6 +278,9 @@ class ASAP_Accumulation():
     processing target and non-target responses to the flash
     and updating each character probability after each trial.
 
+    Probabilities are accumulated in the log domain, so that long sequences
+    of trials do not underflow, and trials can be processed in batches.
+
     Parameters
     ----------
     n_characters : int, (default 36)
@@ -266,54 +313,77 @@ class ASAP_Accumulation():
         else:
             if len(character_prior) != self.n_characters:
                 raise ValueError("Length of character_prior is different from n_characters")
-            self.character_prior = np.asarray(character_prior)
+            self.character_prior = np.asarray(character_prior, dtype=float)
         self.character_prior /= self.character_prior.sum()
 
         self.character_proba = self.character_prior.copy()
+        with np.errstate(divide="ignore"):
+            self.character_log_proba = np.log(self.character_prior)
 
         return self
 
 
-    def predict_proba(self, erp_likelihood, character_flash):
-        """Predict probability of each character after a new trial.
+    def predict_proba(self, erp_likelihood, character_flash, each_trial=False):
+        """Predict probability of each character after one or several new trials.
 
         Parameters
         ----------
-        erp_likelihood : array-like, shape (2,)
+        erp_likelihood : array-like, shape (2,) or (n_trials, 2)
             array-like containing the likelihoods of ERP (non-target and target
-            responses) on this new trial.
-        character_flash : array-like, shape (n_characters,)
+            responses) on each new trial.
+        character_flash : array-like, shape (n_characters,) or (n_trials, n_characters)
             array-like containing 1 is the character has been flashed during
-            this trial, 0 otherwise.
+            each trial, 0 otherwise.
+        each_trial : bool, (default False)
+            If True, return the probabilities after each trial.
 
         Returns
         -------
-        character_proba : ndarray, shape (n_characters,)
+        character_proba : ndarray, shape (n_characters,) or (n_trials, n_characters)
             probability for each character cumulated across trials.
         """
-        if len(erp_likelihood) != 2:
+        erp_likelihood = np.atleast_2d(np.asarray(erp_likelihood, dtype=float))
+        character_flash = np.atleast_2d(np.asarray(character_flash))
+        if erp_likelihood.shape[1] != 2:
             raise ValueError("erp_likelihood must contain 2 values")
+        if character_flash.shape != (len(erp_likelihood), self.n_characters):
+            raise ValueError("character_flash must contain one value per character and per trial")
+        if not np.isin(character_flash, (0, 1)).all():
+            raise ValueError("character_flash must contain only binary numbers")
+
+        # Flashed characters get the likelihood of the target response, the
+        # others the likelihood of the non-target response
+        with np.errstate(divide="ignore"):
+            log_likelihood = np.log(erp_likelihood)
+        finite = np.isfinite(log_likelihood).all()
+
+        if each_trial:
+            if not finite:
+                # Zero likelihoods may trigger a reset: process the trials one by one
+                return np.array([
+                    self.predict_proba(likelihood, flash)
+                    for likelihood, flash in zip(erp_likelihood, character_flash)
+                ])
+            increments = log_likelihood[:, [0]] + (log_likelihood[:, [1]] - log_likelihood[:, [0]]) * character_flash
+            log_proba = self.character_log_proba + np.cumsum(increments, axis=0)
+            log_proba -= logsumexp(log_proba, axis=1, keepdims=True)
+            self.character_log_proba = log_proba[-1].copy()
+            self.character_proba = np.exp(self.character_log_proba)
+            return np.exp(log_proba)
+
+        if finite:
+            self.character_log_proba += log_likelihood[:, 0].sum() + (log_likelihood[:, 1] - log_likelihood[:, 0]) @ character_flash
+        else:
+            # Zero likelihoods: avoid -inf - -inf
+            self.character_log_proba += np.where(character_flash == 1, log_likelihood[:, [1]], log_likelihood[:, [0]]).sum(axis=0)
 
-        for c in range(self.n_characters):
-            if character_flash[c] == 1:
-                # character c has been flashed: likelihood is the distance to
-                # the target response
-                likelihood = erp_likelihood[1]
-            elif character_flash[c] == 0:
-                # character c has not been flashed: likelihood is the distance
-                # to the non-target response
-                likelihood = erp_likelihood[0]
-            else:
-                raise ValueError("character_flash must contain only binary numbers")
-
-            self.character_proba[c] *= likelihood
-
-        sum =  self.character_proba.sum()
-        if sum == 0:
+        # Normalize with log-sum-exp
+        norm = logsumexp(self.character_log_proba)
+        if not np.isfinite(norm):
             # Just in case
-            sum = self.n_characters
             self.reset()
+            norm = 0
+        self.character_log_proba -= norm
+        self.character_proba = np.exp(self.character_log_proba)
 
-        character_proba = self.character_proba / sum
-
-        return character_proba
+        return self.character_proba.copy()
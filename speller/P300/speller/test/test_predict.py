@@ -0,0 +1,107 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from nodes.predict import ASAP, ASAP_Accumulation, ASAP_DynamicStopping
+
+def _reference(n_characters, trials, flashes):
+    """The product of likelihoods, as accumulated before the log domain"""
+    proba = np.ones(n_characters) / n_characters
+    results = []
+    for likelihood, flash in zip(trials, flashes):
+        proba = proba * np.where(flash == 1, likelihood[1], likelihood[0])
+        with np.errstate(invalid="ignore"):
+            results.append(proba / proba.sum())
+    return np.array(results)
+
+def _trials(n_trials, n_characters=36, size=6, seed=42):
+    rng = np.random.default_rng(seed)
+    trials = rng.dirichlet(np.ones(2), n_trials)
+    groups = [sorted(rng.choice(n_characters, size, replace=False).tolist()) for _ in range(n_trials)]
+    flashes = np.zeros((n_trials, n_characters))
+    for flash, group in zip(flashes, groups):
+        flash[group] = 1
+    return trials, groups, flashes
+
+def test_accumulation_single():
+    trials, _, flashes = _trials(20)
+    expected = _reference(36, trials, flashes)
+    infer = ASAP_Accumulation(36)
+    for trial, flash, proba in zip(trials, flashes, expected):
+        np.testing.assert_allclose(infer.predict_proba(trial, flash), proba)
+
+def test_accumulation_batch():
+    trials, _, flashes = _trials(20)
+    expected = _reference(36, trials, flashes)
+    np.testing.assert_allclose(ASAP_Accumulation(36).predict_proba(trials, flashes), expected[-1])
+    np.testing.assert_allclose(ASAP_Accumulation(36).predict_proba(trials, flashes, each_trial=True), expected)
+
+def test_accumulation_underflow():
+    trials, _, flashes = _trials(2000)
+    # The product of likelihoods underflows, the log-domain accumulation does not
+    assert not np.isfinite(_reference(36, trials, flashes)[-1]).all()
+    proba = ASAP_Accumulation(36).predict_proba(trials, flashes)
+    assert np.isfinite(proba).all()
+    assert proba.sum() == pytest.approx(1)
+
+def test_accumulation_invalid():
+    infer = ASAP_Accumulation(4)
+    with pytest.raises(ValueError):
+        infer.predict_proba([.1, .2, .7], [0, 1, 0, 0])
+    with pytest.raises(ValueError):
+        infer.predict_proba([.1, .9], [0, 2, 0, 0])
+
+def _start(node, n_characters=36):
+    index = pd.date_range("2023-01-01", periods=3, freq="s")
+    setup = json.dumps({"symbols": [str(char) for char in range(n_characters)]})
+    node.i_ui.data = pd.DataFrame({
+        "label": ["session_begins", "testing_begins", "block_begins"],
+        "data": [setup, None, None],
+    }, index=index)
+    node.i_model.data = pd.DataFrame({"label": ["ready"], "data": [None]}, index=index[-1:])
+    node.update()
+
+def _model(trials, groups, start=0):
+    index = pd.date_range("2023-01-02", periods=len(trials), freq="250ms") + pd.Timedelta(seconds=start)
+    data = pd.DataFrame({"label": "predict_proba", "data": [json.dumps({"result": list(trial)}) for trial in trials]}, index=index)
+    epochs = [{"epoch": {"onset": onset, "context": {"group": group}}} for onset, group in zip(index, groups)]
+    return data, {"epochs": epochs, "proba": np.array(trials), "samples": list(index)}
+
+def _predictions(node, chunks):
+    predictions = []
+    for data, meta in chunks:
+        node.clear()
+        node.i_model.data, node.i_model.meta = data, meta
+        node.update()
+        if node.o.data is not None:
+            predictions.append((node.o.data["data"].iloc[0]["target"], node.o.meta["sample"]))
+    return predictions
+
+def test_dynamic_stopping_batch():
+    trials, groups, _ = _trials(300)
+    # Strong likelihoods when character 7 is flashed, so that several decisions are made
+    trials = np.array([[.2, .8] if 7 in group else [.8, .2] for group in groups]) * .5 + trials * .5
+    data, meta = _model(trials, groups)
+    one_by_one = ASAP_DynamicStopping(threshold=3)
+    _start(one_by_one)
+    chunks = [(data.iloc[[k]], {key: value[k:k + 1] for key, value in meta.items()}) for k in range(len(trials))]
+    expected = _predictions(one_by_one, chunks)
+    assert len(expected) > 2
+    # One decision per chunk, followed by a few more trials
+    decisions = [data.index.get_loc(sample) for _, sample in expected]
+    bounds = [0] + [(first + second) // 2 for first, second in zip(decisions, decisions[1:])] + [len(trials)]
+    chunks = [(data.iloc[start:stop], {key: value[start:stop] for key, value in meta.items()}) for start, stop in zip(bounds, bounds[1:])]
+    batch = ASAP_DynamicStopping(threshold=3)
+    _start(batch)
+    assert _predictions(batch, chunks) == expected
+    np.testing.assert_allclose(batch.scores, one_by_one.scores)
+
+def test_asap_batch():
+    trials, groups, flashes = _trials(12)
+    node = ASAP()
+    _start(node)
+    data, meta = _model(trials, groups)
+    node.clear()
+    node.i_model.data, node.i_model.meta = data, meta
+    node.update()
+    np.testing.assert_allclose(node.scores, _reference(36, trials, flashes)[-1])